@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+
+from paper2agent.llm.budget import count_tokens
+from paper2agent.llm.client import get_client
+from paper2agent.llm.config import BEST_OF_N_CONFIG, MODEL_CONFIG
+from paper2agent.llm.loop import run_sync
+from paper2agent.llm.telemetry import estimate_cost
+
+
+def candidate_count(n=None):
+    """Candidates to draft: `n` if given, else PAPER2AGENT_CANDIDATES, else BEST_OF_N_CONFIG["n"]."""
+    if n is None:
+        n = os.environ.get("PAPER2AGENT_CANDIDATES") or BEST_OF_N_CONFIG["n"]
+    return max(1, int(n))
+
+
+class Candidate:
+    """One drafted candidate and how far it got: drafting -> testing -> passed/failed."""
+
+    def __init__(self, index, model):
+        self.index = index
+        self.model = model
+        self.code = None
+        self.status = "pending"
+        self.error = None
+        self.elapsed = 0.0
+
+    @property
+    def passed(self):
+        return self.status == "passed"
+
+    def as_dict(self):
+        return {"index": self.index, "model": self.model, "status": self.status,
+                "error": self.error, "elapsed_seconds": round(self.elapsed, 3)}
+
+
+class CandidateSynthesis:
+    """
+    Best-of-N drafting. Drafts N candidates concurrently (optionally from
+    different models), static-checks and sandbox-tests each one as soon as it
+    is drafted, and returns the first to pass; the others are cancelled. The
+    number of candidates launched is capped by their estimated drafting cost.
+    """
+
+    def __init__(self, synthesizer, integrity_agent, sandbox, max_cost_usd=None, expected_output_tokens=None):
+        self.synthesizer = synthesizer
+        self.integrity_agent = integrity_agent
+        self.sandbox = sandbox
+        self.max_cost_usd = BEST_OF_N_CONFIG["max_cost_usd"] if max_cost_usd is None else max_cost_usd
+        self.expected_output_tokens = expected_output_tokens or BEST_OF_N_CONFIG["expected_output_tokens"]
+
+    def plan(self, query, context, n, default_llm, models=None):
+        """
+        Picks the client for each of up to `n` candidates: `models` (MODEL_CONFIG keys
+        or specs, default BEST_OF_N_CONFIG["models"]) round-robin, else `default_llm`.
+        Stops adding candidates once the estimated cost would exceed max_cost_usd
+        (the first candidate is always kept). Returns (clients, estimated cost in USD).
+        """
+        specs = [MODEL_CONFIG.get(model, model) for model in (BEST_OF_N_CONFIG["models"] if models is None else models)]
+        prompt = self.synthesizer._draft_prompt(query, context)
+        clients, estimated = [], 0.0
+        for i in range(n):
+            client = get_client(specs[i % len(specs)]) if specs else default_llm
+            cost = estimate_cost(f"{client.provider}/{client.model_name}",
+                                 count_tokens(prompt, client.model_spec), self.expected_output_tokens)
+            if clients and estimated + cost > self.max_cost_usd:
+                print(f"CandidateSynthesis: Cost cap ${self.max_cost_usd:.4f} reached; drafting {len(clients)} of {n} candidates.")
+                break
+            clients.append(client)
+            estimated += cost
+        return clients, estimated
+
+    def race(self, query, context, clients, make_test):
+        """
+        Blocking wrapper around arace(). `make_test` is a callable returning the
+        test script; it runs once, concurrently with the drafts.
+        """
+        # On the shared background loop: async SDK clients stay bound to the loop they first used
+        return run_sync(self.arace(query, context, clients, make_test))
+
+    async def arace(self, query, context, clients, make_test):
+        """Returns (winner or None, all candidates in launch order)."""
+        candidates = [Candidate(i, f"{client.provider}/{client.model_name}") for i, client in enumerate(clients)]
+        test_task = asyncio.ensure_future(asyncio.to_thread(make_test))
+
+        async def run(candidate, client):
+            start = time.monotonic()
+            try:
+                candidate.status = "drafting"
+                # Later candidates must be fresh samples, not cache hits of the first
+                candidate.code = await self.synthesizer.adraft(query, context, llm=client, use_cache=candidate.index == 0)
+                if not self.integrity_agent.static_check(candidate.code):
+                    candidate.status = "unsafe"
+                    return candidate
+                test_case = await asyncio.shield(test_task)
+                candidate.status = "testing"
+                result = await asyncio.to_thread(self.sandbox.run, f"{candidate.code}\n\n{test_case}")
+                candidate.status = "passed" if result.success else "failed"
+                candidate.error = None if result.success else result.error_log
+            except asyncio.CancelledError:
+                candidate.status = "cancelled"
+                raise
+            except Exception as e:
+                candidate.status = "error"
+                candidate.error = str(e)
+            finally:
+                candidate.elapsed = time.monotonic() - start
+            return candidate
+
+        pending = {asyncio.create_task(run(candidate, client)) for candidate, client in zip(candidates, clients)}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                passed = [task.result() for task in done if task.result().passed]
+                if passed:
+                    winner = min(passed, key=lambda candidate: candidate.index)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if not test_task.done():
+                test_task.cancel()
+            await asyncio.gather(test_task, return_exceptions=True)
+        return winner, candidates
@@ -1,10 +1,20 @@
-from paper2agent.llm.client import LLMClient
+from paper2agent.llm.client import get_client
 from paper2agent.llm.config import MODEL_CONFIG
-import json
+
+# Structured output for verify(); enforced by the provider's JSON mode.
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "feedback": {"type": "string", "description": "Reasoning behind the verdict"},
+    },
+    "required": ["valid", "feedback"],
+    "additionalProperties": False,
+}
 
 class ScientificGroundingAgent:
     def __init__(self):
-        self.llm = LLMClient(model_name=MODEL_CONFIG["grounding"])
+        self.llm = get_client(MODEL_CONFIG["grounding"])
 
     def verify(self, code, result, context):
         prompt = f"""
@@ -17,19 +27,17 @@ class ScientificGroundingAgent:
         Result/Output:
         {result}
         
-        Output valid JSON with keys:
+        Answer with:
         - valid: boolean
         - feedback: string (reasoning)
-        
-        Do not output markdown blocks. Just JSON.
         """
         
-        response = self.llm.generate(prompt, system_prompt="You are a scientific reviewer.")
-        
         try:
-            # Clean potential markdown
-            response = response.replace("```json", "").replace("```", "").strip()
-            data = json.loads(response)
-            return data.get("valid", False), data.get("feedback", "No feedback provided")
+            data = self.llm.generate_json(prompt, system_prompt="You are a scientific reviewer.",
+                                          schema=VERDICT_SCHEMA, role="grounding")
         except Exception as e:
-            return False, f"Grounding check failed to parse: {str(e)}"
+            return False, f"Grounding check failed: {str(e)}"
+        # Anything but a real boolean verdict (a list, a string, "valid": "false") fails the check
+        if not isinstance(data, dict) or not isinstance(data.get("valid"), bool):
+            return False, f"Grounding check failed: expected a boolean 'valid' verdict, got {str(data)[:200]}"
+        return data["valid"], str(data.get("feedback") or "No feedback provided")
@@ -1,21 +1,45 @@
 import ast
 import re
-from paper2agent.llm.client import LLMClient
+from paper2agent.llm.client import get_client
 from paper2agent.llm.config import MODEL_CONFIG
+from paper2agent.llm.jsonmode import JSONExtractionError
+from paper2agent.llm.router import LLMProviderError
+
+# Structured outputs for the critic calls; enforced by the provider's JSON mode,
+# so reasoning models' <think> blocks never reach the parsed fields.
+TEST_CASE_SCHEMA = {
+    "type": "object",
+    "properties": {"test_code": {"type": "string", "description": "Python test code only"}},
+    "required": ["test_code"],
+    "additionalProperties": False,
+}
+
+DIAGNOSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "diagnosis": {"type": "string", "description": "Why the code failed"},
+        "fix": {"type": "string", "description": "The specific change to make"},
+    },
+    "required": ["diagnosis", "fix"],
+    "additionalProperties": False,
+}
 
 class IntegrityAgent:
     def __init__(self, synthesizer, sandbox=None):
         self.synthesizer = synthesizer
         self.sandbox = sandbox 
         # Integrity needs reasoning capabilities (e.g., deepseek-r1)
-        self.llm = LLMClient(model_name=MODEL_CONFIG["integrity"])
+        self.llm = get_client(MODEL_CONFIG["integrity"])
         self.test_generator = TestGenerator(self.llm)
         self.reflector = Reflector(self.llm)
 
     def set_model(self, model_name):
-        """Swaps the underlying LLM for the Integrity components."""
+        """
+        Permanently swaps the underlying LLM for the Integrity components.
+        For a single request, pass `llm` to run_robustness_loop instead.
+        """
         print(f"IntegrityAgent: Switching model to {model_name}")
-        new_client = LLMClient(model_name=model_name)
+        new_client = get_client(model_name)
         self.llm = new_client
         self.test_generator.llm = new_client
         self.reflector.llm = new_client
@@ -49,21 +73,35 @@ class IntegrityAgent:
 
         return True
 
-    def run_robustness_loop(self, code, context):
+    def run_robustness_loop(self, code, context, llm=None, synthesizer_llm=None, test_case=None, log=None):
+        """
+        Tests and repairs `code` until it passes. `llm` overrides the critic model
+        and `synthesizer_llm` the model used for fixes, for this call only.
+        The test depends only on `context`, so it is generated once (unless passed
+        in as `test_case`, e.g. prepared while the draft was written) and reused
+        across attempts. Pass a dict as `log` to get the attempts, critiques and
+        test case back (e.g. as the verification log of a stored skill).
+        """
         attempts = 0
         max_attempts = 3
         
         current_code = code
+        if log is None:
+            log = {}
+        log.update(attempts=0, critiques=[], test_case=test_case)
 
         while attempts < max_attempts:
+            log["attempts"] = attempts + 1
             if not self.static_check(current_code):
                 print("Static Check Failed: Unsafe code detected.")
                 critique = "Code failed static safety check (e.g., restricted imports like subprocess or unsafe calls). Please rewrite safely."
-                current_code = self.synthesizer.fix(current_code, critique)
+                log["critiques"].append(critique)
+                current_code = self.synthesizer.fix(current_code, critique, llm=synthesizer_llm)
                 attempts += 1
                 continue
             
-            test_case = self.test_generator.create(context)
+            if test_case is None:
+                test_case = log["test_case"] = self.test_generator.create(context, llm=llm)
             
             # Use the passed sandbox or mock
             if self.sandbox:
@@ -77,18 +115,19 @@ class IntegrityAgent:
             if result.success:
                 return current_code
             
-            critique = self.reflector.analyze(current_code, result.error_log)
+            critique = self.reflector.analyze(current_code, result.error_log, llm=llm)
             print(f"Critique: {critique}")
-            current_code = self.synthesizer.fix(current_code, critique)
+            log["critiques"].append(critique)
+            current_code = self.synthesizer.fix(current_code, critique, llm=synthesizer_llm)
             attempts += 1
             
         raise Exception("Failed to generate robust code after max attempts.")
 
 class TestGenerator:
     def __init__(self, llm_client=None):
-        self.llm = llm_client if llm_client else LLMClient()
+        self.llm = llm_client if llm_client else get_client()
 
-    def create(self, context):
+    def create(self, context, llm=None):
         prompt = f"""
         Generate a python usage example / text case for a function described as:
         "{context}"
@@ -97,15 +136,17 @@ class TestGenerator:
         1. It should assert the expected output.
         2. It should print "TEST PASSED" if successful, enabling stdout checks.
         3. Do NOT define the function, assume it is already defined in the scope.
-        4. Return ONLY the code.
+        4. Put the code in `test_code`.
         """
-        response = self.llm.generate(prompt, system_prompt="You are a QA engineer.")
-        return self._clean_response(response)
-
-    def _clean_response(self, text):
-        # Remove <think>...</think> blocks from DeepSeek-R1
-        text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
-        return self._clean_code(text)
+        try:
+            data = (llm or self.llm).generate_json(prompt, system_prompt="You are a QA engineer.",
+                                                   schema=TEST_CASE_SCHEMA, role="test-gen")
+        except (JSONExtractionError, LLMProviderError) as e:
+            print(f"TestGenerator: No test case generated: {e}")
+            return ""
+        if not isinstance(data, dict):
+            return ""
+        return self._clean_code(str(data.get("test_code") or ""))
 
     def _clean_code(self, text):
         text = text.strip()
@@ -122,9 +163,9 @@ class TestGenerator:
 
 class Reflector:
     def __init__(self, llm_client=None):
-        self.llm = llm_client if llm_client else LLMClient()
+        self.llm = llm_client if llm_client else get_client()
 
-    def analyze(self, code, error_log):
+    def analyze(self, code, error_log, llm=None):
         prompt = f"""
         Analyze the following error given the code:
         
@@ -134,11 +175,17 @@ class Reflector:
         Error Traceback:
         {error_log}
         
-        Explain why it failed and suggest a specific fix. Be concise.
+        Explain why it failed (`diagnosis`) and suggest a specific fix (`fix`). Be concise.
         """
-        raw_response = self.llm.generate(prompt, system_prompt="You are an expert debugger.")
-        # Clean thinking tags here too
-        return re.sub(r"<think>.*?</think>", "", raw_response, flags=re.DOTALL).strip()
+        try:
+            data = (llm or self.llm).generate_json(prompt, system_prompt="You are an expert debugger.",
+                                                   schema=DIAGNOSIS_SCHEMA, role="reflector")
+        except (JSONExtractionError, LLMProviderError) as e:
+            print(f"Reflector: No diagnosis: {e}")
+            return f"Failed with:\n{error_log}"
+        if not isinstance(data, dict):
+            return f"Failed with:\n{error_log}"
+        return f"{str(data.get('diagnosis') or '').strip()}\nFix: {str(data.get('fix') or '').strip()}".strip()
 
 class MockResult:
     def __init__(self, success, error_log):
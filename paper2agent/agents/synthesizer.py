@@ -1,16 +1,38 @@
-from paper2agent.llm.client import LLMClient
-from paper2agent.llm.config import MODEL_CONFIG
+from paper2agent.llm.client import get_client
+from paper2agent.llm.budget import split_source
+from paper2agent.llm.config import MODEL_CONFIG, PROMPT_BUDGETS
 import re
 
 class SkillSynthesizer:
     def __init__(self):
         # Use specialized coding model (e.g., qwen2.5-coder)
-        self.llm = LLMClient(model_name=MODEL_CONFIG["synthesizer"])
+        self.llm = get_client(MODEL_CONFIG["synthesizer"])
 
-    def draft(self, query, context=""):
+    def draft(self, query, context="", llm=None):
         """
         Drafts a function based on the query and optional RAG context.
+        Pass `llm` to use another client for this call only (e.g. a persona model).
         """
+        response = (llm or self.llm).generate(self._draft_prompt(query, context), system_prompt="You are a Scientific Reasoning Agent.", role="synthesizer")
+        return self.clean_code(response)
+
+    async def adraft(self, query, context="", llm=None, use_cache=True):
+        """
+        Async variant of draft(), for drafting several candidates concurrently.
+        Candidates after the first pass use_cache=False so they are fresh samples.
+        """
+        response = await (llm or self.llm).agenerate(self._draft_prompt(query, context), system_prompt="You are a Scientific Reasoning Agent.",
+                                                     use_cache=use_cache, role="synthesizer")
+        return self.clean_code(response)
+
+    def draft_stream(self, query, context="", llm=None):
+        """
+        Streaming variant of draft(): yields raw response tokens as they arrive.
+        Join them and pass the text to clean_code() to get the drafted script.
+        """
+        yield from (llm or self.llm).generate_stream(self._draft_prompt(query, context), system_prompt="You are a Scientific Reasoning Agent.", role="synthesizer")
+
+    def _draft_prompt(self, query, context):
         context_block = ""
         if context:
             context_block = f"\nReference Context from Papers/Domain:\n{context}\n"
@@ -42,11 +64,9 @@ class SkillSynthesizer:
         2. It MUST print the Explanation/Reasoning first, then the Result.
         3. Return ONLY the code.
         """
-        
-        response = self.llm.generate(prompt, system_prompt="You are a Scientific Reasoning Agent.")
-        return self._clean_code(response)
+        return prompt
 
-    def fix(self, code, critique):
+    def fix(self, code, critique, llm=None):
         """
         Fixes the code based on critique.
         """
@@ -61,21 +81,55 @@ class SkillSynthesizer:
         Please rewrite the code to fix the issues. Return only the fixed code.
         """
         
-        response = self.llm.generate(prompt, system_prompt="You are a code debugger.")
-        return self._clean_code(response)
+        response = (llm or self.llm).generate(prompt, system_prompt="You are a code debugger.", role="synthesizer")
+        return self.clean_code(response)
 
     def extract_tools(self, code_content, source_name="Unknown"):
         """
         Analyzes raw codebase content and extracts reusable tools (functions).
         Returns a list of (function_name, function_code, description) tuples.
+        Files larger than PROMPT_BUDGETS["extract_chunk"] tokens are split between
+        top-level definitions and sent as several prompts, so no code is cut off.
         """
+        [(tools, error)] = self.extract_tools_many([(code_content, source_name)])
+        if error is not None:
+            raise error
+        return tools
+
+    def extract_tools_many(self, files, max_concurrency=None):
+        """
+        extract_tools() for many files at once, e.g. a whole codebase.
+        `files` are (code_content, source_name) pairs; returns one (tools, error)
+        pair per file in the same order. error is set if any chunk of that file
+        failed; tools still holds what the other chunks produced.
+        """
+        prompts, owners = [], []
+        for index, (content, source_name) in enumerate(files):
+            chunks = split_source(content, PROMPT_BUDGETS["extract_chunk"], self.llm.model_name) or [content]
+            for part, chunk in enumerate(chunks):
+                label = source_name if len(chunks) == 1 else f"{source_name} (part {part + 1}/{len(chunks)})"
+                prompts.append(self._extract_prompt(chunk, label))
+                owners.append(index)
+
+        results = self.llm.generate_many(prompts, system_prompt="You are a code extractor.", max_concurrency=max_concurrency,
+                                         role="synthesizer")
+        extracted = [([], None) for _ in files]
+        for owner, result in zip(owners, results):
+            tools, error = extracted[owner]
+            if result.ok:
+                tools.extend(self._parse_tools(result.response, files[owner][1]))
+            elif error is None:
+                extracted[owner] = (tools, result.error)
+        return extracted
+
+    def _extract_prompt(self, code_content, source_name):
         prompt = f"""
         You are a Code Archival Agent.
         
         Source: {source_name}
         
         Raw Code Content:
-        {code_content[:8000]} # Truncated if too long
+        {code_content}
         
         Your Task:
         1. Identify reusable, independent utility functions or classes in this code.
@@ -91,14 +145,14 @@ class SkillSynthesizer:
         ### FUNCTION ###
         ...
         """
-        
-        response = self.llm.generate(prompt, system_prompt="You are a code extractor.")
-        
+        return prompt
+
+    def _parse_tools(self, response, source_name):
         # Parse response
         tools = []
         raw_functions = response.split("### FUNCTION ###")
         for func_block in raw_functions:
-            clean_func = self._clean_code(func_block)
+            clean_func = self.clean_code(func_block)
             if len(clean_func) > 20 and "def " in clean_func:
                 # Extract simple name (regex or just first line)
                 name_match = re.search(r"def\s+([a-zA-Z0-9_]+)", clean_func)
@@ -111,7 +165,7 @@ class SkillSynthesizer:
         
         return tools
 
-    def _clean_code(self, text):
+    def clean_code(self, text):
         text = text.strip()
         if text.startswith("```"):
             text = re.sub(r"^```[a-zA-Z]*\n", "", text)
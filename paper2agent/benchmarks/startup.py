@@ -0,0 +1,90 @@
+"""
+Startup benchmark: import time of each Orchestrator component's module (each in
+a fresh interpreter, so shared dependencies are counted for every module that
+pulls them in) and construction time of each component.
+
+    python -m paper2agent.benchmarks.startup [--json] [--repeat N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Orchestrator component -> module that defines it
+COMPONENT_MODULES = {
+    "orchestrator": "paper2agent.orchestrator",
+    "skill_registry": "paper2agent.skills.registry",
+    "synthesizer": "paper2agent.agents.synthesizer",
+    "sandbox": "paper2agent.sandbox.execution",
+    "integrity_agent": "paper2agent.agents.integrity",
+    "grounding_agent": "paper2agent.agents.grounding",
+    "ingest": "paper2agent.knowledge.ingest",
+    "retriever": "paper2agent.knowledge.retriever",
+    "papers": "paper2agent.knowledge.papers",
+    "execution_cache": "paper2agent.sandbox.cache",
+    "skill_stats": "paper2agent.skills.stats",
+    "skill_writer": "paper2agent.skills.writeback",
+}
+
+# What a `paper2agent run` that hits the skill registry builds
+SKILL_HIT_PATH = ("skill_registry", "execution_cache", "sandbox")
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_seconds(module, repeat=3):
+    """Median cold-import time of `module`, each run in a new interpreter."""
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def init_seconds():
+    """Construction time of the Orchestrator and of each of its components, in one process."""
+    from paper2agent.orchestrator import Orchestrator
+
+    start = time.perf_counter()
+    orch = Orchestrator(warm_up=False)  # Background model loads aren't construction time
+    timings = {"orchestrator": time.perf_counter() - start}
+    for name in Orchestrator.COMPONENTS:
+        getattr(orch, name)
+    timings.update(orch.init_seconds)
+    return timings
+
+
+def run(repeat=3):
+    # Warm-up threads would compete with the measurements
+    os.environ.setdefault("PAPER2AGENT_LLM_WARMUP", "0")
+    imports = {name: import_seconds(module, repeat) for name, module in COMPONENT_MODULES.items()}
+    inits = init_seconds()
+    skill_hit = imports["orchestrator"] + inits["orchestrator"] + sum(inits[name] for name in SKILL_HIT_PATH)
+    return {"import_seconds": imports, "init_seconds": inits, "skill_hit_startup_seconds": skill_hit}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and init time per Orchestrator component")
+    parser.add_argument("--json", action="store_true", help="Print the raw results as JSON")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per import measurement")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'component':<18}{'import (s)':>12}{'init (s)':>12}")
+    for name in COMPONENT_MODULES:
+        init = results["init_seconds"].get(name)
+        print(f"{name:<18}{results['import_seconds'][name]:>12.3f}{init if init is not None else float('nan'):>12.3f}")
+    print(f"\nSkill-hit `run` startup (import + orchestrator + {', '.join(SKILL_HIT_PATH)}): "
+          f"{results['skill_hit_startup_seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
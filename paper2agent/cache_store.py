@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteLRUStore:
+    """
+    Persistent key -> value store (SQLite-backed) shared by the on-disk caches.
+
+    Expired entries (older than `ttl_seconds`, if set) are dropped on access, and
+    the least recently used ones are evicted once `max_entries` or `max_bytes`
+    (the sum of the `size` given to each put) is exceeded. Subclasses name the
+    table and its value column, add metadata columns, and derive keys and values.
+    """
+
+    TABLE = None
+    VALUE_COLUMN = ("value", "BLOB")
+    # Extra metadata columns stored alongside each entry, as "name TYPE"
+    COLUMNS = ()
+
+    def __init__(self, path, max_entries=0, max_bytes=0, ttl_seconds=0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ["key TEXT PRIMARY KEY", *self.COLUMNS, f"{self.VALUE_COLUMN[0]} {self.VALUE_COLUMN[1]} NOT NULL",
+                   "size INTEGER NOT NULL", "created_at REAL NOT NULL", "accessed_at REAL NOT NULL"]
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ({', '.join(columns)})")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_accessed ON {self.TABLE} (accessed_at)")
+        self._conn.commit()
+
+    def _load(self, key):
+        """The stored value for `key` (refreshing its recency), or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.VALUE_COLUMN[0]}, created_at FROM {self.TABLE} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.TABLE} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def _store(self, key, value, size, **metadata):
+        """Stores `value` (`size` bytes) under `key` with the COLUMNS in `metadata`, then evicts."""
+        now = time.time()
+        names = [column.split()[0] for column in self.COLUMNS]
+        columns = ", ".join(["key", *names, self.VALUE_COLUMN[0], "size", "created_at", "accessed_at"])
+        values = (key, *(metadata.get(name, "") for name in names), value, size, now, now)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} ({columns}) VALUES ({', '.join('?' * len(values))})", values
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # Caller holds the lock.
+        if self.ttl_seconds:
+            self._conn.execute(f"DELETE FROM {self.TABLE} WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        count, total = self._totals()
+        if self.max_entries and count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.TABLE} WHERE key IN "
+                f"(SELECT key FROM {self.TABLE} ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            count, total = self._totals()
+
+        if self.max_bytes and total > self.max_bytes:
+            victims = []
+            for key, size in self._conn.execute(f"SELECT key, size FROM {self.TABLE} ORDER BY accessed_at ASC"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", victims)
+
+    def _totals(self):
+        return self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()
+
+    def stats(self):
+        with self._lock:
+            count, total = self._totals()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
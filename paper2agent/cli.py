@@ -1,7 +1,6 @@
 import argparse
 import sys
 import os
-from paper2agent.orchestrator import Orchestrator
 
 # Simple .env loader
 def load_env():
@@ -24,6 +23,11 @@ def load_env():
 def main():
     load_env()
     parser = argparse.ArgumentParser(description="Paper2Agent CLI: R-ASAA Architecture")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve LLM call metrics in Prometheus text format at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--replay", choices=["record", "replay"], default=None,
+                        help="Record LLM responses to a cassette, or serve them back offline")
+    parser.add_argument("--cassette", default=None, help="Cassette file for --replay (default: REPLAY_CONFIG)")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Command: run "query" --paper "path/to/paper.pdf"
@@ -32,11 +36,43 @@ def main():
     run_parser.add_argument("--paper", help="Path to a paper (PDF) to use as context", default=None)
     run_parser.add_argument("--context", help="Path to a data file (CSV/AnnData) to use as data context", default=None)
 
+    # Command: ingest path/to/paper.pdf
+    ingest_parser = subparsers.add_parser("ingest", help="Add a paper (PDF) to the knowledge base")
+    ingest_parser.add_argument("paper", help="Path to the paper to ingest")
+
     # Command: ui (Interactive Demo)
     ui_parser = subparsers.add_parser("ui", help="Launch Interactive Gradio UI")
 
+    # Command: list-skills
+    subparsers.add_parser("list-skills", help="Show how many skills the Skill Registry holds and its daily hit rate")
+
+    # Command: dedupe [--threshold 0.9] [--dry-run]
+    dedupe_parser = subparsers.add_parser("dedupe", help="Merge duplicate and near-duplicate skills in the Skill Registry")
+    dedupe_parser.add_argument("--threshold", type=float, default=None,
+                               help="Token-shingle similarity at which skills count as near-duplicates "
+                                    "(default: SKILL_DEDUPE_CONFIG; above 1 disables near-duplicate merging)")
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="Only report what would be merged")
+
+    # Command: build path/to/codebase --concurrency 8
+    build_parser = subparsers.add_parser("build", help="Extract reusable tools from a codebase into the Skill Registry")
+    build_parser.add_argument("codebase", help="Directory to scan for .py/.ipynb files")
+    build_parser.add_argument("--concurrency", type=int, default=None,
+                              help="Files sent to the LLM in parallel (default: provider limit in PROVIDER_CONCURRENCY)")
+
     args = parser.parse_args()
 
+    if args.replay:
+        os.environ["PAPER2AGENT_LLM_REPLAY"] = args.replay
+    if args.cassette:
+        os.environ["PAPER2AGENT_LLM_CASSETTE"] = args.cassette
+
+    # Imported after argument parsing: --help and bad arguments shouldn't pay for it
+    from paper2agent.orchestrator import Orchestrator
+
+    if args.metrics_port:
+        from paper2agent.llm.telemetry import start_metrics_server
+        start_metrics_server(args.metrics_port)
+
     if args.command == "run":
         print(f"--- Paper2Agent: Processing request ---")
         orch = Orchestrator()
@@ -55,6 +91,8 @@ def main():
             for k, v in trace.items():
                  print(f"{k.capitalize()}: {v}")
             print("----------------------------")
+            # The answer is out; let the background registry write finish before exiting
+            orch.wait_for_writes()
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -66,12 +104,12 @@ def main():
         launch_ui()
 
     elif args.command == "ingest":
-        orch = Orchestrator()
+        orch = Orchestrator(warm_up=False)
         if args.paper and os.path.exists(args.paper):
-            orch.ingest.process(args.paper)
-            markdown_text = orch.ingest.process(args.paper)
-            orch.retriever.add_document(markdown_text, source_name=os.path.basename(args.paper))
-            print(f"Successfully ingested {args.paper}")
+            if orch.ingest_paper(args.paper):
+                print(f"Successfully ingested {args.paper}")
+            else:
+                print(f"{args.paper} is already in the knowledge base.")
         else:
             print("Error: Paper path invalid.")
 
@@ -85,31 +123,49 @@ def main():
         
         orch = Orchestrator()
         count = 0
-        for file in files:
-            print(f"Extracting tools from {os.path.basename(file['path'])}...")
-            try:
-                tools = orch.synthesizer.extract_tools(file['content'], source_name=os.path.basename(file['path']))
-                for tool in tools:
+        print(f"Extracting tools from {len(files)} files...")
+        extracted = orch.synthesizer.extract_tools_many(
+            [(file['content'], os.path.basename(file['path'])) for file in files],
+            max_concurrency=args.concurrency,
+        )
+        for file, (tools, error) in zip(files, extracted):
+            print(f"{os.path.basename(file['path'])}:")
+            if error is not None:
+                print(f"  x Failed to extract (part of) {file['path']}: {error}")
+            for tool in tools:
+                try:
                     orch.skill_registry.store(tool['code'], description=tool['name'], verification_log={"success": True, "source": "extracted"})
                     print(f"  + Stored tool: {tool['name']}")
                     count += 1
-            except Exception as e:
-                print(f"  x Failed to extract from {file['path']}: {e}")
+                except Exception as e:
+                    print(f"  x Failed to store {tool['name']} from {file['path']}: {e}")
         
         print(f"\n✅ Build Complete. Extracted {count} tools into Skill Registry.")
 
     elif args.command == "list-skills":
-        orch = Orchestrator()
+        orch = Orchestrator(warm_up=False)
         print("Listing skills from Registry...")
-        # Hacky peek at chroma
         try:
-            cnt = orch.skill_registry.collection.count()
-            print(f"Total Skills stored: {cnt}")
-            # peek = orch.skill_registry.collection.peek()
-            # print(peek)
-        except:
-             print("Could not access registry count.")
+            print(f"Total Skills stored: {orch.skill_registry.count()}")
+        except Exception as e:
+             print(f"Could not access registry count: {e}")
+
+        daily = orch.skill_stats.daily(days=14)
+        if daily:
+            print("\nSkill cache (last 14 days):")
+            for day in daily:
+                print(f"  {day['day']}: {day['hits']}/{day['lookups']} hits ({day['hit_rate']:.0%}), "
+                      f"{day['writes']} skills written")
     
+    elif args.command == "dedupe":
+        orch = Orchestrator(warm_up=False)
+        report = orch.skill_registry.dedupe(threshold=args.threshold, dry_run=args.dry_run)
+        for cluster in report["clusters"]:
+            print(f"  {cluster['kept'][:12]} <- {', '.join(skill_id[:12] for skill_id in cluster['merged'])}")
+        verb = "would merge" if args.dry_run else "merged"
+        print(f"Skill Registry: {report['before']} -> {report['after']} skills "
+              f"({verb} {len(report['clusters'])} cluster(s)).")
+
     else:
         parser.print_help()
 
@@ -0,0 +1,39 @@
+import hashlib
+import json
+import zlib
+
+from paper2agent.cache_store import SQLiteLRUStore
+
+
+class ConversionCache(SQLiteLRUStore):
+    """
+    Persistent store for document conversions (SQLite-backed, zlib-compressed).
+
+    Entries are keyed by a SHA-256 of the file's content hash, the converter id
+    and the conversion options, and hold the markdown plus table/figure metadata.
+    The least recently used entries are evicted once `max_entries` or `max_bytes`
+    (compressed size) is exceeded.
+    """
+
+    TABLE = "conversions"
+    VALUE_COLUMN = ("payload", "BLOB")
+    COLUMNS = ("sha256 TEXT NOT NULL", "converter TEXT NOT NULL")
+
+    def __init__(self, path="./ingest_cache/conversions.sqlite3", max_entries=500, max_bytes=512 * 1024 * 1024):
+        super().__init__(path, max_entries=max_entries, max_bytes=max_bytes)
+
+    @staticmethod
+    def make_key(sha256, converter, options=None):
+        payload = json.dumps({"sha256": sha256, "converter": converter, "options": options or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """The cached conversion dict for `key`, or None."""
+        blob = self._load(key)
+        if blob is None:
+            return None
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def put(self, key, sha256, converter, conversion):
+        blob = zlib.compress(json.dumps(conversion, ensure_ascii=False).encode("utf-8"), 6)
+        self._store(key, blob, len(blob), sha256=sha256, converter=converter)
@@ -1,38 +1,124 @@
+import importlib.util
 import os
+from paper2agent.knowledge.cache import ConversionCache
+from paper2agent.knowledge.papers import file_sha256
+
+# Options that change what a conversion produces; part of the conversion cache key.
+CONVERSION_OPTIONS = {"export": "markdown", "metadata": ["tables", "figures"]}
+
+
+def conversion_cache_enabled():
+    env = os.environ.get("PAPER2AGENT_INGEST_CACHE")
+    return env is None or env.strip().lower() not in ("", "0", "false", "no", "off")
+
 
 class DoclingIngest:
-    def __init__(self):
-        self.docling_available = False
+    def __init__(self, cache=None):
+        # Converted markdown is kept on disk (PAPER2AGENT_INGEST_CACHE=0 disables), keyed by file hash.
+        self.cache = cache if cache is not None else (
+            ConversionCache(os.environ.get("PAPER2AGENT_INGEST_CACHE_PATH", "./ingest_cache/conversions.sqlite3"))
+            if conversion_cache_enabled() else None)
+        # Availability is checked without importing Docling; the converter (and its
+        # models) is only built for the first conversion that isn't cached.
+        self.converter = None
+        self.docling_available = importlib.util.find_spec("docling") is not None
+        if not self.docling_available:
+            print("DoclingIngest Warning: Docling not available. Fallback to PyPDF enabled.")
+
+    def _get_converter(self):
+        if self.converter is None and self.docling_available:
+            try:
+                from docling.document_converter import DocumentConverter
+                self.converter = DocumentConverter()
+            except ImportError as e:
+                print(f"DoclingIngest Warning: Docling not available (ImportError: {e}). Fallback to PyPDF enabled.")
+                self.docling_available = False
+            except Exception as e:
+                print(f"DoclingIngest Warning: Docling init failed ({e}). Fallback to PyPDF enabled.")
+                self.docling_available = False
+        return self.converter
+
+    def converter_id(self):
+        """
+        Identifies the converter (and its version) that process() prefers, so
+        papers ingested with another one can be detected and re-converted.
+        """
+        from importlib.metadata import PackageNotFoundError, version
+
+        name = "docling" if self.docling_available else "pypdf"
         try:
-            from docling.document_converter import DocumentConverter
-            self.converter = DocumentConverter()
-            self.docling_available = True
-        except ImportError as e:
-            print(f"DoclingIngest Warning: Docling not available (ImportError: {e}). Fallback to PyPDF enabled.")
-            self.docling_available = False
-        except Exception as e:
-            print(f"DoclingIngest Warning: Docling init failed ({e}). Fallback to PyPDF enabled.")
-            self.docling_available = False
+            return f"{name}-{version(name)}"
+        except PackageNotFoundError:
+            return name
 
     def process(self, file_path):
         """
         Converts a PDF/Document to markdown text.
         """
+        return self.convert(file_path)["markdown"]
+
+    def convert(self, file_path):
+        """
+        Converts a PDF/Document, returning {"markdown", "tables", "figures", "converter"}.
+        Results are served from the conversion cache when the same bytes were
+        already converted with the same converter and options.
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-            
+
+        key = sha256 = None
+        if self.cache is not None:
+            sha256 = file_sha256(file_path)
+            key = ConversionCache.make_key(sha256, self.converter_id(), CONVERSION_OPTIONS)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"Ingesting file: {file_path} (cached conversion)")
+                return cached
+
         print(f"Ingesting file: {file_path}")
-        
-        if self.docling_available:
+
+        conversion = None
+        if self.docling_available and self._get_converter() is not None:
             try:
                 print("Attempting Docling conversion...")
                 result = self.converter.convert(file_path)
-                return result.document.export_to_markdown()
+                conversion = self._docling_conversion(result.document)
             except Exception as e:
                 print(f"Docling conversion failed: {e}. Trying PyPDF fallback.")
-        
-        # Fallback to PyPDF
-        return self._pypdf_fallback(file_path)
+
+        if conversion is None:
+            # Fallback to PyPDF
+            conversion = {"markdown": self._pypdf_fallback(file_path), "tables": [], "figures": [],
+                          "converter": "pypdf" if self.docling_available else self.converter_id()}
+            if self.docling_available:
+                # Don't cache a fallback; the next run retries Docling.
+                return conversion
+
+        if key is not None and not conversion["markdown"].startswith("Error"):
+            self.cache.put(key, sha256, self.converter_id(), conversion)
+        return conversion
+
+    def _docling_conversion(self, document):
+        return {
+            "markdown": document.export_to_markdown(),
+            "tables": [self._item_metadata(document, item, i, table=True) for i, item in enumerate(getattr(document, "tables", []))],
+            "figures": [self._item_metadata(document, item, i) for i, item in enumerate(getattr(document, "pictures", []))],
+            "converter": self.converter_id(),
+        }
+
+    @staticmethod
+    def _item_metadata(document, item, index, table=False):
+        prov = getattr(item, "prov", None) or []
+        try:
+            caption = item.caption_text(document)
+        except Exception:
+            caption = ""
+        metadata = {"index": index, "page": getattr(prov[0], "page_no", None) if prov else None, "caption": caption}
+        if table:
+            data = getattr(item, "data", None)
+            metadata["rows"] = getattr(data, "num_rows", None)
+            metadata["cols"] = getattr(data, "num_cols", None)
+        return metadata
 
     def _pypdf_fallback(self, file_path):
         try:
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+_hash_memo = {}
+_hash_memo_lock = threading.Lock()
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    """
+    SHA-256 of the file's bytes (the paper's identity, independent of its name or path).
+    Memoized on (path, size, mtime), so the registry and conversion cache hash a file once.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+    with _hash_memo_lock:
+        if len(_hash_memo) > 256:
+            _hash_memo.clear()
+        _hash_memo[memo_key] = sha256
+    return sha256
+
+
+class PaperRegistry:
+    """
+    Persistent index of the papers already in the knowledge base (SQLite-backed).
+
+    Entries are keyed by the SHA-256 of the file bytes and record the converter
+    and chunking parameters the paper was ingested with, so repeat ingests are a
+    lookup and a paper is only re-processed when its bytes or those settings change.
+    """
+
+    def __init__(self, path="./knowledge_db/papers.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS papers (
+                sha256 TEXT PRIMARY KEY,
+                source_name TEXT NOT NULL,
+                source_path TEXT,
+                converter TEXT NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                overlap INTEGER NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                ingested_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_path ON papers (source_path)")
+        self._conn.commit()
+
+    def lookup(self, sha256):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, source_name, source_path, converter, chunk_size, overlap, chunk_count, ingested_at "
+                "FROM papers WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("sha256", "source_name", "source_path", "converter", "chunk_size", "overlap", "chunk_count", "ingested_at")
+        return dict(zip(keys, row))
+
+    def record(self, sha256, source_name, source_path, converter, chunk_size, overlap, chunk_count):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO papers (sha256, source_name, source_path, converter, chunk_size, overlap, "
+                "chunk_count, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, source_name, source_path, converter, chunk_size, overlap, chunk_count, time.time()),
+            )
+            self._conn.commit()
+
+    def forget(self, sha256):
+        with self._lock:
+            self._conn.execute("DELETE FROM papers WHERE sha256 = ?", (sha256,))
+            self._conn.commit()
+
+    def superseded(self, source_path, sha256):
+        """Hashes of earlier versions of the file at `source_path`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sha256 FROM papers WHERE source_path = ? AND sha256 != ?", (source_path, sha256)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def ensure_ingested(self, file_path, ingest, retriever):
+        """
+        Converts and indexes `file_path` unless the same bytes were already ingested
+        with the current converter and chunking. Returns (entry, ingested), where
+        `ingested` is False for a registry hit. Chunks of a stale ingest of the same
+        bytes, or of an earlier version of the same file, are removed first.
+        """
+        sha256 = file_sha256(file_path)
+        converter = ingest.converter_id()
+        entry = self.lookup(sha256)
+        if entry is not None and (entry["converter"], entry["chunk_size"], entry["overlap"]) == \
+                (converter, retriever.chunk_size, retriever.overlap):
+            return entry, False
+
+        conversion = ingest.convert(file_path)
+        markdown_text = conversion["markdown"]
+        if not markdown_text or markdown_text.startswith("Error"):
+            raise ValueError(markdown_text or f"No text extracted from {file_path}")
+
+        source_path = os.path.abspath(file_path)
+        for stale in ([sha256] if entry is not None else []) + self.superseded(source_path, sha256):
+            retriever.remove_paper(stale)
+            self.forget(stale)
+
+        source_name = os.path.basename(file_path)
+        chunk_count = retriever.add_document(markdown_text, source_name=source_name, paper_id=sha256)
+        # The converter that produced the text: after a fallback it differs from the
+        # configured one, so the next ingest retries the preferred converter
+        self.record(sha256, source_name, source_path, conversion["converter"], retriever.chunk_size, retriever.overlap,
+                    chunk_count)
+        return self.lookup(sha256), True
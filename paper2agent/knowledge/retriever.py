@@ -1,19 +1,31 @@
-import chromadb
 import uuid
 
 class KnowledgeRetriever:
-    def __init__(self, persist_directory="./knowledge_db"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(name="paper_knowledge")
+    def __init__(self, persist_directory="./knowledge_db", chunk_size=1000, overlap=100):
+        self.persist_directory = persist_directory
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._collection = None
 
-    def add_document(self, text, source_name):
+    @property
+    def collection(self):
+        # Opened on first query/write; registry lookups only need the settings above.
+        if self._collection is None:
+            import chromadb  # Heavy; only imported once the knowledge base is used
+            self.client = chromadb.PersistentClient(path=self.persist_directory)
+            self._collection = self.client.get_or_create_collection(name="paper_knowledge")
+        return self._collection
+
+    def add_document(self, text, source_name, paper_id=None):
         """
-        Chunks the text and adds it to the database.
+        Chunks the text and adds it to the database; returns the number of chunks.
+        With `paper_id` (the paper's content hash) chunk ids are deterministic, so
+        re-adding the same paper overwrites its chunks instead of duplicating them.
         """
         # Simple recursive chunking (mocked for simplicity, or we can import LangChain)
         # minimal implementation:
-        chunk_size = 1000
-        overlap = 100
+        chunk_size = self.chunk_size
+        overlap = self.overlap
         
         chunks = []
         start = 0
@@ -24,17 +36,28 @@ class KnowledgeRetriever:
             start += (chunk_size - overlap)
 
         if not chunks:
-            return
+            return 0
 
-        ids = [str(uuid.uuid4()) for _ in chunks]
-        metadatas = [{"source": source_name, "chunk_index": i} for i in range(len(chunks))]
+        if paper_id:
+            ids = [f"{paper_id[:16]}-{i}" for i in range(len(chunks))]
+            metadatas = [{"source": source_name, "chunk_index": i, "paper_id": paper_id} for i in range(len(chunks))]
+        else:
+            ids = [str(uuid.uuid4()) for _ in chunks]
+            metadatas = [{"source": source_name, "chunk_index": i} for i in range(len(chunks))]
         
-        self.collection.add(
+        self.collection.upsert(
             documents=chunks,
             metadatas=metadatas,
             ids=ids
         )
         print(f"Added {len(chunks)} chunks from {source_name} to knowledge base.")
+        return len(chunks)
+
+    def remove_paper(self, paper_id):
+        """
+        Deletes every chunk that add_document stored for `paper_id`.
+        """
+        self.collection.delete(where={"paper_id": paper_id})
 
     def query(self, query_text, n_results=3):
         """
@@ -48,3 +71,19 @@ class KnowledgeRetriever:
         if results['documents']:
             return results['documents'][0]
         return []
+
+    def query_with_scores(self, query_text, n_results=3):
+        """
+        Retrieves relevant chunks as (text, score) pairs, best first.
+        Score is 1 / (1 + distance), so higher means more similar.
+        """
+        results = self.collection.query(
+            query_texts=[query_text],
+            n_results=n_results
+        )
+
+        if not results['documents']:
+            return []
+        documents = results['documents'][0]
+        distances = (results.get('distances') or [[0.0] * len(documents)])[0]
+        return [(doc, 1.0 / (1.0 + dist)) for doc, dist in zip(documents, distances)]
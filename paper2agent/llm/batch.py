@@ -0,0 +1,20 @@
+class BatchResult:
+    """
+    Outcome of one prompt in LLMClient.generate_many(): `response` on success,
+    otherwise `error` holds the exception (the rest of the batch still runs).
+    """
+
+    def __init__(self, index, prompt, response=None, error=None, elapsed=0.0):
+        self.index = index
+        self.prompt = prompt
+        self.response = response
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"BatchResult(index={self.index}, {status}, elapsed={self.elapsed:.2f}s)"
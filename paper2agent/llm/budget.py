@@ -0,0 +1,172 @@
+import re
+
+from paper2agent.llm.config import CHARS_PER_TOKEN
+
+
+def chars_per_token(model_spec=None):
+    """Average characters per token for the model family named in `model_spec`."""
+    name = (model_spec or "").lower()
+    for family, ratio in CHARS_PER_TOKEN.items():
+        if family != "default" and family in name:
+            return ratio
+    return CHARS_PER_TOKEN["default"]
+
+
+def count_tokens(text, model_spec=None):
+    """
+    Token estimate for `text` under the given model's tokenizer family. None of the
+    providers ship a local tokenizer we depend on, so this is a per-family
+    characters-per-token ratio (rounded up), accurate to roughly +-15% for prose and code.
+    """
+    if not text:
+        return 0
+    return int(len(text) / chars_per_token(model_spec)) + 1
+
+
+TRUNCATION_MARKER = "\n[... truncated to fit the context budget]"
+
+
+def trim_to_tokens(text, max_tokens, model_spec=None):
+    """
+    Keeps the head of `text` within `max_tokens` (as counted by count_tokens(),
+    truncation marker included), cutting at a line break when possible.
+    """
+    if count_tokens(text, model_spec) <= max_tokens:
+        return text
+    # count_tokens() rounds up: (max_tokens - 1) tokens' worth of characters always fits
+    room = int((max_tokens - 1) * chars_per_token(model_spec))
+    marker = TRUNCATION_MARKER if room > 2 * len(TRUNCATION_MARKER) else ""
+    max_chars = room - len(marker)
+    if max_chars <= 0:
+        return ""
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip() + marker
+
+
+class Section:
+    """
+    One candidate piece of a prompt. Lower `priority` packs first; within a
+    priority, higher `score` (e.g. retrieval similarity) wins. Sections sharing a
+    `group` are joined together when the prompt is assembled.
+    """
+
+    def __init__(self, group, text, priority, score=0.0, required=False, min_tokens=64, label=None):
+        self.group = group
+        self.text = text or ""
+        self.priority = priority
+        self.score = score
+        self.required = required
+        self.min_tokens = min_tokens
+        self.label = label or group
+
+
+class PackedPrompt:
+    def __init__(self, budget, sections, used_tokens, dropped):
+        self.budget = budget
+        self.sections = sections
+        self.used_tokens = used_tokens
+        self.dropped = dropped
+
+    def text(self, group, sep="\n\n"):
+        return sep.join(section.text for section in self.sections if section.group == group)
+
+    def report(self):
+        """Summary for the orchestrator trace: budget, tokens used and what was trimmed/dropped."""
+        return {"budget_tokens": self.budget, "used_tokens": self.used_tokens, "dropped": self.dropped}
+
+
+class PromptBudget:
+    """
+    Packs prompt sections into `max_tokens` (counted for `model_spec`) by priority.
+    Sections that don't fit are trimmed if at least `min_tokens` of room is left
+    (always, for required sections), otherwise dropped; everything removed is
+    listed in the result's `dropped`.
+    """
+
+    def __init__(self, model_spec, max_tokens):
+        self.model_spec = model_spec
+        self.max_tokens = max_tokens
+
+    def count(self, text):
+        return count_tokens(text, self.model_spec)
+
+    def pack(self, sections):
+        order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, -sections[i].score, i))
+        kept = {}
+        dropped = []
+        remaining = self.max_tokens
+        for i in order:
+            section = sections[i]
+            tokens = self.count(section.text)
+            if tokens == 0:
+                continue
+            if tokens <= remaining:
+                kept[i] = section
+                remaining -= tokens
+                continue
+            if remaining >= section.min_tokens or (section.required and remaining > 0):
+                trimmed = trim_to_tokens(section.text, remaining, self.model_spec)
+                kept[i] = Section(section.group, trimmed, section.priority, section.score,
+                                  section.required, section.min_tokens, section.label)
+                kept_tokens = self.count(trimmed)
+                dropped.append({"section": section.label, "action": "trimmed", "tokens": tokens - kept_tokens})
+                remaining -= kept_tokens
+                continue
+            dropped.append({"section": section.label, "action": "dropped", "tokens": tokens})
+
+        packed = [kept[i] for i in sorted(kept)]
+        return PackedPrompt(self.max_tokens, packed, self.max_tokens - remaining, dropped)
+
+
+_BOUNDARY = re.compile(r"^(?:@|def |async def |class )")
+
+
+def split_source(code, max_tokens, model_spec=None):
+    """
+    Splits source code into chunks of at most `max_tokens`, breaking only between
+    top-level definitions where possible (a single oversized definition is split by lines).
+    """
+    blocks, current = [], []
+    previous_decorator = False
+    for line in code.splitlines(keepends=True):
+        if _BOUNDARY.match(line) and current and not previous_decorator:
+            blocks.append("".join(current))
+            current = []
+        current.append(line)
+        if line.strip():
+            previous_decorator = line.startswith("@")
+    if current:
+        blocks.append("".join(current))
+
+    max_chars = int(max_tokens * chars_per_token(model_spec))
+    chunks, chunk = [], ""
+    for block in blocks:
+        pieces = [block] if len(block) <= max_chars else _split_lines(block, max_chars)
+        for piece in pieces:
+            if chunk and len(chunk) + len(piece) > max_chars:
+                chunks.append(chunk)
+                chunk = ""
+            chunk += piece
+    if chunk.strip():
+        chunks.append(chunk)
+    return chunks
+
+
+def _split_lines(text, max_chars):
+    pieces, piece = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if piece:
+                pieces.append(piece)
+                piece = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if piece and len(piece) + len(line) > max_chars:
+            pieces.append(piece)
+            piece = ""
+        piece += line
+    if piece:
+        pieces.append(piece)
+    return pieces
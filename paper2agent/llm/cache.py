@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+
+from paper2agent.cache_store import SQLiteLRUStore
+from paper2agent.llm.config import LLM_CACHE_CONFIG
+
+
+class ResponseCache(SQLiteLRUStore):
+    """
+    Persistent, content-addressed store for LLM responses (SQLite-backed).
+
+    Entries are keyed by a SHA-256 of the request (provider, model, prompts and
+    sampling params). Expired entries are dropped on access, and the least
+    recently used ones are evicted once `max_entries` or `max_bytes` is exceeded.
+    """
+
+    TABLE = "responses"
+    VALUE_COLUMN = ("response", "TEXT")
+    COLUMNS = ("provider TEXT", "model TEXT")
+
+    def __init__(self, path="./llm_cache/responses.sqlite3", max_entries=10000,
+                 max_bytes=256 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        super().__init__(path, max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def make_key(provider, model, system_prompt, prompt, params=None):
+        """
+        Hashes everything that determines a response into a stable cache key.
+        """
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "system_prompt": system_prompt or "",
+                "prompt": prompt,
+                "params": params or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        return self._load(key)
+
+    def put(self, key, response, provider="", model=""):
+        self._store(key, response, len(response.encode("utf-8")), provider=provider, model=model)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def cache_enabled():
+    env = os.environ.get("PAPER2AGENT_LLM_CACHE")
+    if env is not None:
+        return env.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(LLM_CACHE_CONFIG.get("enabled", False))
+
+
+def get_default_cache():
+    """
+    Returns the process-wide response cache, or None if caching is not enabled.
+    """
+    global _default_cache
+    if not cache_enabled():
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                path=os.environ.get("PAPER2AGENT_LLM_CACHE_PATH", LLM_CACHE_CONFIG["path"]),
+                max_entries=LLM_CACHE_CONFIG["max_entries"],
+                max_bytes=LLM_CACHE_CONFIG["max_bytes"],
+                ttl_seconds=LLM_CACHE_CONFIG["ttl_seconds"],
+            )
+        return _default_cache
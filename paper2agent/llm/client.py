@@ -1,17 +1,107 @@
-import google.generativeai as genai
+import asyncio
 import os
 import time
-import requests
 import json
-from typing import Optional
-from huggingface_hub import InferenceClient
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, List, Optional
+from paper2agent.llm.batch import BatchResult
+from paper2agent.llm.budget import count_tokens
+from paper2agent.llm.cache import ResponseCache, get_default_cache
+from paper2agent.llm.config import (MODEL_CONFIG, OLLAMA_CONNECT_TIMEOUT, OLLAMA_KEEP_ALIVE, OLLAMA_WARMUP_CONFIG,
+                                     PROVIDER_CONCURRENCY)
+from paper2agent.llm.hedge import get_hedge_stats, hedge_delay, hedging_enabled, race
+from paper2agent.llm.jsonmode import JsonStreamExtractor, active_schema, extract_json, json_mode
+from paper2agent.llm.loop import run_sync
+from paper2agent.llm.http import AsyncSessionPool, SessionPool, get_async_session_pool, get_session_pool
+from paper2agent.llm.ratelimit import (RateLimiter, backoff_delay, get_rate_limiter, is_rate_limit_error,
+                                       retry_after_from_error)
+from paper2agent.llm.replay import get_replay_provider, replay_mode
+from paper2agent.llm.router import LLMProviderError, ProviderRouter, get_router, is_unreachable_error
+from paper2agent.llm import telemetry
+
+# Provider SDKs are imported by the code paths that use them, so importing this
+# module (and the CLI) stays cheap.
+if TYPE_CHECKING:
+    from huggingface_hub import AsyncInferenceClient, InferenceClient
+
+# Sampling parameters sent with each request, per provider (also part of the cache key).
+SAMPLING_DEFAULTS = {
+    "ollama": {"temperature": 0.2},  # Low temp for coding/reasoning
+    "huggingface": {"max_new_tokens": 512, "temperature": 0.2},
+    "openrouter": {},
+    "gemini": {},
+    "replay": {},
+}
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Providers with a native structured-output mode; the rest go through JsonStreamExtractor.
+NATIVE_JSON_PROVIDERS = ("ollama", "huggingface", "openrouter", "gemini")
+
+# JSON Schema keywords Gemini's response_schema understands; anything else is dropped.
+_GEMINI_SCHEMA_KEYS = ("type", "format", "description", "nullable", "enum", "properties", "required", "items")
+
+# Per-provider caps on concurrent agenerate calls. asyncio.Semaphore is bound to
+# the loop that first uses it, so one set of semaphores is kept per event loop.
+_concurrency_limits = dict(PROVIDER_CONCURRENCY)
+_semaphores = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def set_provider_concurrency(provider: str, limit: int):
+    """Caps in-flight agenerate calls for a provider (applies to semaphores created afterwards)."""
+    with _semaphores_lock:
+        _concurrency_limits[provider] = limit
+        for per_loop in _semaphores.values():
+            per_loop.pop(provider, None)
+
+
+def _provider_semaphore(provider: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        per_loop = _semaphores.setdefault(loop, {})
+        if provider not in per_loop:
+            per_loop[provider] = asyncio.Semaphore(_concurrency_limits.get(provider, 4))
+        return per_loop[provider]
+
+
+def _loop_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
 
 class LLMClient:
-    def __init__(self, model_name: str = "gemini-2.0-flash"):
+    def __init__(self, model_name: str = "gemini-2.0-flash", cache: Optional[ResponseCache] = None,
+                 http_pool: Optional[SessionPool] = None, async_http_pool: Optional[AsyncSessionPool] = None,
+                 router: Optional[ProviderRouter] = None, hedge: Optional[bool] = None):
+        self.model_spec = model_name
         self.model_name = model_name
         self.provider = "gemini"
-        
-        if model_name.startswith("ollama/"):
+        # Opt-in response cache (see LLM_CACHE_CONFIG); None means every call hits the provider.
+        self.cache = cache if cache is not None else get_default_cache()
+        # Keep-alive sessions shared across clients, so repeat calls skip the TCP/TLS handshake.
+        self.http = http_pool if http_pool is not None else get_session_pool()
+        self.async_http = async_http_pool if async_http_pool is not None else get_async_session_pool()
+        # Shared endpoint health: open circuits are skipped and the next fallback is tried.
+        self.router = router if router is not None else get_router()
+        # Hedge slow calls against the first fallback (see HEDGE_CONFIG).
+        self.hedge = hedge if hedge is not None else hedging_enabled()
+        self._hf_client = None
+        self._hf_async_clients = weakref.WeakKeyDictionary()
+        self._gemini_pro_model = None
+        self._fallback_clients = {}
+
+        if model_name.startswith("replay/"):
+            # Cassette-backed stand-in for the wrapped model (see paper2agent/llm/replay.py)
+            self.provider = "replay"
+            self.model_name = model_name.replace("replay/", "", 1)
+            self.replay = get_replay_provider(self.model_name)
+        elif model_name.startswith("ollama/"):
             self.provider = "ollama"
             self.model_name = model_name.replace("ollama/", "")
             self.ollama_url = os.environ.get("OLLAMA_URL", "http://localhost:11435/api/chat")
@@ -32,49 +122,358 @@ class LLMClient:
             self.api_key = os.environ.get("GEMINI_API_KEY")
             if not self.api_key:
                 print("Warning: GEMINI_API_KEY not found in environment variables.")
+            import google.generativeai as genai
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(self.model_name)
 
-    def generate(self, prompt: str, system_prompt: Optional[str] = None, retries=3) -> str:
+    @property
+    def endpoint(self) -> str:
+        """Health-tracking key: the Ollama server as a whole, otherwise provider/model."""
+        if self.provider == "ollama":
+            return f"ollama@{self.ollama_url.split('/api/')[0]}"
+        return f"{self.provider}/{self.model_name}"
+
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, retries=3, use_cache=True,
+                 role: Optional[str] = None) -> str:
         """
-        Generates text using the configured LLM provider.
+        Generates text using the configured LLM provider, failing over along
+        MODEL_CONFIG["fallbacks"]; raises LLMProviderError if every option fails.
+        Pass use_cache=False to bypass the response cache and force a fresh sample.
+        `role` (e.g. "synthesizer", "grounding") labels the call in telemetry.
         """
+        with telemetry.track(self.provider, self.model_name, role, self._prompt_tokens(prompt, system_prompt)) as record:
+            if self.cache is None or not use_cache:
+                record.response = self._generate_uncached(prompt, system_prompt, retries)
+                return record.response
+
+            key = self._cache_key(prompt, system_prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record.cache_hit, record.response = True, cached
+                return cached
+
+            provider, model_name = self.provider, self.model_name
+            record.response = self._generate_uncached(prompt, system_prompt, retries)
+            self._cache_put(key, record.response, provider, model_name)
+            return record.response
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None, retries=3, use_cache=True,
+                        role: Optional[str] = None) -> str:
+        """
+        Async variant of generate(): same caching, retries and fallback chain, but
+        awaits the provider instead of blocking the thread. Concurrency per provider
+        is capped by a semaphore (see PROVIDER_CONCURRENCY / set_provider_concurrency).
+        """
+        with telemetry.track(self.provider, self.model_name, role, self._prompt_tokens(prompt, system_prompt)) as record:
+            if self.cache is None or not use_cache:
+                record.response = await self._agenerate_uncached(prompt, system_prompt, retries)
+                return record.response
+
+            key = self._cache_key(prompt, system_prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record.cache_hit, record.response = True, cached
+                return cached
+
+            provider, model_name = self.provider, self.model_name
+            record.response = await self._agenerate_uncached(prompt, system_prompt, retries)
+            self._cache_put(key, record.response, provider, model_name)
+            return record.response
+
+    def generate_many(self, prompts: List[str], system_prompt: Optional[str] = None, max_concurrency: Optional[int] = None,
+                      retries=3, use_cache=True, role: Optional[str] = None) -> List[BatchResult]:
+        """
+        Runs generate() for each prompt on a bounded thread pool (default: the
+        provider's PROVIDER_CONCURRENCY). Results come back in input order; a
+        failed prompt yields a BatchResult with `error` set instead of aborting the batch.
+        """
+        workers = max(1, min(max_concurrency or _concurrency_limits.get(self.provider, 4), len(prompts) or 1))
+
+        def run(index, prompt):
+            start = time.monotonic()
+            try:
+                response = self.generate(prompt, system_prompt=system_prompt, retries=retries, use_cache=use_cache, role=role)
+                return BatchResult(index, prompt, response=response, elapsed=time.monotonic() - start)
+            except Exception as e:
+                return BatchResult(index, prompt, error=e, elapsed=time.monotonic() - start)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as pool:
+            return list(pool.map(run, range(len(prompts)), prompts))
+
+    async def agenerate_many(self, prompts: List[str], system_prompt: Optional[str] = None, max_concurrency: Optional[int] = None,
+                             retries=3, use_cache=True, role: Optional[str] = None) -> List[BatchResult]:
+        """Async variant of generate_many(): one task per prompt, at most max_concurrency in flight."""
+        limit = asyncio.Semaphore(max(1, max_concurrency or _concurrency_limits.get(self.provider, 4)))
+
+        async def run(index, prompt):
+            async with limit:
+                start = time.monotonic()
+                try:
+                    response = await self.agenerate(prompt, system_prompt=system_prompt, retries=retries, use_cache=use_cache, role=role)
+                    return BatchResult(index, prompt, response=response, elapsed=time.monotonic() - start)
+                except Exception as e:
+                    return BatchResult(index, prompt, error=e, elapsed=time.monotonic() - start)
+
+        return list(await asyncio.gather(*(run(i, prompt) for i, prompt in enumerate(prompts))))
+
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None, retries=3, use_cache=True,
+                        role: Optional[str] = None) -> Iterator[str]:
+        """
+        Yields the response incrementally as the provider produces it.
+        If the stream cannot be opened, falls back to generate()'s retry/fallback
+        chain and yields its answer as a single chunk. Cache hits arrive as one chunk.
+        """
+        # The record is only made current while provider code runs, never across a yield.
+        record = telemetry.CallRecord(self.provider, self.model_name, role, streamed=True)
+        chunks = []
         try:
-             if self.provider == "ollama":
-                  return self._generate_ollama(prompt, system_prompt, retries)
+            key = None
+            if self.cache is not None and use_cache:
+                key = self._cache_key(prompt, system_prompt)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    record.cache_hit, record.response = True, cached
+                    yield cached
+                    return
+
+            provider, model_name = self.provider, self.model_name
+            streamed = self.router.available(self)
+            if streamed:
+                health = self.router.health(self.endpoint)
+                start = time.monotonic()
+                try:
+                    with telemetry.activate(record):
+                        stream = self._stream_provider(prompt, system_prompt)
+                    while True:
+                        with telemetry.activate(record):
+                            chunk = next(stream, None)
+                        if chunk is None:
+                            break
+                        record.first_byte()
+                        chunks.append(chunk)
+                        yield chunk
+                    health.record_success(time.monotonic() - start)
+                    record.served_by = f"{self.provider}/{self.model_name}"
+                except Exception as e:
+                    health.record_failure()
+                    if chunks:
+                        # Part of the answer is already with the caller; a retry would duplicate it.
+                        raise
+                    print(f"LLM Streaming Error ({self.provider}): {e}. Retrying without streaming...")
+                    streamed = False
+
+            if not streamed:
+                with telemetry.activate(record):
+                    response = self._generate_uncached(prompt, system_prompt, retries)
+                record.first_byte()
+                chunks.append(response)
+                yield response
+
+            record.response = "".join(chunks)
+            if key is not None:
+                self._cache_put(key, record.response, provider, model_name)
+        except Exception as e:
+            record.fail(e)
+            raise
+        finally:
+            if record.response is None:
+                record.response = "".join(chunks)
+            telemetry.complete(record, self._prompt_tokens(prompt, system_prompt))
+
+    def generate_json(self, prompt: str, system_prompt: Optional[str] = None, schema: Optional[dict] = None,
+                      retries=3, use_cache=True, role: Optional[str] = None):
+        """
+        Generates a JSON value, parsed. `schema` (a JSON Schema dict; None = any JSON
+        object) is enforced through the provider's native structured-output mode
+        (Ollama `format`, OpenRouter `response_format`, Gemini `response_schema`,
+        HF TGI `grammar`). Providers without one are streamed through
+        JsonStreamExtractor, which stops reading once the object closes.
+        Raises JSONExtractionError if no JSON can be recovered from the answer.
+        """
+        with json_mode(schema):
+            if self.provider in NATIVE_JSON_PROVIDERS:
+                return extract_json(self.generate(prompt, system_prompt, retries=retries, use_cache=use_cache, role=role))
+
+            extractor = JsonStreamExtractor()
+            stream = self.generate_stream(prompt, system_prompt, retries=retries, use_cache=use_cache, role=role)
+            try:
+                for chunk in stream:
+                    if extractor.feed(chunk) is not None:
+                        return extractor.value
+            finally:
+                stream.close()
+            return extract_json(extractor.buffer)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the attached response cache (empty if caching is off)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def router_stats(self) -> dict:
+        """Circuit state, error rate and latency percentiles per endpoint."""
+        return self.router.stats()
+
+    def hedge_stats(self) -> dict:
+        """How often calls from this endpoint were hedged and how often the hedge won."""
+        return get_hedge_stats(self.endpoint).stats()
+
+    def fallback_chain(self) -> list:
+        """This client followed by the configured fallbacks (MODEL_CONFIG["fallbacks"])."""
+        fallbacks = MODEL_CONFIG.get("fallbacks", {})
+        specs = fallbacks.get(self.model_spec) or fallbacks.get(self.provider) or []
+        return [self] + [self._get_fallback(spec) for spec in specs if spec != self.model_spec]
+
+    def _get_fallback(self, spec: str) -> "LLMClient":
+        if spec not in self._fallback_clients:
+            # Own instance rather than get_client(): it must share this client's cache, pools and router.
+            self._fallback_clients[spec] = LLMClient(spec, cache=self.cache, http_pool=self.http,
+                                                     async_http_pool=self.async_http, router=self.router,
+                                                     hedge=False)
+        return self._fallback_clients[spec]
+
+    def connection_stats(self) -> dict:
+        """Request/connection counters of the shared HTTP pool (reused = requests - opened)."""
+        return self.http.stats()
+
+    def rate_limit_stats(self) -> dict:
+        """Queue-wait metrics of this client's provider/model rate limiter."""
+        return self._limiter().stats()
+
+    def _cache_key(self, prompt: str, system_prompt: Optional[str]) -> str:
+        params = self._sampling_params()
+        schema = active_schema()
+        if schema is not None:
+            params["json_schema"] = schema
+        return ResponseCache.make_key(self.provider, self.model_name, system_prompt, prompt, params)
+
+    def _cache_put(self, key: str, response: str, provider: str, model_name: str):
+        # Provider failures raise LLMProviderError; still never persist error-looking text.
+        if response and not response.startswith("Error"):
+            self.cache.put(key, response, provider=provider, model=model_name)
+
+    def _sampling_params(self) -> dict:
+        return dict(SAMPLING_DEFAULTS.get(self.provider, {}))
+
+    def _limiter(self) -> RateLimiter:
+        return get_rate_limiter(self.provider, self.model_name)
+
+
+    def _begin_attempt(self, tokens: int, attempt: int):
+        """Waits for the rate limiter, then counts the attempt (and the wait) in telemetry."""
+        telemetry.note_attempt(attempt, self._limiter().acquire(tokens))
+
+    async def _abegin_attempt(self, tokens: int, attempt: int):
+        telemetry.note_attempt(attempt, await self._limiter().aacquire(tokens))
+
+    def _prompt_tokens(self, prompt: str, system_prompt: Optional[str]) -> int:
+        # Prompt tokens for this model family (also what telemetry reports without provider usage)
+        return count_tokens(prompt, self.model_name) + count_tokens(system_prompt, self.model_name)
+
+    def _estimate_tokens(self, prompt: str, system_prompt: Optional[str]) -> int:
+        # Prompt tokens, plus the completion budget when the provider has one
+        return self._prompt_tokens(prompt, system_prompt) + self._sampling_params().get("max_new_tokens", 0)
+
+    def _throttled(self, error: Exception, attempt: int, retries: int) -> bool:
+        """
+        If `error` is a 429, tells every caller of this provider/model to hold off
+        (Retry-After or jittered backoff); the next acquire() does the waiting.
+        """
+        if not is_rate_limit_error(error):
+            return False
+        delay = self._limiter().penalize(retry_after_from_error(error), attempt)
+        print(f"LLM Rate Limit (429) from {self.provider}. Holding off {delay:.1f}s before retry {attempt + 1}/{retries}...")
+        return True
+
+    def _generate_uncached(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        partner = self._hedge_partner()
+        if partner is not None and not _loop_running():
+            # On the shared background loop: async SDK clients stay bound to the loop they first used
+            return run_sync(self._agenerate_hedged(partner, prompt, system_prompt, retries))
+        return self.router.call(self, lambda client: client._call_provider(prompt, system_prompt, retries))
+
+    async def _agenerate_uncached(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        partner = self._hedge_partner()
+        if partner is not None:
+            return await self._agenerate_hedged(partner, prompt, system_prompt, retries)
+        return await self.router.acall(self, lambda client: client._acall_provider(prompt, system_prompt, retries))
+
+    def _hedge_partner(self) -> Optional["LLMClient"]:
+        """The secondary for a hedged call, or None when hedging is off or pointless."""
+        if not self.hedge:
+            return None
+        chain = self.fallback_chain()
+        if len(chain) < 2 or not self.router.available(self) or not self.router.available(chain[1]):
+            # With either side's circuit open the plain router chain already does the right thing.
+            return None
+        return chain[1]
+
+    async def _agenerate_hedged(self, partner: "LLMClient", prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        call = lambda client: client._acall_provider(prompt, system_prompt, retries)
+        delay = hedge_delay(self.router.health(self.endpoint))
+        stats = get_hedge_stats(self.endpoint)
+        try:
+            result, winner, hedged = await race(lambda: self.router.acall_one(self, call),
+                                                lambda: self.router.acall_one(partner, call), delay)
+        except LLMProviderError:
+            telemetry.note_hedge({"hedged": True, "winner": None, "delay_seconds": round(delay, 3)})
+            stats.record(True, None)
+            raise
+        # Kept on the call's telemetry record: this client is shared across threads and tasks
+        telemetry.note_hedge({"hedged": hedged, "winner": winner, "delay_seconds": round(delay, 3),
+                              "endpoint": partner.endpoint if winner == "hedge" else self.endpoint})
+        stats.record(hedged, winner)
+        if winner == "hedge":
+            print(f"LLM Hedge: {partner.endpoint} answered before {self.endpoint} (deadline {delay:.1f}s)")
+        return result
+
+    def _call_provider(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        """Calls this client's own provider only (no fallback); raises on failure."""
+        if self.provider == "replay":
+             return self.replay.generate(prompt, system_prompt, retries)
+        elif self.provider == "ollama":
+             return self._generate_ollama(prompt, system_prompt, retries)
+        elif self.provider == "huggingface":
+             return self._generate_huggingface(prompt, system_prompt, retries)
+        elif self.provider == "openrouter":
+             return self._generate_openrouter(prompt, system_prompt, retries)
+        return self._generate_gemini(prompt, system_prompt, retries)
+
+    async def _acall_provider(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        async with _provider_semaphore(self.provider):
+             if self.provider == "replay":
+                  return await self.replay.agenerate(prompt, system_prompt, retries)
+             elif self.provider == "ollama":
+                  return await self._agenerate_ollama(prompt, system_prompt, retries)
              elif self.provider == "huggingface":
-                  return self._generate_huggingface(prompt, system_prompt, retries)
+                  return await self._agenerate_huggingface(prompt, system_prompt, retries)
              elif self.provider == "openrouter":
-                  return self._generate_openrouter(prompt, system_prompt, retries)
-             else:
-                  return self._generate_gemini(prompt, system_prompt, retries)
-        except Exception as e:
-             print(f"LLM Provider Error ({self.provider}): {e}")
-             # Fallback Logic
-             if self.provider == "gemini":
-                  print("Gemini Failed. Switching to Fallback Provider (OpenRouter)...")
-                  # Fallback model for OpenRouter is hardcoded in _generate_openrouter,
-                  # so we don't necessarily set self.model_name unless we want to persist it.
-                  # But _generate_openrouter handles it.
-                  return self._generate_openrouter(prompt, system_prompt, retries)
-             elif self.provider != "gemini":
-                  # Try Gemini as second fallback
-                  print("Switching to Fallback Provider (Gemini)...")
-                  try:
-                      # Switch internal model state for Gemini
-                      self.model_name = "gemini-2.0-flash"
-                      self.provider = "gemini"
-                      if not hasattr(self, 'model') or self.model.model_name != "models/gemini-2.0-flash":
-                           genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-                           self.model = genai.GenerativeModel("gemini-2.0-flash")
-                           
-                      return self._generate_gemini(prompt, system_prompt, retries)
-                  except Exception as e2:
-                      print(f"Fallback to Gemini also failed: {e2}")
-                      pass
-             raise e
+                  return await self._agenerate_openrouter(prompt, system_prompt, retries)
+             return await self._agenerate_gemini(prompt, system_prompt, retries)
 
-    def _generate_openrouter(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+    def _fail_fast(self, error: Exception):
+        # A refused/unreachable endpoint won't recover within this call; let the router fail over now.
+        if is_unreachable_error(error):
+            raise LLMProviderError(f"{self.endpoint} unreachable: {error}") from error
+
+    def _stream_provider(self, prompt: str, system_prompt: Optional[str]) -> Iterator[str]:
+        self._begin_attempt(self._estimate_tokens(prompt, system_prompt), 0)
+        if self.provider == "replay":
+             return self.replay.stream(prompt, system_prompt)
+        elif self.provider == "ollama":
+             return self._stream_ollama(prompt, system_prompt)
+        elif self.provider == "huggingface":
+             return self._stream_huggingface(prompt, system_prompt)
+        elif self.provider == "openrouter":
+             return self._stream_openrouter(prompt, system_prompt)
+        return self._stream_gemini(prompt, system_prompt)
+
+    def _chat_messages(self, prompt: str, system_prompt: Optional[str]) -> list:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _openrouter_request(self, prompt: str, system_prompt: Optional[str]):
         api_key = os.environ.get("OPENROUTER_API_KEY")
         if not api_key:
              raise ValueError("OPENROUTER_API_KEY not found for fallback.")
@@ -85,31 +484,83 @@ class LLMClient:
             "HTTP-Referer": "https://paper2agent.local", # OpenRouter Requirement
             "X-Title": "Paper2Agent"
         }
-        
-        # Use the specified model or fallback
-        model = self.model_name if hasattr(self, 'model_name') and self.model_name else "google/gemini-2.0-flash-001" 
 
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-        
         payload = {
-            "model": model,
-            "messages": messages
+            "model": self.model_name,
+            "messages": self._chat_messages(prompt, system_prompt)
         }
-        
+        schema = active_schema()
+        if schema:
+            payload["response_format"] = {"type": "json_schema",
+                                          "json_schema": {"name": "response", "strict": True, "schema": schema}}
+        elif schema is not None:
+            payload["response_format"] = {"type": "json_object"}
+        return headers, payload
+
+    @staticmethod
+    def _note_openai_usage(data: dict):
+        usage = data.get("usage") or {}
+        telemetry.note_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+    def _generate_openrouter(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        headers, payload = self._openrouter_request(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
+
         for attempt in range(retries):
             try:
-                resp = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload, timeout=60)
+                self._begin_attempt(tokens, attempt)
+                resp = self.http.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60)
                 resp.raise_for_status()
                 data = resp.json()
+                self._note_openai_usage(data)
                 return data["choices"][0]["message"]["content"]
             except Exception as e:
-                print(f"OpenRouter Fallback Error (Attempt {attempt+1}): {e}")
-                time.sleep(2)
-        
-        raise Exception("OpenRouter Fallback Failed.")
+                print(f"OpenRouter Error (Attempt {attempt+1}): {e}")
+                self._fail_fast(e)
+                if not self._throttled(e, attempt, retries) and attempt < retries - 1:
+                    time.sleep(backoff_delay(attempt))
+
+        raise LLMProviderError(f"OpenRouter failed for model {self.model_name} after {retries} attempts.")
+
+    async def _agenerate_openrouter(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        headers, payload = self._openrouter_request(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
+
+        for attempt in range(retries):
+            try:
+                await self._abegin_attempt(tokens, attempt)
+                resp = await self.async_http.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60)
+                resp.raise_for_status()
+                data = resp.json()
+                self._note_openai_usage(data)
+                return data["choices"][0]["message"]["content"]
+            except Exception as e:
+                print(f"OpenRouter Error (Attempt {attempt+1}): {e}")
+                self._fail_fast(e)
+                if not self._throttled(e, attempt, retries) and attempt < retries - 1:
+                    await asyncio.sleep(backoff_delay(attempt))
+
+        raise LLMProviderError(f"OpenRouter failed for model {self.model_name} after {retries} attempts.")
+
+    def _stream_openrouter(self, prompt: str, system_prompt: Optional[str]) -> Iterator[str]:
+        headers, payload = self._openrouter_request(prompt, system_prompt)
+        payload["stream"] = True
+
+        # Server-sent events: "data: {json}" lines, ": comment" keep-alives, "data: [DONE]" at the end
+        with self.http.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                line = line.decode("utf-8") if isinstance(line, bytes) else line
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data.strip() == "[DONE]":
+                    break
+                event = json.loads(data)
+                self._note_openai_usage(event)
+                delta = event["choices"][0].get("delta", {}).get("content") if event.get("choices") else None
+                if delta:
+                    yield delta
 
     def validate_connection(self) -> bool:
         """
@@ -117,12 +568,15 @@ class LLMClient:
         """
         try:
              # Just try a simple generation with 1 token max to test connectivity
-             if self.provider == "ollama":
+             if self.provider == "replay":
+                  return self.replay.mode == "record" or len(self.replay.cassette) > 0
+
+             elif self.provider == "ollama":
                   slug_model = self.model_name.rsplit(":", 1)[0] # e.g. qwen2.5-coder
                   # Just check if model is available in list
-                  resp = requests.get(self.ollama_url.replace("/api/chat", "/api/tags"))
+                  resp = self.http.get(self.ollama_url.replace("/api/chat", "/api/tags"), timeout=OLLAMA_CONNECT_TIMEOUT)
                   return slug_model in resp.text
-                  
+
              elif self.provider == "huggingface":
                   # Verification via Model Info (Auth Check)
                   # Inference might be limited for VLMs, but this proves Access.
@@ -134,11 +588,11 @@ class LLMClient:
                   except Exception as e:
                        print(f"HF Validation Failed: {e}")
                        return False
-                  
+
              elif self.provider == "openrouter":
                   if not os.environ.get("OPENROUTER_API_KEY"): return False
                   return True
-                  
+
              else: # Gemini
                   if not os.environ.get("GEMINI_API_KEY"): return False
                   # Minimal gen test
@@ -147,15 +601,10 @@ class LLMClient:
         except:
              return False
 
-    def _generate_huggingface(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
-        # Use huggingface_hub for robust auth (CLI or Token)
-
-        # If model name starts with "huggingface/", strip it if preferred, 
+    def _hf_input(self, prompt: str, system_prompt: Optional[str]):
+        # If model name starts with "huggingface/", strip it if preferred,
         # but InferenceClient handles standard repo IDs (e.g. google/medgemma-4b-it)
         repo_id = self.model_name.replace("huggingface/", "")
-        
-        # Token priority: Explicit (self.hf_token) -> Environment -> CLI Cache (Automatic)
-        client = InferenceClient(token=self.hf_token or None)
 
         full_input = prompt
         # MedGemma / Gemma Formatting
@@ -166,139 +615,435 @@ class LLMClient:
              full_input = f"<start_of_turn>user\n{sys_part}{prompt}<end_of_turn>\n<start_of_turn>model\n"
         elif system_prompt:
              full_input = f"{system_prompt}\n\n{prompt}"
+        return repo_id, full_input
+
+    def _hf_raw_request(self, repo_id: str, full_input: str):
+        # Router URL first, then the standard Inference API
+        token = self.hf_token
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        payload = {"inputs": full_input, "parameters": {**self._sampling_params(), **self._hf_json_params(), "return_full_text": False}}
+        urls = [
+            ("HF Router", f"https://router.huggingface.co/hf-inference/models/{repo_id}"),
+            ("HF Inference API", f"https://api-inference.huggingface.co/models/{repo_id}"),
+        ]
+        return urls, headers, payload
+
+    @staticmethod
+    def _hf_json_params() -> dict:
+        # TGI grammar-constrained decoding; {"type": "object"} when any JSON object will do
+        schema = active_schema()
+        if schema is None:
+            return {}
+        return {"grammar": {"type": "json", "value": schema or {"type": "object"}}}
+
+    @staticmethod
+    def _hf_raw_text(resp) -> str:
+        try:
+             # Response is list of dicts: [{'generated_text': '...'}]
+             return resp.json()[0]["generated_text"]
+        except:
+             return resp.text
+
+    @staticmethod
+    def _hf_needs_raw_fallback(error_str: str) -> bool:
+        # VLM "image-text-to-text" error or 404/410 from InferenceClient
+        return "image-text-to-text" in error_str or "404" in error_str or "410" in error_str
+
+    def _generate_huggingface(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        # Use huggingface_hub for robust auth (CLI or Token)
+        repo_id, full_input = self._hf_input(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
 
         for attempt in range(retries):
             try:
+                self._begin_attempt(tokens, attempt)
                 # Text Generation
                 # We use the generic query or text_generation helper
                 # Explicitly pass token to ensure auth for gated models
                 # Force provider="hf-inference" to avoid StopIteration on some models
-                client = InferenceClient(token=self.hf_token, provider="hf-inference") 
+                client = self._get_hf_client()
                 response = client.text_generation(
-                     full_input, 
+                     full_input,
                      model=repo_id,
-                     max_new_tokens=512, 
-                     temperature=0.2,
-                     return_full_text=False
+                     return_full_text=False,
+                     **self._sampling_params(),
+                     **self._hf_json_params()
                 )
                 return response
-                
+
             except Exception as e:
+                self._fail_fast(e)
                 error_str = str(e)
-                # Handle VLM "image-text-to-text" error or 404/410 for InferenceClient
-                if "image-text-to-text" in error_str or "404" in error_str or "410" in error_str:
+                if self._hf_needs_raw_fallback(error_str):
                      print(f"HF InferenceClient Error ({e}). Falling back to Raw HTTP for VLM/Gated...")
-                     # Try Router URL first, then Inference URL
-                     token = self.hf_token
-                     headers = {"Authorization": f"Bearer {token}"} if token else {}
-                     payload = {"inputs": full_input, "parameters": {"max_new_tokens": 512, "temperature": 0.2, "return_full_text": False}}
-                     
-                     # 1. Try Router
-                     router_url = f"https://router.huggingface.co/hf-inference/models/{repo_id}"
-                     try:
-                          resp = requests.post(router_url, headers=headers, json=payload, timeout=30)
-                          if resp.status_code == 200:
-                               try:
-                                    # Response is list of dicts: [{'generated_text': '...'}]
-                                    return resp.json()[0]["generated_text"]
-                               except:
-                                    return resp.text
-                     except Exception as req_e:
-                          print(f"HF Router Fallback failed: {req_e}")
-                               
-                     # 2. Try Standard Inference API
-                     api_url = f"https://api-inference.huggingface.co/models/{repo_id}"
-                     try:
-                          resp = requests.post(api_url, headers=headers, json=payload, timeout=30)
-                          if resp.status_code == 200:
-                               try:
-                                    return resp.json()[0]["generated_text"]
-                               except:
-                                    return resp.text
-                     except Exception as req_e:
-                          print(f"HF Inference API Fallback failed: {req_e}")
-                               
+                     urls, headers, payload = self._hf_raw_request(repo_id, full_input)
+                     resp = None
+                     for label, url in urls:
+                          try:
+                               resp = self.http.post(url, headers=headers, json=payload, timeout=30)
+                               if resp.status_code == 200:
+                                    return self._hf_raw_text(resp)
+                          except Exception as req_e:
+                               print(f"{label} Fallback failed: {req_e}")
+
                      print(f"VLM Fallback Failed for {repo_id}. Last response status: {getattr(resp, 'status_code', 'N/A')} - {getattr(resp, 'text', 'N/A')}")
                      # If fallback also fails, proceed to general error handling
-                     
+
                 # Handle 503 (Loading) specially if needed, mostly InferenceClient handles basic retries
                 if "503" in error_str:
                      print(f"HF Model Loading ({repo_id})... waiting 20s")
                      time.sleep(20)
                      continue
-                     
+
+                if self._throttled(e, attempt, retries):
+                     continue
+
                 print(f"HF Error (Attempt {attempt+1}/{retries}): {e}")
                 if attempt == retries - 1:
                     raise e
                 time.sleep(2)
-        return "Error: HF generation failed."
+        raise LLMProviderError(f"HF generation failed for {self.model_name}.")
 
-    def _generate_ollama(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+    def _stream_huggingface(self, prompt: str, system_prompt: Optional[str]) -> Iterator[str]:
+        repo_id, full_input = self._hf_input(prompt, system_prompt)
+        tokens = self._get_hf_client().text_generation(
+             full_input,
+             model=repo_id,
+             return_full_text=False,
+             stream=True,
+             **self._sampling_params(),
+             **self._hf_json_params()
+        )
+        for token in tokens:
+            if token:
+                yield token
+
+    async def _agenerate_huggingface(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        repo_id, full_input = self._hf_input(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
+
+        for attempt in range(retries):
+            try:
+                await self._abegin_attempt(tokens, attempt)
+                client = self._get_hf_async_client()
+                response = await client.text_generation(
+                     full_input,
+                     model=repo_id,
+                     return_full_text=False,
+                     **self._sampling_params(),
+                     **self._hf_json_params()
+                )
+                return response
+
+            except Exception as e:
+                self._fail_fast(e)
+                error_str = str(e)
+                if self._hf_needs_raw_fallback(error_str):
+                     print(f"HF InferenceClient Error ({e}). Falling back to Raw HTTP for VLM/Gated...")
+                     urls, headers, payload = self._hf_raw_request(repo_id, full_input)
+                     resp = None
+                     for label, url in urls:
+                          try:
+                               resp = await self.async_http.post(url, headers=headers, json=payload, timeout=30)
+                               if resp.status_code == 200:
+                                    return self._hf_raw_text(resp)
+                          except Exception as req_e:
+                               print(f"{label} Fallback failed: {req_e}")
+
+                     print(f"VLM Fallback Failed for {repo_id}. Last response status: {getattr(resp, 'status_code', 'N/A')} - {getattr(resp, 'text', 'N/A')}")
+
+                if "503" in error_str:
+                     print(f"HF Model Loading ({repo_id})... waiting 20s")
+                     await asyncio.sleep(20)
+                     continue
+
+                if self._throttled(e, attempt, retries):
+                     continue
+
+                print(f"HF Error (Attempt {attempt+1}/{retries}): {e}")
+                if attempt == retries - 1:
+                    raise e
+                await asyncio.sleep(2)
+        raise LLMProviderError(f"HF generation failed for {self.model_name}.")
+
+    def _get_hf_client(self) -> "InferenceClient":
+        # Built once per LLMClient; the SDK keeps its own connection pool underneath.
+        # Token priority: Explicit (self.hf_token) -> Environment -> CLI Cache (Automatic)
+        if self._hf_client is None:
+            from huggingface_hub import InferenceClient
+            self._hf_client = InferenceClient(token=self.hf_token or None, provider="hf-inference")
+        return self._hf_client
 
+    def _get_hf_async_client(self) -> "AsyncInferenceClient":
+        # The async SDK client holds an httpx session bound to the running loop.
+        loop = asyncio.get_running_loop()
+        client = self._hf_async_clients.get(loop)
+        if client is None:
+            from huggingface_hub import AsyncInferenceClient
+            client = AsyncInferenceClient(token=self.hf_token or None, provider="hf-inference")
+            self._hf_async_clients[loop] = client
+        return client
+
+    def warm_up(self, keep_alive=None) -> Optional[float]:
+        """
+        Loads an Ollama model into memory ahead of its first request (an empty
+        /api/generate call) and keeps it resident for `keep_alive` (default:
+        OLLAMA_KEEP_ALIVE["warmup"]). Returns the server-side load time in seconds
+        (~0 if it was already loaded); None for providers that need no warm-up.
+        """
+        if self.provider != "ollama":
+            return None
+        url = self.ollama_url.split("/api/")[0] + "/api/generate"
+        payload = {"model": self.model_name, "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE["warmup"]}
+        with telemetry.track(self.provider, self.model_name, "warmup", 0) as record:
+            response = self.http.post(url, json=payload,
+                                      timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_WARMUP_CONFIG["timeout_seconds"]))
+            response.raise_for_status()
+            self._note_ollama_usage(response.json())
+            record.response = ""
+            return record.load_seconds or 0.0
+
+    @staticmethod
+    def _ollama_keep_alive():
+        # Keep-alive follows the role of the call in progress (see OLLAMA_KEEP_ALIVE).
+        record = telemetry.current()
+        role = record.role if record is not None else None
+        return OLLAMA_KEEP_ALIVE.get(role, OLLAMA_KEEP_ALIVE["default"])
+
+    @staticmethod
+    def _note_ollama_usage(result: dict):
+        # Durations are reported in nanoseconds; load_duration is the cold-start cost.
+        telemetry.note_usage(result.get("prompt_eval_count"), result.get("eval_count"))
+        load = result.get("load_duration")
+        generation = [result[key] for key in ("prompt_eval_duration", "eval_duration") if result.get(key) is not None]
+        telemetry.note_timings(load / 1e9 if load is not None else None,
+                               sum(generation) / 1e9 if generation else None)
+
+    def _ollama_payload(self, prompt: str, system_prompt: Optional[str]) -> dict:
         payload = {
             "model": self.model_name,
-            "messages": messages,
+            "messages": self._chat_messages(prompt, system_prompt),
             "stream": False,
-            "options": {
-                "temperature": 0.2  # Low temp for coding/reasoning
-            }
+            "options": self._sampling_params(),
+            "keep_alive": self._ollama_keep_alive()
         }
+        schema = active_schema()
+        if schema is not None:
+            # A schema constrains decoding to it; "json" just forces well-formed JSON
+            payload["format"] = schema or "json"
+        return payload
+
+    def _generate_ollama(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        payload = self._ollama_payload(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
 
         for attempt in range(retries):
             try:
-                response = requests.post(self.ollama_url, json=payload, timeout=120)
+                self._begin_attempt(tokens, attempt)
+                response = self.http.post(self.ollama_url, json=payload, timeout=(OLLAMA_CONNECT_TIMEOUT, 120))
                 response.raise_for_status()
                 result = response.json()
+                self._note_ollama_usage(result)
                 return result.get("message", {}).get("content", "")
             except Exception as e:
                 print(f"Ollama Error (Attempt {attempt+1}/{retries}) for model '{self.model_name}': {e}")
+                self._fail_fast(e)
                 if attempt == retries - 1:
-                    return f"Error: Ollama generation failed. {str(e)}"
+                    raise LLMProviderError(f"Ollama generation failed. {str(e)}") from e
                 time.sleep(2)
-        return f"Error: Ollama failed for model {self.model_name}."
+        raise LLMProviderError(f"Ollama failed for model {self.model_name}.")
 
-    def _generate_gemini(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+    def _stream_ollama(self, prompt: str, system_prompt: Optional[str]) -> Iterator[str]:
+        payload = self._ollama_payload(prompt, system_prompt)
+        payload["stream"] = True
+
+        # Newline-delimited JSON, one message fragment per line
+        with self.http.post(self.ollama_url, json=payload, timeout=(OLLAMA_CONNECT_TIMEOUT, 120), stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise Exception(data["error"])
+                content = data.get("message", {}).get("content", "")
+                if content:
+                    yield content
+                if data.get("done"):
+                    self._note_ollama_usage(data)
+                    break
+
+    async def _agenerate_ollama(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        import httpx  # Loaded with the async session pool's first client anyway
+
+        payload = self._ollama_payload(prompt, system_prompt)
+        tokens = self._estimate_tokens(prompt, system_prompt)
+
+        for attempt in range(retries):
+            try:
+                await self._abegin_attempt(tokens, attempt)
+                response = await self.async_http.post(self.ollama_url, json=payload, timeout=httpx.Timeout(120, connect=OLLAMA_CONNECT_TIMEOUT))
+                response.raise_for_status()
+                result = response.json()
+                self._note_ollama_usage(result)
+                return result.get("message", {}).get("content", "")
+            except Exception as e:
+                print(f"Ollama Error (Attempt {attempt+1}/{retries}) for model '{self.model_name}': {e}")
+                self._fail_fast(e)
+                if attempt == retries - 1:
+                    raise LLMProviderError(f"Ollama generation failed. {str(e)}") from e
+                await asyncio.sleep(2)
+        raise LLMProviderError(f"Ollama failed for model {self.model_name}.")
+
+    def _gemini_prompt(self, prompt: str, system_prompt: Optional[str]) -> str:
         # Safety Check: If we ended up here with a huggingface model, redirect or error
         if any(x in self.model_name.lower() for x in ["huggingface", "medgemma", "openbiollm", "llama"]):
              print(f"CRITICAL ERROR: Gemini Provider received non-Gemini model: {self.model_name}")
-             return f"Error: Configuration Mismatch. Tried to use Gemini provider for {self.model_name}."
+             raise LLMProviderError(f"Configuration Mismatch. Tried to use Gemini provider for {self.model_name}.")
 
         full_prompt = prompt
         if system_prompt:
              full_prompt = f"System Instruction: {system_prompt}\n\nUser Question: {prompt}"
-        
+
         # Ensure model is configured
         if not hasattr(self, 'model'):
+             import google.generativeai as genai
              genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
              # Use 1.5-flash as stable fallback
              self.model = genai.GenerativeModel("gemini-1.5-flash")
+        return full_prompt
+
+    @staticmethod
+    def _gemini_generation_config() -> Optional[dict]:
+        schema = active_schema()
+        if schema is None:
+            return None
+        config = {"response_mime_type": "application/json"}
+        if schema:
+            config["response_schema"] = _gemini_schema(schema)
+        return config
+
+    @staticmethod
+    def _note_gemini_usage(response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            telemetry.note_usage(getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None))
+
+    def _get_gemini_pro_model(self):
+        if self._gemini_pro_model is None:
+            import google.generativeai as genai
+            self._gemini_pro_model = genai.GenerativeModel("gemini-pro")
+        return self._gemini_pro_model
 
+    def _generate_gemini(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        full_prompt = self._gemini_prompt(prompt, system_prompt)
+
+        tokens = self._estimate_tokens(prompt, system_prompt)
         for attempt in range(retries):
             try:
+                self._begin_attempt(tokens, attempt)
                 # 1.5-flash is stable
-                response = self.model.generate_content(full_prompt)
+                response = self.model.generate_content(full_prompt, generation_config=self._gemini_generation_config())
+                self._note_gemini_usage(response)
                 return response.text
             except Exception as e:
                 error_str = str(e)
-                if "429" in error_str or "quota" in error_str.lower():
-                    print(f"LLM Rate Limit (429). Waiting before retry {attempt + 1}/{retries}...")
-                    time.sleep(10 * (attempt + 1)) 
+                if self._throttled(e, attempt, retries):
+                    continue
                 elif "404" in error_str and "not found" in error_str:
                      # Try Pro if flash fails
                      try:
                          print("Gemini 1.5 Flash not found, trying Pro...")
-                         pro_model = genai.GenerativeModel("gemini-pro")
-                         return pro_model.generate_content(full_prompt).text
-                     except:
-                         return f"Error: Model not found."
+                         return self._get_gemini_pro_model().generate_content(full_prompt, generation_config=self._gemini_generation_config()).text
+                     except Exception as pro_e:
+                         raise LLMProviderError(f"Gemini model {self.model_name} not found.") from pro_e
                 else:
                     print(f"LLM Generation Error: {e}")
                     if attempt == retries - 1:
-                        return f"Error: {str(e)}"
+                        raise LLMProviderError(str(e)) from e
                     time.sleep(2)
-        
-        return "Error: Failed to generate after retries."
+
+        raise LLMProviderError(f"Gemini failed to generate after {retries} retries.")
+
+    def _stream_gemini(self, prompt: str, system_prompt: Optional[str]) -> Iterator[str]:
+        full_prompt = self._gemini_prompt(prompt, system_prompt)
+
+        for chunk in self.model.generate_content(full_prompt, stream=True, generation_config=self._gemini_generation_config()):
+            # Each chunk carries the running totals; the last one wins.
+            self._note_gemini_usage(chunk)
+            text = chunk.text
+            if text:
+                yield text
+
+    async def _agenerate_gemini(self, prompt: str, system_prompt: Optional[str], retries: int) -> str:
+        full_prompt = self._gemini_prompt(prompt, system_prompt)
+
+        tokens = self._estimate_tokens(prompt, system_prompt)
+        for attempt in range(retries):
+            try:
+                await self._abegin_attempt(tokens, attempt)
+                response = await self.model.generate_content_async(full_prompt, generation_config=self._gemini_generation_config())
+                self._note_gemini_usage(response)
+                return response.text
+            except Exception as e:
+                error_str = str(e)
+                if self._throttled(e, attempt, retries):
+                    continue
+                elif "404" in error_str and "not found" in error_str:
+                     try:
+                         print("Gemini 1.5 Flash not found, trying Pro...")
+                         response = await self._get_gemini_pro_model().generate_content_async(
+                             full_prompt, generation_config=self._gemini_generation_config())
+                         return response.text
+                     except Exception as pro_e:
+                         raise LLMProviderError(f"Gemini model {self.model_name} not found.") from pro_e
+                else:
+                    print(f"LLM Generation Error: {e}")
+                    if attempt == retries - 1:
+                        raise LLMProviderError(str(e)) from e
+                    await asyncio.sleep(2)
+
+        raise LLMProviderError(f"Gemini failed to generate after {retries} retries.")
+
+
+def _gemini_schema(schema):
+    """Reduces a JSON Schema to the subset Gemini's response_schema accepts."""
+    if isinstance(schema, list):
+        return [_gemini_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    reduced = {}
+    for key in _GEMINI_SCHEMA_KEYS:
+        if key not in schema:
+            continue
+        if key == "properties":
+            reduced[key] = {name: _gemini_schema(sub) for name, sub in schema[key].items()}
+        elif key == "items":
+            reduced[key] = _gemini_schema(schema[key])
+        else:
+            reduced[key] = schema[key]
+    return reduced
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(model_name: str = "gemini-2.0-flash") -> LLMClient:
+    """
+    Returns the process-wide LLMClient for `model_name`, building it on first use.
+    Clients are stateless between calls, so agents can share them across threads
+    and pick a model per request instead of constructing (and re-configuring) new ones.
+    With PAPER2AGENT_LLM_REPLAY set, the client is the replay/ stand-in for `model_name`.
+    """
+    if replay_mode() and not model_name.startswith("replay/"):
+        model_name = f"replay/{model_name}"
+    client = _clients.get(model_name)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            client = LLMClient(model_name)
+            _clients[model_name] = client
+        return client
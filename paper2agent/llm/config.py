@@ -14,5 +14,201 @@ MODEL_CONFIG = {
     "default": "gemini-2.0-flash",
     "ollama": "ollama/deepseek-r1:8b",
     # OpenRouter alternatives
-    "openrouter_fallback": "openrouter/anthropic/claude-3-haiku"
+    "openrouter_fallback": "openrouter/anthropic/claude-3-haiku",
+    # Fallback chains, tried in order when a model fails or its circuit is open.
+    # Keys are a full model name or a provider; the model entry wins.
+    "fallbacks": {
+        "gemini": ["openrouter/google/gemini-2.0-flash-001"],
+        "ollama": ["gemini-2.0-flash"],
+        "huggingface": ["gemini-2.0-flash"],
+        "openrouter": ["gemini-2.0-flash"],
+    },
+}
+
+# Opt-in persistent response cache for LLMClient.generate.
+# Enable with PAPER2AGENT_LLM_CACHE=1 (PAPER2AGENT_LLM_CACHE_PATH overrides "path").
+LLM_CACHE_CONFIG = {
+    "enabled": False,
+    "path": "./llm_cache/responses.sqlite3",
+    "max_entries": 10000,
+    "max_bytes": 256 * 1024 * 1024,
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+# Keep-alive HTTP pooling shared by all LLMClients (one session per provider base URL).
+HTTP_POOL_CONFIG = {
+    "pool_connections": 10,  # Host pools kept per session
+    "pool_maxsize": 16,  # Max connections per host
+    "pool_block": True,  # Wait for a free connection instead of exceeding pool_maxsize
+}
+
+# Max in-flight LLMClient.agenerate calls per provider (per event loop).
+# Adjust at runtime with paper2agent.llm.client.set_provider_concurrency().
+PROVIDER_CONCURRENCY = {
+    "ollama": 2,  # Local GPU; more parallel requests just queue inside Ollama
+    "huggingface": 4,
+    "openrouter": 8,
+    "gemini": 8,
+    "replay": 32,  # Cassette lookups; only the injected latency is waited on
+}
+
+# Client-side rate limits (requests / tokens per minute), shared by every
+# thread and async task in the process. "provider/model" entries override
+# the provider-wide default; providers without an entry are only throttled
+# after they answer 429.
+RATE_LIMITS = {
+    "gemini": {"rpm": 15, "tpm": 1_000_000},  # Free tier
+    "openrouter": {"rpm": 20},
+    "huggingface": {"rpm": 30},
+}
+
+# Circuit breakers for the provider router (see paper2agent/llm/router.py).
+ROUTER_CONFIG = {
+    "window": 20,  # Recent calls kept per endpoint for error rate / latency
+    "min_calls": 5,  # Calls needed before the error rate can open a circuit
+    "failure_threshold": 3,  # Consecutive failures that open a circuit
+    "error_rate_threshold": 0.5,
+    "cooldown_seconds": 30.0,  # Wait before probing an open circuit (doubles on failed probes)
+    "max_cooldown_seconds": 300.0,
+}
+
+# Ollama runs locally: a refused/hung connect means the server is down, not busy.
+OLLAMA_CONNECT_TIMEOUT = 3.0
+
+# Local model residency. An Orchestrator built with warm_up=True (the UI and
+# `run`) starts loading the Ollama models behind these MODEL_CONFIG roles on
+# background threads (disable with PAPER2AGENT_LLM_WARMUP=0), so the first
+# skill miss doesn't pay the model load. Only the synthesis-path roles.
+OLLAMA_WARMUP_CONFIG = {
+    "enabled": True,
+    "roles": ["synthesizer", "integrity"],
+    "timeout_seconds": 300,  # Loading a large model from disk can take minutes
+}
+
+# How long Ollama keeps a model loaded after a request, by call role (Ollama
+# duration strings, or -1 to keep it loaded indefinitely). Critic roles run in
+# bursts after every draft, so they stay resident longer than Ollama's 5m default.
+OLLAMA_KEEP_ALIVE = {
+    "default": "5m",
+    "warmup": "30m",
+    "synthesizer": "15m",
+    "grounding": "30m",
+    "test-gen": "30m",
+    "reflector": "30m",
+}
+
+# Hedged requests: if the primary hasn't answered by its observed latency
+# percentile, the same prompt also goes to the first model in its
+# MODEL_CONFIG["fallbacks"] chain; the first good answer wins and the other
+# call is cancelled. Enable per client (LLMClient(hedge=True)) or process-wide
+# with PAPER2AGENT_LLM_HEDGE=1.
+HEDGE_CONFIG = {
+    "enabled": False,
+    "percentile": 95,  # Deadline = this percentile of the primary's recent latency
+    "default_delay_seconds": 10.0,  # Deadline until the primary has latency samples
+    "min_delay_seconds": 1.0,
+}
+
+# Approximate list prices in USD per million tokens, for telemetry cost estimates.
+# Keys are "provider/model" (as served) or a provider-wide default.
+LLM_PRICING = {
+    "gemini/gemini-2.0-flash": {"input": 0.10, "output": 0.40},
+    "gemini/gemini-1.5-flash": {"input": 0.075, "output": 0.30},
+    "openrouter/google/gemini-2.0-flash-001": {"input": 0.10, "output": 0.40},
+    "openrouter/meta-llama/llama-3.1-8b-instruct": {"input": 0.02, "output": 0.03},
+    "openrouter/google/gemma-2-9b-it": {"input": 0.03, "output": 0.06},
+    "openrouter/mistralai/mistral-7b-instruct": {"input": 0.03, "output": 0.055},
+    "openrouter/anthropic/claude-3-haiku": {"input": 0.25, "output": 1.25},
+    "ollama": {"input": 0.0, "output": 0.0},  # Local
+    "huggingface": {"input": 0.0, "output": 0.0},  # Free Inference API tier
+}
+
+# Per-call LLM telemetry. Metrics (Prometheus text) are always kept in-process;
+# the JSONL call log is opt-in: PAPER2AGENT_LLM_TELEMETRY=1
+# (PAPER2AGENT_LLM_TELEMETRY_PATH overrides "jsonl_path").
+TELEMETRY_CONFIG = {
+    "jsonl_enabled": False,
+    "jsonl_path": "./llm_telemetry/calls.jsonl",
+    "max_bytes": 10 * 1024 * 1024,  # Rotate the log at this size
+    "backup_count": 5,  # Rotated files kept (calls.jsonl.1 ... .5)
+}
+
+# Offline record/replay provider: "replay/<model>" clients (or every agent
+# client, with PAPER2AGENT_LLM_REPLAY=record|replay) read and write a cassette
+# instead of, or in addition to, calling the real model.
+# PAPER2AGENT_LLM_CASSETTE overrides "cassette".
+REPLAY_CONFIG = {
+    "mode": None,  # "record" | "replay"; None leaves clients untouched
+    "cassette": "./llm_cassettes/default.jsonl",
+    "latency": "none",  # "none" | "recorded" | {"distribution": "lognormal", "median": 1.5, "sigma": 0.5} ...
+    "latency_scale": 1.0,  # Multiplier applied to the injected latency
+    "failure_rate": 0.0,  # Probability that a replayed call raises LLMProviderError
+    "seed": None,  # Seed for latency/failure sampling (set for reproducible load tests)
+}
+
+# Rough characters-per-token by model family (matched as a substring of the
+# model name), used to count prompt tokens without a local tokenizer.
+CHARS_PER_TOKEN = {
+    "gemini": 4.0,
+    "gemma": 4.0,
+    "claude": 3.5,
+    "llama": 3.7,
+    "mistral": 3.5,
+    "qwen": 3.6,
+    "deepseek": 3.6,
+    "default": 4.0,
+}
+
+# Token budgets for prompt sections (see paper2agent/llm/budget.py).
+PROMPT_BUDGETS = {
+    "draft_context": 6000,  # Query + RAG chunks + data context in the drafting/integrity prompts
+    "rag_candidates": 8,  # Chunks retrieved before packing; the budget decides how many survive
+    "extract_chunk": 3000,  # Source code per extract_tools call (larger files are split)
+}
+
+# Best-of-N synthesis (see paper2agent/agents/candidates.py): draft N candidates
+# concurrently, static-check and sandbox-test each as soon as it is drafted, keep
+# the first that passes and cancel the rest. n=1 keeps the single-draft reflexion
+# loop. Override per call (Orchestrator.process_query(candidates=N)) or with
+# PAPER2AGENT_CANDIDATES=N.
+BEST_OF_N_CONFIG = {
+    "n": 1,
+    "models": [],  # MODEL_CONFIG keys or model specs, assigned round-robin; empty = the synthesizer model
+    "max_cost_usd": 0.05,  # Cap on the estimated drafting spend; fewer candidates are launched beyond it
+    "expected_output_tokens": 1500,  # Completion length assumed when estimating a draft's cost
+}
+
+# Tiered skill lookup (see paper2agent/skills/registry.py): exact normalized query,
+# then word overlap with stored queries/descriptions, then vector search. A vector
+# match only counts as a hit within `vector_max_distance` (Chroma's squared L2
+# distance); SkillRegistry.calibrate() fits it to labelled queries and saves it
+# next to the registry. PAPER2AGENT_SKILL_MAX_DISTANCE overrides both.
+SKILL_LOOKUP_CONFIG = {
+    "lexical_min_score": 0.8,  # Jaccard overlap of content words
+    "vector_max_distance": 0.35,
+    # Each skill is embedded once per field; a field's distance is divided by its
+    # weight and the closest field decides (less telling fields must match closer)
+    "field_weights": {"query": 1.0, "docstring": 0.9, "signature": 0.75},
+    "vector_candidates": 12,  # Field matches fetched per vector query before fusing per skill
+}
+
+# Results of re-running stored skills (paper2agent/sandbox/cache.py), keyed by
+# skill code, data file content and interpreter/package set. Only successful runs
+# are kept. PAPER2AGENT_EXEC_CACHE=0 disables, PAPER2AGENT_EXEC_CACHE_PATH moves it.
+# Skills whose output changes between runs opt out with a
+# "# paper2agent: nondeterministic" line or store(..., deterministic=False).
+EXECUTION_CACHE_CONFIG = {
+    "enabled": True,
+    "path": "./exec_cache/results.sqlite3",
+    "max_entries": 5000,
+    "max_bytes": 64 * 1024 * 1024,
+    "ttl_seconds": 24 * 3600,
+}
+
+# Skill deduplication (see paper2agent/skills/dedupe.py). Skills are keyed by a hash
+# of their docstring-free AST, so re-storing the same code updates it. Code that
+# differs only in the names it binds is merged on store. `paper2agent dedupe`
+# also merges skills whose token shingles overlap by at least the threshold.
+SKILL_DEDUPE_CONFIG = {
+    "near_duplicate_threshold": 0.9,
 }
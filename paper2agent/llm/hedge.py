@@ -0,0 +1,109 @@
+import asyncio
+import os
+import threading
+
+from paper2agent.llm.config import HEDGE_CONFIG
+from paper2agent.llm.router import LLMProviderError
+
+
+def hedging_enabled():
+    env = os.environ.get("PAPER2AGENT_LLM_HEDGE")
+    if env is not None:
+        return env.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(HEDGE_CONFIG.get("enabled", False))
+
+
+def hedge_delay(health, percentile=None, default=None, minimum=None):
+    """
+    Seconds to wait for the primary before hedging: its observed latency at
+    `percentile`, or `default` until the endpoint has latency samples.
+    """
+    percentile = HEDGE_CONFIG["percentile"] if percentile is None else percentile
+    default = HEDGE_CONFIG["default_delay_seconds"] if default is None else default
+    minimum = HEDGE_CONFIG["min_delay_seconds"] if minimum is None else minimum
+    observed = health.latency_percentile(percentile)
+    return max(observed if observed is not None else default, minimum)
+
+
+class HedgeStats:
+    """Per-primary-endpoint counters: how often a hedge fired and how often it won."""
+
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.primary_won = 0
+        self.hedge_won = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, hedged, winner):
+        with self._lock:
+            self.calls += 1
+            self.hedged += int(hedged)
+            if winner == "primary":
+                self.primary_won += 1
+            elif winner == "hedge":
+                self.hedge_won += 1
+            else:
+                self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "primary_won": self.primary_won,
+                "hedge_won": self.hedge_won,
+                "failed": self.failed,
+                "hedge_win_rate": round(self.hedge_won / self.hedged, 3) if self.hedged else 0.0,
+            }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_hedge_stats(endpoint) -> HedgeStats:
+    with _stats_lock:
+        return _stats.setdefault(endpoint, HedgeStats())
+
+
+def hedge_stats():
+    """Hedge counters for every primary endpoint seen so far."""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {endpoint: s.stats() for endpoint, s in stats.items()}
+
+
+async def race(primary, secondary, delay):
+    """
+    Runs the `primary()` coroutine; if it hasn't finished after `delay` seconds
+    (or fails first), starts `secondary()` too. Returns (result, winner, hedged)
+    for the first successful answer, cancelling whichever call is still running.
+    Raises LLMProviderError if both fail.
+    """
+    tasks = {asyncio.ensure_future(primary()): "primary"}
+    hedged = False
+    errors = []
+    try:
+        pending = set(tasks)
+        timeout = delay
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), tasks[task], hedged
+                errors.append(task.exception())
+            if not hedged:
+                # Deadline passed or the primary already failed: fire the hedge.
+                hedged = True
+                tasks[asyncio.ensure_future(secondary())] = "hedge"
+                pending = {task for task in tasks if not task.done()}
+                timeout = None
+        raise LLMProviderError(f"Hedged request failed on both endpoints: {errors[-1]}") from errors[-1]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        # Let the cancelled loser unwind (closes its HTTP stream) before returning.
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import threading
+import weakref
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from paper2agent.llm.config import HTTP_POOL_CONFIG
+
+# requests/urllib3 and httpx are imported when the first connection is made, so
+# commands answered without a model (skill or cache hits) never load them.
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+
+@functools.lru_cache(maxsize=None)
+def _counting_adapter_class():
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _CountingAdapter(HTTPAdapter):
+        """HTTPAdapter that reports requests sent and TCP/TLS connections opened."""
+
+        def __init__(self, on_request, on_connect, **kwargs):
+            self._on_request = on_request
+            self._on_connect = on_connect
+            super().__init__(**kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            on_connect = self._on_connect
+
+            class CountingHTTPConnectionPool(HTTPConnectionPool):
+                def _new_conn(self):
+                    on_connect()
+                    return super()._new_conn()
+
+            class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+                def _new_conn(self):
+                    on_connect()
+                    return super()._new_conn()
+
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": CountingHTTPConnectionPool,
+                "https": CountingHTTPSConnectionPool,
+            }
+
+        def send(self, request, **kwargs):
+            self._on_request()
+            return super().send(request, **kwargs)
+
+    return _CountingAdapter
+
+
+def _base_url(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class SessionPool:
+    """
+    Long-lived keep-alive `requests.Session`s, one per provider base URL.
+
+    `pool_connections` is the number of host pools each session keeps,
+    `pool_maxsize` the per-host connection limit (enforced when `pool_block`).
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=16, pool_block=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url) -> "requests.Session":
+        base_url = _base_url(url)
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                import requests
+
+                session = requests.Session()
+                adapter = _counting_adapter_class()(
+                    self._count_request,
+                    self._count_connection,
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[base_url] = session
+            return session
+
+    def post(self, url, **kwargs):
+        return self.session_for(url).post(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.session_for(url).get(url, **kwargs)
+
+    def _count_request(self):
+        with self._lock:
+            self.requests_sent += 1
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "requests": self.requests_sent,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(self.requests_sent - self.connections_opened, 0),
+            }
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncSessionPool:
+    """
+    Async counterpart of SessionPool: one keep-alive `httpx.AsyncClient` per
+    provider base URL and event loop (httpx clients are bound to their loop).
+    """
+
+    def __init__(self, pool_maxsize=16, keepalive_expiry=30.0):
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_expiry = keepalive_expiry
+        self.requests_sent = 0
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def client_for(self, url) -> "httpx.AsyncClient":
+        loop = asyncio.get_running_loop()
+        base_url = _base_url(url)
+        with self._lock:
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(base_url)
+            if client is None:
+                import httpx
+
+                limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize,
+                                      keepalive_expiry=self.keepalive_expiry)
+                client = httpx.AsyncClient(limits=limits)
+                clients[base_url] = client
+            self.requests_sent += 1
+            return client
+
+    async def post(self, url, **kwargs):
+        return await self.client_for(url).post(url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.client_for(url).get(url, **kwargs)
+
+    async def aclose(self):
+        """Closes the clients owned by the running loop."""
+        with self._lock:
+            clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+_default_pool = None
+_default_async_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    """
+    Returns the process-wide session pool shared by all LLMClients.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool(**HTTP_POOL_CONFIG)
+        return _default_pool
+
+
+def get_async_session_pool() -> AsyncSessionPool:
+    """
+    Returns the process-wide async session pool shared by all LLMClients.
+    """
+    global _default_async_pool
+    with _default_pool_lock:
+        if _default_async_pool is None:
+            _default_async_pool = AsyncSessionPool(pool_maxsize=HTTP_POOL_CONFIG["pool_maxsize"])
+        return _default_async_pool
@@ -0,0 +1,140 @@
+import contextvars
+import json
+import re
+from contextlib import contextmanager
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no JSON value could be recovered from a model response."""
+
+
+# Schema requested by the generate_json() call in progress ({} = any JSON object).
+# Provider payload builders read it, so it never has to be threaded through every signature.
+_schema = contextvars.ContextVar("paper2agent_json_schema", default=None)
+
+
+@contextmanager
+def json_mode(schema):
+    token = _schema.set(schema if schema is not None else {})
+    try:
+        yield
+    finally:
+        _schema.reset(token)
+
+
+def active_schema():
+    """The schema of the current generate_json() call, or None outside JSON mode."""
+    return _schema.get()
+
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _loads(candidate):
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+
+
+class JsonStreamExtractor:
+    """
+    Incrementally scans model output for the first complete top-level JSON
+    object or array, skipping <think>...</think> blocks, markdown fences and
+    surrounding prose. feed() returns the parsed value as soon as it closes,
+    so a caller can stop reading (and paying for) the rest of the stream.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.value = None
+        self.done = False
+        self._pos = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._in_think = False
+
+    def feed(self, chunk):
+        if self.done:
+            return self.value
+        self.buffer += chunk
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            i = self._pos
+            char = buffer[i]
+            if self._in_think:
+                end = buffer.find("</think>", i)
+                if end == -1:
+                    # Keep the tail in case "</think>" is split across chunks
+                    self._pos = max(i, len(buffer) - len("</think>"))
+                    return None
+                self._in_think = False
+                self._pos = end + len("</think>")
+                continue
+
+            if self._start is None:
+                if buffer.startswith("<think>", i):
+                    self._in_think = True
+                    self._pos = i + len("<think>")
+                    continue
+                if char == "<" and "<think>".startswith(buffer[i:]):
+                    return None  # Possibly the start of "<think>"; wait for more text
+                if char in "{[":
+                    self._start = i
+                    self._stack = [char]
+                self._pos += 1
+                continue
+
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                opener = self._stack.pop() if self._stack else None
+                if (opener, char) not in (("{", "}"), ("[", "]")):
+                    self._restart()
+                    continue
+                if not self._stack:
+                    try:
+                        self.value = _loads(buffer[self._start:self._pos])
+                    except json.JSONDecodeError:
+                        self._restart()
+                        continue
+                    self.done = True
+                    return self.value
+        return None
+
+    def _restart(self):
+        # Not valid JSON after all (e.g. "{x}" in prose): resume scanning after the bad opener.
+        self._pos = self._start + 1
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+
+def extract_json(text):
+    """
+    Parses the first JSON object/array in `text`, tolerating reasoning blocks,
+    code fences, surrounding prose and trailing commas. Raises JSONExtractionError.
+    """
+    text = text or ""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    extractor = JsonStreamExtractor()
+    value = extractor.feed(text)
+    if not extractor.done:
+        raise JSONExtractionError(f"No JSON value found in model response: {text[:200]!r}")
+    return value
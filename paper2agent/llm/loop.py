@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    The process-wide event loop behind the blocking wrappers of async LLM code
+    (hedged generate(), best-of-N races), started on a daemon thread on first use.
+
+    Async SDK clients bind to the loop they first ran on (httpx pools, Hugging
+    Face's AsyncInferenceClient, google.generativeai's grpc.aio channel), so every
+    blocking call must reuse one loop instead of a fresh asyncio.run() each time.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=loop.run_forever, daemon=True, name="llm-event-loop")
+            _thread.start()
+            _loop = loop
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Runs `coro` on background_loop() and blocks until it finishes. The caller's
+    context variables (e.g. the telemetry record of the call in progress) are
+    visible inside the coroutine.
+    """
+    loop = background_loop()
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("run_sync() called from the background loop itself; await the coroutine instead")
+
+    context = contextvars.copy_context()
+    result = concurrent.futures.Future()
+
+    def start():
+        task = loop.create_task(coro, context=context)
+
+        def done(task):
+            if task.cancelled():
+                result.cancel()
+            elif task.exception() is not None:
+                result.set_exception(task.exception())
+            else:
+                result.set_result(task.result())
+
+        task.add_done_callback(done)
+
+    loop.call_soon_threadsafe(start)
+    return result.result()
@@ -0,0 +1,171 @@
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+
+from paper2agent.llm.config import RATE_LIMITS
+
+
+class TokenBucket:
+    """
+    Reservation-based token bucket refilled at `per_minute / 60` units per second.
+    Reservations may drive the level negative; the debt is the caller's wait time,
+    which keeps callers in FIFO order instead of racing for the next free slot.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.level = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # An oversized request must still be admitted once the bucket is full.
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """
+    Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_from_error(error):
+    """
+    Extracts the server-requested delay (seconds) from a 429 error, if any.
+    Understands Retry-After headers (seconds or HTTP date) on requests/httpx
+    errors and the retry hints embedded in Gemini quota errors.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        value = value.strip()
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            if parsed is not None:
+                return max(parsed.timestamp() - time.time(), 0.0)
+
+    text = str(error)
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", text) or re.search(r"retry in ([\d.]+)\s*s", text, re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def is_rate_limit_error(error):
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = str(error)
+    return "429" in text or "quota" in text.lower() or "rate limit" in text.lower()
+
+
+class RateLimiter:
+    """
+    Client-side limiter for one provider/model: requests-per-minute and
+    tokens-per-minute buckets plus a shared cool-down set from 429 responses.
+    The same instance is safe to use from threads (acquire) and async tasks (aacquire).
+    """
+
+    def __init__(self, rpm=None, tpm=None, jitter=1.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.jitter = jitter
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.throttled = 0
+
+    def _reserve(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            if self._blocked_until > now:
+                # Spread callers released by the same cool-down so they don't retry in lockstep.
+                wait = max(wait, self._blocked_until - now) + random.uniform(0, self.jitter)
+
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            return wait
+
+    def acquire(self, tokens=0):
+        """Blocks until a request of ~`tokens` tokens may be sent. Returns the seconds waited."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens=0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after=None, attempt=0):
+        """
+        Records a 429: every caller of this limiter holds off for `retry_after`
+        seconds if the server said so, else for a jittered exponential backoff.
+        """
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        with self._lock:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "throttled": self.throttled,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.acquired, 3) if self.acquired else 0.0,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider, model):
+    """
+    Returns the process-wide limiter for provider/model. Limits come from
+    RATE_LIMITS["provider/model"], falling back to RATE_LIMITS["provider"].
+    """
+    key = f"{provider}/{model}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limits = RATE_LIMITS.get(key) or RATE_LIMITS.get(provider) or {}
+            limiter = RateLimiter(rpm=limits.get("rpm"), tpm=limits.get("tpm"))
+            _limiters[key] = limiter
+        return limiter
+
+
+def rate_limit_stats():
+    """Queue-wait metrics for every limiter created so far, keyed by provider/model."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {key: limiter.stats() for key, limiter in limiters.items()}
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from paper2agent.llm.config import REPLAY_CONFIG
+from paper2agent.llm.router import LLMProviderError
+
+
+def replay_mode():
+    """
+    "record", "replay" or None. PAPER2AGENT_LLM_REPLAY switches every agent's
+    client (see get_client) to the replay provider without touching MODEL_CONFIG.
+    """
+    mode = (os.environ.get("PAPER2AGENT_LLM_REPLAY") or REPLAY_CONFIG.get("mode") or "").strip().lower()
+    if mode in ("", "0", "false", "no", "off"):
+        return None
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown replay mode {mode!r} (expected 'record' or 'replay').")
+    return mode
+
+
+def cassette_path():
+    return os.environ.get("PAPER2AGENT_LLM_CASSETTE") or REPLAY_CONFIG["cassette"]
+
+
+class Cassette:
+    """
+    Append-only JSONL file of recorded responses keyed by (model, system prompt, prompt).
+    A prompt recorded several times (e.g. repeated fix attempts) is replayed in
+    recording order, wrapping around once exhausted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    @staticmethod
+    def make_key(model_spec, system_prompt, prompt):
+        payload = json.dumps([model_spec, system_prompt or "", prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def record(self, key, model_spec, response, latency_seconds):
+        entry = {"key": key, "model": model_spec, "response": response,
+                 "latency_seconds": round(latency_seconds, 4), "recorded_at": time.time()}
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def next(self, key):
+        """The next recorded entry for `key`, or None if it was never recorded."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[index % len(entries)]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+
+class ReplayProvider:
+    """
+    Serves `replay/<model>` clients. In record mode the real <model> answers and
+    the response is appended to the cassette; in replay mode the cassette answers,
+    after an injected delay and with an injected failure rate.
+
+    latency: "none", "recorded" (the latency seen while recording), or a dict:
+        {"distribution": "fixed", "seconds": s}
+        {"distribution": "uniform", "low": a, "high": b}
+        {"distribution": "lognormal", "median": m, "sigma": s}
+    """
+
+    def __init__(self, model_spec, cassette, mode="replay", latency="none", latency_scale=1.0,
+                 failure_rate=0.0, seed=None, chunk_chars=24):
+        self.model_spec = model_spec
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.chunk_chars = chunk_chars
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._inner = None
+
+    def inner(self):
+        """The real client, only built in record mode (replay never touches the network)."""
+        if self._inner is None:
+            from paper2agent.llm.client import LLMClient
+            self._inner = LLMClient(self.model_spec)
+        return self._inner
+
+    def _delay(self, entry):
+        if self.latency == "none":
+            return 0.0
+        if self.latency == "recorded":
+            seconds = entry.get("latency_seconds", 0.0)
+        else:
+            with self._random_lock:
+                kind = self.latency.get("distribution", "fixed")
+                if kind == "uniform":
+                    seconds = self._random.uniform(self.latency["low"], self.latency["high"])
+                elif kind == "lognormal":
+                    seconds = self.latency["median"] * self._random.lognormvariate(0, self.latency.get("sigma", 0.5))
+                else:
+                    seconds = self.latency["seconds"]
+        return seconds * self.latency_scale
+
+    def _should_fail(self):
+        if not self.failure_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.failure_rate
+
+    def _lookup(self, prompt, system_prompt):
+        key = Cassette.make_key(self.model_spec, system_prompt, prompt)
+        entry = self.cassette.next(key)
+        if entry is None:
+            raise LLMProviderError(f"Replay: no recorded response for this {self.model_spec} prompt in {self.cassette.path}.")
+        if self._should_fail():
+            raise LLMProviderError(f"Replay: injected failure for {self.model_spec}.")
+        return entry
+
+    def generate(self, prompt, system_prompt, retries):
+        if self.mode == "record":
+            start = time.monotonic()
+            response = self.inner()._generate_uncached(prompt, system_prompt, retries)
+            self.cassette.record(Cassette.make_key(self.model_spec, system_prompt, prompt), self.model_spec,
+                                 response, time.monotonic() - start)
+            return response
+        entry = self._lookup(prompt, system_prompt)
+        time.sleep(self._delay(entry))
+        return entry["response"]
+
+    async def agenerate(self, prompt, system_prompt, retries):
+        if self.mode == "record":
+            start = time.monotonic()
+            response = await self.inner()._agenerate_uncached(prompt, system_prompt, retries)
+            self.cassette.record(Cassette.make_key(self.model_spec, system_prompt, prompt), self.model_spec,
+                                 response, time.monotonic() - start)
+            return response
+        entry = self._lookup(prompt, system_prompt)
+        await asyncio.sleep(self._delay(entry))
+        return entry["response"]
+
+    def stream(self, prompt, system_prompt):
+        """Replays the answer in small chunks, spreading the injected delay across them."""
+        if self.mode == "record":
+            yield self.generate(prompt, system_prompt, retries=3)
+            return
+        entry = self._lookup(prompt, system_prompt)
+        text = entry["response"]
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        pause = self._delay(entry) / len(chunks)
+        for chunk in chunks:
+            time.sleep(pause)
+            yield chunk
+
+
+_cassettes = {}
+_providers = {}
+_replay_lock = threading.Lock()
+
+
+def get_replay_provider(model_spec) -> ReplayProvider:
+    """Process-wide ReplayProvider for `model_spec`, sharing one cassette per path."""
+    mode = replay_mode() or "replay"
+    path = cassette_path()
+    with _replay_lock:
+        key = (model_spec, mode, path)
+        provider = _providers.get(key)
+        if provider is None:
+            cassette = _cassettes.get(path)
+            if cassette is None:
+                cassette = _cassettes[path] = Cassette(path)
+            provider = ReplayProvider(model_spec, cassette, mode=mode, latency=REPLAY_CONFIG["latency"],
+                                      latency_scale=REPLAY_CONFIG["latency_scale"],
+                                      failure_rate=REPLAY_CONFIG["failure_rate"], seed=REPLAY_CONFIG["seed"])
+            _providers[key] = provider
+        return provider
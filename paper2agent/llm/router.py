@@ -0,0 +1,260 @@
+import sys
+import threading
+import time
+from collections import deque
+
+from paper2agent.llm import telemetry
+from paper2agent.llm.config import ROUTER_CONFIG
+
+
+class LLMProviderError(Exception):
+    """Raised when a provider (or the whole fallback chain) could not produce an answer."""
+
+
+def is_unreachable_error(error):
+    """
+    True for failures where retrying the same endpoint right away is pointless
+    (connection refused, DNS failure, connect timeout).
+    """
+    # An error from requests or httpx means that library is loaded; don't import either just to check
+    requests, httpx = sys.modules.get("requests"), sys.modules.get("httpx")
+    unreachable = ((requests.ConnectionError,) if requests else ()) + \
+                  ((httpx.ConnectError, httpx.ConnectTimeout) if httpx else ())
+    if unreachable and isinstance(error, unreachable):
+        return True
+    return "Connection refused" in str(error)
+
+
+class EndpointHealth:
+    """
+    Rolling error rate / latency window and circuit state for one endpoint.
+
+    closed    -> calls flow normally
+    open      -> calls skip this endpoint until a background probe succeeds
+    half_open -> probe succeeded; the next real call decides (success closes,
+                 failure re-opens with a doubled cool-down)
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, endpoint, window=20, min_calls=5, failure_threshold=3, error_rate_threshold=0.5,
+                 cooldown_seconds=30.0, max_cooldown_seconds=300.0):
+        self.endpoint = endpoint
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.base_cooldown = cooldown_seconds
+        self.max_cooldown = max_cooldown_seconds
+        self.cooldown = cooldown_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.skipped = 0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                self.skipped += 1
+                return False
+            return True
+
+    def probe_due(self):
+        """True (once per cool-down) when an open circuit should be probed."""
+        with self._lock:
+            if self.state != self.OPEN or self.probing:
+                return False
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(True)
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == self.CLOSED and self._should_open():
+                self._open()
+
+    def record_probe(self, healthy):
+        with self._lock:
+            self.probing = False
+            if healthy:
+                self.state = self.HALF_OPEN
+            else:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self.opened_at = time.monotonic()
+
+    def _should_open(self):
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        if len(self.outcomes) >= self.min_calls:
+            error_rate = self.outcomes.count(False) / len(self.outcomes)
+            return error_rate >= self.error_rate_threshold
+        return False
+
+    def _open(self):
+        if self.state != self.OPEN:
+            print(f"LLM Router: circuit OPEN for {self.endpoint} (cool-down {self.cooldown:.0f}s)")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def latency_percentile(self, pct):
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(int(round(pct / 100.0 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+
+    def stats(self):
+        with self._lock:
+            error_rate = (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+            state, calls, failures, skipped = self.state, self.calls, self.failures, self.skipped
+        p50, p95 = self.latency_percentile(50), self.latency_percentile(95)
+        return {
+            "state": state,
+            "calls": calls,
+            "failures": failures,
+            "skipped": skipped,
+            "error_rate": round(error_rate, 3),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+class ProviderRouter:
+    """
+    Runs a call against a client's fallback chain, skipping endpoints whose
+    circuit is open and probing them back to health in the background.
+    """
+
+    def __init__(self, **config):
+        self.config = config
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def health(self, endpoint) -> EndpointHealth:
+        with self._lock:
+            health = self._health.get(endpoint)
+            if health is None:
+                health = EndpointHealth(endpoint, **self.config)
+                self._health[endpoint] = health
+            return health
+
+    def available(self, client):
+        """False if the client's endpoint circuit is open (kicking off a probe when due)."""
+        health = self.health(client.endpoint)
+        if health.probe_due():
+            threading.Thread(target=self._probe, args=(client, health), daemon=True).start()
+        return health.allow()
+
+    def _probe(self, client, health):
+        try:
+            healthy = bool(client.validate_connection())
+        except Exception:
+            healthy = False
+        print(f"LLM Router: probe {client.endpoint} -> {'healthy' if healthy else 'still down'}")
+        health.record_probe(healthy)
+
+    def _skip_reason(self, chain):
+        return "all endpoints unavailable (circuit open): " + ", ".join(c.endpoint for c in chain)
+
+    def call(self, client, fn):
+        """
+        Calls fn(candidate) for each candidate in client.fallback_chain() until one succeeds.
+        """
+        chain = client.fallback_chain()
+        last_error = None
+        for candidate in chain:
+            if not self.available(candidate):
+                continue
+            if candidate is not client:
+                print(f"LLM Router: falling back to {candidate.endpoint}")
+                telemetry.note_fallback(candidate.endpoint)
+            health = self.health(candidate.endpoint)
+            start = time.monotonic()
+            try:
+                result = fn(candidate)
+            except Exception as e:
+                health.record_failure()
+                print(f"LLM Provider Error ({candidate.endpoint}): {e}")
+                last_error = e
+                continue
+            health.record_success(time.monotonic() - start)
+            telemetry.note_served(f"{candidate.provider}/{candidate.model_name}")
+            return result
+        raise LLMProviderError(str(last_error) if last_error else self._skip_reason(chain)) from last_error
+
+    async def acall(self, client, afn):
+        """Async counterpart of call(); afn(candidate) must return an awaitable."""
+        chain = client.fallback_chain()
+        last_error = None
+        for candidate in chain:
+            if not self.available(candidate):
+                continue
+            if candidate is not client:
+                print(f"LLM Router: falling back to {candidate.endpoint}")
+                telemetry.note_fallback(candidate.endpoint)
+            try:
+                return await self.acall_one(candidate, afn)
+            except Exception as e:
+                last_error = e
+        raise LLMProviderError(str(last_error) if last_error else self._skip_reason(chain)) from last_error
+
+    async def acall_one(self, candidate, afn):
+        """
+        Awaits afn(candidate) alone, recording the outcome against its endpoint.
+        A cancelled call (e.g. the losing side of a hedge) is not counted either way.
+        """
+        health = self.health(candidate.endpoint)
+        start = time.monotonic()
+        try:
+            result = await afn(candidate)
+        except Exception as e:
+            health.record_failure()
+            print(f"LLM Provider Error ({candidate.endpoint}): {e}")
+            raise
+        health.record_success(time.monotonic() - start)
+        telemetry.note_served(f"{candidate.provider}/{candidate.model_name}")
+        return result
+
+    def stats(self):
+        with self._lock:
+            endpoints = dict(self._health)
+        return {endpoint: health.stats() for endpoint, health in endpoints.items()}
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_router() -> ProviderRouter:
+    """
+    Returns the process-wide router, so every client shares endpoint health.
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ProviderRouter(**ROUTER_CONFIG)
+        return _default_router
@@ -0,0 +1,381 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from paper2agent.llm.budget import count_tokens
+from paper2agent.llm.config import LLM_PRICING, TELEMETRY_CONFIG
+
+
+class CallRecord:
+    """
+    Everything measured about one LLMClient call, from the caller's point of view:
+    retries, fallbacks and hedges inside the call are folded into a single record.
+    """
+
+    def __init__(self, provider, model, role=None, streamed=False):
+        self.timestamp = time.time()
+        self.role = role or "unknown"
+        self.provider = provider
+        self.model = model
+        self.served_by = None
+        self.streamed = streamed
+        self.cache_hit = False
+        self.attempts = 0
+        self.retries = 0
+        self.fallbacks = []
+        self.hedge = None
+        self.queue_seconds = 0.0
+        self.ttfb_seconds = None
+        self.wall_seconds = 0.0
+        self.load_seconds = None
+        self.generation_seconds = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.token_source = None
+        self.cost_usd = 0.0
+        self.success = True
+        self.error = None
+        self.response = None
+        self._start = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def first_byte(self):
+        # Only meaningful when streaming; a plain call's first byte is its whole response
+        if self.streamed and self.ttfb_seconds is None:
+            self.ttfb_seconds = self.elapsed()
+
+    def finish(self, prompt_tokens, response):
+        """
+        Fills in wall time, token estimates (when the provider reported none) and cost.
+        `prompt_tokens` is the caller's count_tokens() estimate, the same figure the
+        rate limiter and cost cap work from.
+        """
+        self.wall_seconds = self.elapsed()
+        if self.cache_hit:
+            self.prompt_tokens, self.completion_tokens, self.token_source = 0, 0, "cache"
+        elif self.token_source is None:
+            self.prompt_tokens = prompt_tokens
+            self.completion_tokens = count_tokens(response, self.served_by or f"{self.provider}/{self.model}")
+            self.token_source = "estimate"
+        self.cost_usd = estimate_cost(self.served_by or f"{self.provider}/{self.model}",
+                                      self.prompt_tokens, self.completion_tokens)
+
+    def fail(self, error):
+        self.success = False
+        self.error = f"{type(error).__name__}: {error}"
+
+    def as_dict(self):
+        return {
+            "ts": round(self.timestamp, 3),
+            "role": self.role,
+            "provider": self.provider,
+            "model": self.model,
+            "served_by": self.served_by,
+            "streamed": self.streamed,
+            "cache_hit": self.cache_hit,
+            "success": self.success,
+            "error": self.error,
+            "wall_ms": round(self.wall_seconds * 1000),
+            "ttfb_ms": round(self.ttfb_seconds * 1000) if self.ttfb_seconds is not None else None,
+            "queue_ms": round(self.queue_seconds * 1000),
+            "load_ms": round(self.load_seconds * 1000) if self.load_seconds is not None else None,
+            "generation_ms": round(self.generation_seconds * 1000) if self.generation_seconds is not None else None,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "hedge": self.hedge,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "token_source": self.token_source,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def estimate_cost(model_key, prompt_tokens, completion_tokens):
+    """USD cost from LLM_PRICING (per million tokens); "provider/model" entries win over "provider"."""
+    price = LLM_PRICING.get(model_key) or LLM_PRICING.get(model_key.split("/", 1)[0]) or {}
+    return ((prompt_tokens or 0) * price.get("input", 0.0) + (completion_tokens or 0) * price.get("output", 0.0)) / 1_000_000
+
+
+# The record of the call in progress. Context-local, so worker threads and
+# asyncio tasks (including hedges spawned inside a call) each see their own.
+_current = contextvars.ContextVar("paper2agent_llm_call", default=None)
+
+
+@contextmanager
+def activate(record):
+    token = _current.set(record)
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def complete(record, prompt_tokens):
+    """Finalizes a record and hands it to the process-wide telemetry sink."""
+    record.finish(prompt_tokens, record.response)
+    get_telemetry().emit(record)
+
+
+@contextmanager
+def track(provider, model, role, prompt_tokens):
+    """Records the enclosed call; set `record.response` before leaving the block."""
+    record = CallRecord(provider, model, role)
+    try:
+        with activate(record):
+            yield record
+    except Exception as e:
+        record.fail(e)
+        raise
+    finally:
+        complete(record, prompt_tokens)
+
+
+def note_attempt(attempt, queue_seconds=0.0):
+    record = _current.get()
+    if record is not None:
+        record.attempts += 1
+        record.retries += int(attempt > 0)
+        record.queue_seconds += queue_seconds
+
+
+def note_usage(prompt_tokens, completion_tokens):
+    """Token counts reported by the provider (preferred over the character estimate)."""
+    record = _current.get()
+    if record is not None and prompt_tokens is not None and completion_tokens is not None:
+        record.prompt_tokens, record.completion_tokens = int(prompt_tokens), int(completion_tokens)
+        record.token_source = "provider"
+
+
+def note_timings(load_seconds, generation_seconds):
+    """Server-side split of a call: model load vs. prompt evaluation + generation (Ollama reports both)."""
+    record = _current.get()
+    if record is not None:
+        if load_seconds is not None:
+            record.load_seconds = (record.load_seconds or 0.0) + load_seconds
+        if generation_seconds is not None:
+            record.generation_seconds = (record.generation_seconds or 0.0) + generation_seconds
+
+
+def note_fallback(endpoint):
+    record = _current.get()
+    if record is not None:
+        record.fallbacks.append(endpoint)
+
+
+def note_hedge(hedge):
+    """Outcome of a hedged call: {"hedged", "winner", "delay_seconds"[, "endpoint"]}."""
+    record = _current.get()
+    if record is not None:
+        record.hedge = hedge
+
+
+def note_served(model_key):
+    record = _current.get()
+    if record is not None:
+        record.served_by = model_key
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms, rendered in the Prometheus text
+    exposition format (scrape via render() or start_metrics_server()).
+    """
+
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+    METRICS = {
+        "paper2agent_llm_requests_total": ("counter", "LLM calls by outcome."),
+        "paper2agent_llm_cache_hits_total": ("counter", "LLM calls answered from the response cache."),
+        "paper2agent_llm_retries_total": ("counter", "Provider retries inside LLM calls."),
+        "paper2agent_llm_fallbacks_total": ("counter", "Fallback endpoints tried inside LLM calls."),
+        "paper2agent_llm_tokens_total": ("counter", "Prompt and completion tokens."),
+        "paper2agent_llm_cost_usd_total": ("counter", "Estimated spend in USD."),
+        "paper2agent_llm_request_duration_seconds": ("histogram", "Wall time of LLM calls."),
+        "paper2agent_llm_ttfb_seconds": ("histogram", "Time to the first chunk of streamed calls."),
+        "paper2agent_llm_queue_seconds": ("histogram", "Time spent waiting on client-side rate limits."),
+        "paper2agent_llm_model_load_seconds": ("histogram", "Time the server spent loading the model (cold starts)."),
+        "paper2agent_llm_generation_seconds": ("histogram", "Server-side prompt evaluation + generation time."),
+        "paper2agent_skill_lookups_total": ("counter", "Skill registry lookups by result (hit/miss)."),
+        "paper2agent_skill_writes_total": ("counter", "Verified skills written back to the registry."),
+    }
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self._histograms.get(key, ([0] * len(self.BUCKETS), [0.0, 0]))
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            total[0] += value
+            total[1] += 1
+            self._histograms[key] = (buckets, total)
+
+    def observe_call(self, record):
+        labels = {"provider": record.provider, "model": record.model, "role": record.role}
+        self.inc("paper2agent_llm_requests_total", {**labels, "status": "ok" if record.success else "error"})
+        if record.cache_hit:
+            self.inc("paper2agent_llm_cache_hits_total", labels)
+            return
+        if record.retries:
+            self.inc("paper2agent_llm_retries_total", labels, record.retries)
+        if record.fallbacks:
+            self.inc("paper2agent_llm_fallbacks_total", labels, len(record.fallbacks))
+        if record.prompt_tokens:
+            self.inc("paper2agent_llm_tokens_total", {**labels, "kind": "prompt"}, record.prompt_tokens)
+        if record.completion_tokens:
+            self.inc("paper2agent_llm_tokens_total", {**labels, "kind": "completion"}, record.completion_tokens)
+        if record.cost_usd:
+            self.inc("paper2agent_llm_cost_usd_total", labels, record.cost_usd)
+        self.observe("paper2agent_llm_request_duration_seconds", labels, record.wall_seconds)
+        self.observe("paper2agent_llm_queue_seconds", labels, record.queue_seconds)
+        if record.ttfb_seconds is not None:
+            self.observe("paper2agent_llm_ttfb_seconds", labels, record.ttfb_seconds)
+        if record.load_seconds is not None:
+            self.observe("paper2agent_llm_model_load_seconds", labels, record.load_seconds)
+        if record.generation_seconds is not None:
+            self.observe("paper2agent_llm_generation_seconds", labels, record.generation_seconds)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(b), list(t)) for key, (b, t) in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in self.METRICS.items():
+            series = counters if kind == "counter" else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in keys:
+                labels = dict(key[1])
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(series[key])}")
+                    continue
+                buckets, (total, count) = series[key]
+                for bound, bucket_count in zip(self.BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels.keys(), escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Telemetry:
+    """Sends finished CallRecords to the metrics registry and, if configured, a rotating JSONL file."""
+
+    def __init__(self, jsonl_path=None, max_bytes=10 * 1024 * 1024, backup_count=5, metrics=None):
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.jsonl_path = jsonl_path
+        self._logger = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(jsonl_path, maxBytes=max_bytes,
+                                                           backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"paper2agent.llm.telemetry.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def emit(self, record):
+        self.metrics.observe_call(record)
+        if self._logger is not None:
+            self._logger.info(json.dumps(record.as_dict()))
+
+    def close(self):
+        if self._logger is not None:
+            for handler in list(self._logger.handlers):
+                handler.close()
+                self._logger.removeHandler(handler)
+
+
+def telemetry_log_enabled():
+    env = os.environ.get("PAPER2AGENT_LLM_TELEMETRY")
+    if env is not None:
+        return env.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(TELEMETRY_CONFIG.get("jsonl_enabled", False))
+
+
+_default_telemetry = None
+_default_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """
+    Returns the process-wide telemetry sink. Metrics are always collected; the
+    JSONL call log is written when PAPER2AGENT_LLM_TELEMETRY=1 (or TELEMETRY_CONFIG
+    says so), at PAPER2AGENT_LLM_TELEMETRY_PATH if set.
+    """
+    global _default_telemetry
+    with _default_telemetry_lock:
+        if _default_telemetry is None:
+            path = None
+            if telemetry_log_enabled():
+                path = os.environ.get("PAPER2AGENT_LLM_TELEMETRY_PATH") or TELEMETRY_CONFIG["jsonl_path"]
+            _default_telemetry = Telemetry(path, max_bytes=TELEMETRY_CONFIG["max_bytes"],
+                                           backup_count=TELEMETRY_CONFIG["backup_count"])
+        return _default_telemetry
+
+
+def render_metrics():
+    """Prometheus text for every LLM call made in this process."""
+    return get_telemetry().metrics.render()
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serves render_metrics() at http://host:port/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"LLM metrics: serving Prometheus text at http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from paper2agent.llm.config import MODEL_CONFIG, OLLAMA_WARMUP_CONFIG
+
+
+def warmup_enabled():
+    """PAPER2AGENT_LLM_WARMUP overrides OLLAMA_WARMUP_CONFIG["enabled"]."""
+    value = os.environ.get("PAPER2AGENT_LLM_WARMUP")
+    if value is None:
+        return bool(OLLAMA_WARMUP_CONFIG.get("enabled"))
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+
+class ModelWarmup:
+    """
+    Pre-loads local models on background threads, once per model spec per process,
+    and keeps the outcome (load time or error) for traces and diagnostics.
+    """
+
+    def __init__(self):
+        self._threads = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def start(self, model_specs):
+        """Starts warming every Ollama model in `model_specs` that isn't warming or warm yet."""
+        from paper2agent.llm.client import get_client
+
+        started = []
+        for spec in dict.fromkeys(model_specs):
+            if not spec.startswith("ollama/"):
+                continue  # Hosted models need no warm-up; don't build their clients here
+            client = get_client(spec)
+            if client.provider != "ollama":
+                continue
+            with self._lock:
+                if spec in self._threads:
+                    continue
+                self._results[spec] = {"status": "loading"}
+                thread = threading.Thread(target=self._run, args=(spec, client), daemon=True,
+                                          name=f"llm-warmup-{client.model_name}")
+                self._threads[spec] = thread
+            thread.start()
+            started.append(spec)
+        return started
+
+    def _run(self, spec, client):
+        start = time.monotonic()
+        try:
+            load_seconds = client.warm_up()
+            result = {"status": "ready", "load_seconds": round(load_seconds, 3),
+                      "wall_seconds": round(time.monotonic() - start, 3)}
+            print(f"Warm-up: {spec} ready (model load {load_seconds:.1f}s).")
+        except Exception as e:
+            result = {"status": "failed", "error": str(e), "wall_seconds": round(time.monotonic() - start, 3)}
+            print(f"Warm-up: {spec} failed: {e}")
+        with self._lock:
+            self._results[spec] = result
+
+    def wait(self, timeout=None):
+        """Blocks until every started warm-up finished (or `timeout` seconds passed)."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            return {spec: dict(result) for spec, result in self._results.items()}
+
+
+_default_warmup = None
+_default_warmup_lock = threading.Lock()
+
+
+def get_warmup() -> ModelWarmup:
+    global _default_warmup
+    with _default_warmup_lock:
+        if _default_warmup is None:
+            _default_warmup = ModelWarmup()
+        return _default_warmup
+
+
+def warm_up_configured_models(roles=None):
+    """
+    Starts background warm-up of the models behind OLLAMA_WARMUP_CONFIG["roles"],
+    or only those of them in `roles`. Returns the specs started (empty when
+    disabled, or when none are Ollama models).
+    """
+    if not warmup_enabled():
+        return []
+    specs = [MODEL_CONFIG[role] for role in OLLAMA_WARMUP_CONFIG["roles"]
+             if role in MODEL_CONFIG and (roles is None or role in roles)]
+    return get_warmup().start(specs)
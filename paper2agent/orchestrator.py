@@ -1,115 +1,364 @@
-from paper2agent.skills.registry import SkillRegistry
-from paper2agent.agents.synthesizer import SkillSynthesizer
-from paper2agent.agents.integrity import IntegrityAgent
-from paper2agent.agents.grounding import ScientificGroundingAgent
-from paper2agent.sandbox.execution import LocalSandbox
-from paper2agent.knowledge.ingest import DoclingIngest
-from paper2agent.knowledge.retriever import KnowledgeRetriever
+from paper2agent.llm.budget import PromptBudget, Section
+from paper2agent.llm.config import PROMPT_BUDGETS
+from paper2agent.llm.warmup import get_warmup, warm_up_configured_models
+import ast
+import importlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _component_class(module, name):
+    # Component modules pull in Chroma, Docling or provider SDKs; import them only when first built.
+    return getattr(importlib.import_module(module), name)
+
 
 class Orchestrator:
-    def __init__(self):
-        self.skill_registry = SkillRegistry()
-        self.synthesizer = SkillSynthesizer()
-        self.sandbox = LocalSandbox()
-        self.integrity_agent = IntegrityAgent(self.synthesizer, sandbox=self.sandbox)
-        self.grounding_agent = ScientificGroundingAgent()
-        
+    # Subsystems, built on first attribute access: name -> (dependencies, factory).
+    # Chroma clients, the Docling converter and LLM clients are only paid for by
+    # the commands that use them (e.g. a skill hit never builds the synthesis agents).
+    COMPONENTS = {
+        "skill_registry": ((), lambda self: _component_class("paper2agent.skills.registry", "SkillRegistry")()),
+        "synthesizer": ((), lambda self: _component_class("paper2agent.agents.synthesizer", "SkillSynthesizer")()),
+        "sandbox": ((), lambda self: _component_class("paper2agent.sandbox.execution", "LocalSandbox")()),
+        "integrity_agent": (("synthesizer", "sandbox"), lambda self: _component_class(
+            "paper2agent.agents.integrity", "IntegrityAgent")(self.synthesizer, sandbox=self.sandbox)),
+        "grounding_agent": ((), lambda self: _component_class("paper2agent.agents.grounding", "ScientificGroundingAgent")()),
         # Knowledge Components
-        self.ingest = DoclingIngest()
-        self.retriever = KnowledgeRetriever()
+        "ingest": ((), lambda self: _component_class("paper2agent.knowledge.ingest", "DoclingIngest")()),
+        "retriever": ((), lambda self: _component_class("paper2agent.knowledge.retriever", "KnowledgeRetriever")()),
+        "papers": (("retriever",), lambda self: _component_class("paper2agent.knowledge.papers", "PaperRegistry")(
+            os.path.join(self.retriever.persist_directory, "papers.sqlite3"))),
+        # Stored stdout of earlier runs of the same skill on the same data (None when disabled)
+        "execution_cache": ((), lambda self: _component_class("paper2agent.sandbox.cache", "default_execution_cache")()),
+        # Skill cache bookkeeping: daily hit rates, and write-back of verified skills off the response path
+        "skill_stats": ((), lambda self: _component_class("paper2agent.skills.stats", "SkillCacheStats")()),
+        "skill_writer": (("skill_stats",), lambda self: _component_class("paper2agent.skills.writeback", "SkillWriteBack")(
+            lambda: self.skill_registry, stats=self.skill_stats)),
+    }
+
+    # Model roles the synthesis path calls; warmed up in the background at construction
+    SYNTHESIS_ROLES = ("synthesizer", "integrity")
+
+    def __init__(self, warm_up=True):
+        # Seconds spent constructing each component (excluding its dependencies)
+        self.init_seconds = {}
+        self._components_lock = threading.RLock()
 
-    def process_query(self, user_query, data_context=None, paper_path=None, model_override=None, grounding_override=None):
+        # Local synthesis models load on background threads from here on, so the first
+        # skill miss doesn't wait for them; skill hits never call a model either way.
+        # Commands that never query a model (list-skills, ingest) pass warm_up=False.
+        self.warm_up = warm_up
+        if warm_up:
+            warm_up_configured_models(self.SYNTHESIS_ROLES)
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet, i.e. components not built yet.
+        spec = Orchestrator.COMPONENTS.get(name)
+        if spec is None or "_components_lock" not in self.__dict__:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        dependencies, factory = spec
+        with self._components_lock:
+            if name not in self.__dict__:
+                for dependency in dependencies:
+                    getattr(self, dependency)
+                start = time.perf_counter()
+                component = factory(self)
+                self.init_seconds[name] = time.perf_counter() - start
+                self.__dict__[name] = component
+            return self.__dict__[name]
+
+    def loaded_components(self):
+        """Names of the components built so far."""
+        return [name for name in Orchestrator.COMPONENTS if name in self.__dict__]
+
+    def process_query(self, user_query, data_context=None, paper_path=None, model_override=None, grounding_override=None,
+                      history=None, candidates=None):
+        """
+        Runs the full pipeline and returns (code, output, trace_log).
+        """
+        result = None
+        for event in self.process_query_stream(user_query, data_context=data_context, paper_path=paper_path,
+                                               model_override=model_override, grounding_override=grounding_override,
+                                               history=history, candidates=candidates):
+            if event["type"] == "result":
+                result = event
+        return result["code"], result["output"], result["trace"]
+
+    def process_query_stream(self, user_query, data_context=None, paper_path=None, model_override=None, grounding_override=None,
+                             history=None, candidates=None):
+        """
+        Same pipeline as process_query, as a generator of events for incremental UIs.
+        `history` (earlier conversation turns, oldest first) is included only if the
+        context budget has room after the query, RAG chunks and data context.
+        `candidates` > 1 drafts that many candidates concurrently and keeps the first
+        to pass its test (default: PAPER2AGENT_CANDIDATES, else BEST_OF_N_CONFIG["n"]).
+        Events:
+        - {"type": "stage", "message": str} when the pipeline moves to a new step
+        - {"type": "token", "text": str} for each chunk of the streamed draft
+        - {"type": "result", "code": str, "output": str, "trace": dict} once, at the end
+        """
         print(f"Orchestrator: Processing query '{user_query}'")
         
-        # Trace Log
+        # Trace Log (model entries are added once synthesis is needed)
         trace_log = {
              "retriever": "VectorDB (Chroma)",
-             "synthesizer": self.synthesizer.llm.model_name,
-             "integrity": self.integrity_agent.llm.model_name if hasattr(self.integrity_agent, "llm") else "Unknown",
              "execution": "Local Sandbox"
         }
 
         # 0. Ingest Paper if provided
         if paper_path:
-            print(f"Orchestrator: Ingesting paper {paper_path}...")
+            yield self._stage(f"Loading paper {os.path.basename(paper_path)}...")
             try:
-                markdown_text = self.ingest.process(paper_path)
-                self.retriever.add_document(markdown_text, source_name=os.path.basename(paper_path))
-                print("Orchestrator: Paper ingested.")
+                self.ingest_paper(paper_path)
             except Exception as e:
                 print(f"Orchestrator Warning: Failed to ingest paper: {e}")
 
         # 1. Memory Lookup
         if not model_override: 
-            existing_skill = self.skill_registry.retrieve(user_query)
-            if existing_skill:
-                print("Orchestrator: Skill hit! Using existing skill.")
-                return *self._execute_skill(existing_skill, data_context), trace_log
+            match = self.skill_registry.lookup(user_query)
+            self.skill_stats.record_lookup(match is not None)
+            if match:
+                yield self._stage(f"Skill hit ({match['tier']} match)! Using existing skill.")
+                trace_log["skill"] = f"registry hit ({match['tier']}, score {match['score']:.3f}, {1000 * match['seconds']:.2f} ms)"
+                code, output, cached = self._execute_skill(match["code"], data_context,
+                                                           deterministic=match.get("deterministic", True))
+                if cached:
+                    trace_log["execution"] = "Execution cache (no sandbox run)"
+                yield self._result(code, output, trace_log)
+                return
         
-        print("Orchestrator: Skill miss. Initiating synthesis loop.")
+        yield self._stage("Skill miss. Initiating synthesis loop.")
+        warmup = get_warmup().stats()
+        if warmup:
+             trace_log["warmup"] = warmup
+        trace_log["synthesizer"] = self.synthesizer.llm.model_name
+        trace_log["integrity"] = self.integrity_agent.llm.model_name if hasattr(self.integrity_agent, "llm") else "Unknown"
         
-        # 1.5 Retrieve Context (RAG)
-        context_chunks = self.retriever.query(user_query)
-        rag_context = "\n\n".join(context_chunks) if context_chunks else ""
-        if rag_context:
-            print(f"Orchestrator: Retrieved {len(context_chunks)} context chunks.")
+        # 1.5 Retrieve Context (RAG); more candidates than fit, the budget picks the best
+        scored_chunks = self.retriever.query_with_scores(user_query, n_results=PROMPT_BUDGETS["rag_candidates"])
+        if scored_chunks:
+            print(f"Orchestrator: Retrieved {len(scored_chunks)} context chunks.")
         
         # 2. Synthesis & Robustness Loop
         try:
+             from paper2agent.agents.candidates import candidate_count
+             from paper2agent.llm.client import get_client
+
+             # Per-request model selection: shared clients are looked up, the agents' defaults stay untouched.
+             synthesizer_llm = self.synthesizer.llm
+             integrity_llm = self.integrity_agent.llm
+
              # Model Override (Persona)
              if model_override:
-                  print(f"Orchestrator: Switching Synthesizer to {model_override}...")
-                  from paper2agent.llm.client import LLMClient
-                  self.synthesizer.llm = LLMClient(model_name=model_override)
+                  print(f"Orchestrator: Using {model_override} as Synthesizer for this query...")
+                  synthesizer_llm = get_client(model_override)
                   trace_log["synthesizer"] = model_override + " (Persona Override)"
 
              # Grounding Override
              if grounding_override:
-                  self.integrity_agent.set_model(grounding_override)
+                  integrity_llm = get_client(grounding_override)
                   trace_log["integrity"] = grounding_override + " (Grounding Override)"
 
-             # Draft
-             print("Orchestrator: Drafting code...")
-             full_context = f"{user_query}\n\nContext:\n{rag_context}\nData: {data_context}"
-             draft_code = self.synthesizer.draft(user_query, context=full_context)
-             print("Orchestrator: Code drafted.")
-             
-             # Robustness (Integrity Unit)
-             print("Orchestrator: Entering Integrity Loop (Grounding & Validation)...")
-             robust_code = self.integrity_agent.run_robustness_loop(draft_code, context=full_context)
+             full_context, budget_report = self._pack_context(user_query, scored_chunks, data_context, history,
+                                                              synthesizer_llm.model_name)
+             trace_log["context_budget"] = budget_report
+             if budget_report["dropped"]:
+                  print(f"Orchestrator: Context budget trimmed/dropped {len(budget_report['dropped'])} section(s).")
+
+             # How the final code was verified; stored with the skill
+             verification = {"model": f"{synthesizer_llm.provider}/{synthesizer_llm.model_name}"}
+             n_candidates = candidate_count(candidates)
+             if n_candidates > 1:
+                  # Best-of-N: the first candidate to pass its test wins, the rest are cancelled
+                  robust_code = yield from self._race_candidates(user_query, full_context, n_candidates, synthesizer_llm,
+                                                                 integrity_llm, trace_log, verification)
+             else:
+                  # The test only depends on the context: write it while the draft is being written
+                  test_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-gen")
+                  try:
+                       test_future = test_pool.submit(self.integrity_agent.test_generator.create, full_context, llm=integrity_llm)
+
+                       # Draft (streamed, so callers see tokens while the model is still writing)
+                       yield self._stage("Drafting code...")
+                       draft_chunks = []
+                       for token in self.synthesizer.draft_stream(user_query, context=full_context, llm=synthesizer_llm):
+                           draft_chunks.append(token)
+                           yield {"type": "token", "text": token}
+                       draft_code = self.synthesizer.clean_code("".join(draft_chunks))
+                       print("Orchestrator: Code drafted.")
+
+                       test_case = self._prepared_test(test_future)
+                  finally:
+                       test_pool.shutdown(wait=False, cancel_futures=True)
+
+                  # Robustness (Integrity Unit)
+                  yield self._stage("Entering Integrity Loop (Grounding & Validation)...")
+                  robust_code = self.integrity_agent.run_robustness_loop(draft_code, context=full_context, llm=integrity_llm,
+                                                                         synthesizer_llm=synthesizer_llm, test_case=test_case,
+                                                                         log=verification)
              
              # 3. Execute & Answer (Interaction)
-             print("Orchestrator: Executing skill to generate answer...")
+             yield self._stage("Executing skill to generate answer...")
              result = self.sandbox.run(robust_code)
              
              if not result.success:
-                 return robust_code, f"Execution Error: {result.error_log}", trace_log
-                 
-             return robust_code, result.output, trace_log
+                 yield self._result(robust_code, f"Execution Error: {result.error_log}", trace_log)
+                 return
+
+             # 4. Remember the verified skill (written in the background, after the answer is out)
+             self._write_back(user_query, robust_code, verification)
+             trace_log["skill"] = "queued for registry"
+             yield self._result(robust_code, result.stdout, trace_log)
 
         except Exception as e:
             import traceback
             traceback.print_exc()
-            return "", f"Orchestrator Error: {str(e)}", trace_log
+            yield self._result("", f"Orchestrator Error: {str(e)}", trace_log)
 
-        finally:
-             from paper2agent.llm.config import MODEL_CONFIG
-             from paper2agent.llm.client import LLMClient
-             
-             # Restore Synthesizer 
-             if model_override:
-                  default_model = MODEL_CONFIG.get("synthesizer", "gemini-1.5-pro")
-                  self.synthesizer.llm = LLMClient(model_name=default_model)
-             
-             # Restore Integrity
-             if grounding_override:
-                  default_integrity = MODEL_CONFIG.get("integrity", "gemini-1.5-flash")
-                  self.integrity_agent.set_model(default_integrity)
+    def ingest_paper(self, paper_path):
+        """
+        Adds a paper to the knowledge base unless the registry already has these
+        exact bytes (same converter and chunking). Returns True if it was (re-)ingested.
+        """
+        entry, ingested = self.papers.ensure_ingested(paper_path, self.ingest, self.retriever)
+        if ingested:
+            print(f"Orchestrator: Paper ingested ({entry['chunk_count']} chunks, sha256 {entry['sha256'][:12]}).")
+        else:
+            print(f"Orchestrator: Paper already in knowledge base (sha256 {entry['sha256'][:12]}); skipping ingest.")
+        return ingested
+
+    def _race_candidates(self, user_query, full_context, n_candidates, synthesizer_llm, integrity_llm, trace_log,
+                         verification):
+        """
+        Generator step of process_query_stream for best-of-N synthesis; returns the
+        robust code and fills `verification`. Without a passing candidate, the first
+        safe draft goes through the integrity loop as usual.
+        """
+        from paper2agent.agents.candidates import CandidateSynthesis
+
+        race = CandidateSynthesis(self.synthesizer, self.integrity_agent, self.sandbox)
+        clients, estimated_cost = race.plan(user_query, full_context, n_candidates, synthesizer_llm)
+        yield self._stage(f"Drafting {len(clients)} candidates in parallel...")
+
+        test_cases = []
+
+        def make_test():
+            test_cases.append(self.integrity_agent.test_generator.create(full_context, llm=integrity_llm))
+            return test_cases[-1]
+
+        winner, results = race.race(user_query, full_context, clients, make_test)
+        trace_log["candidates"] = {
+            "requested": n_candidates,
+            "estimated_cost_usd": round(estimated_cost, 6),
+            "winner": winner.index if winner else None,
+            "results": [candidate.as_dict() for candidate in results],
+        }
+        if winner is not None:
+            yield self._stage(f"Candidate {winner.index} ({winner.model}) passed first.")
+            verification.update(model=winner.model, candidate=winner.index, attempts=1, critiques=[],
+                                test_case=test_cases[0] if test_cases else None)
+            return winner.code
+
+        drafted = [candidate for candidate in results if candidate.code]
+        if not drafted:
+            raise RuntimeError("No candidate could be drafted: " + "; ".join(
+                f"{candidate.model}: {candidate.error}" for candidate in results))
+        fallback = next((candidate for candidate in drafted if candidate.status != "unsafe"), drafted[0])
+        yield self._stage(f"No candidate passed; entering Integrity Loop with candidate {fallback.index}...")
+        verification.update(model=fallback.model, candidate=fallback.index)
+        return self.integrity_agent.run_robustness_loop(fallback.code, context=full_context, llm=integrity_llm,
+                                                        synthesizer_llm=synthesizer_llm,
+                                                        test_case=test_cases[0] if test_cases else None,
+                                                        log=verification)
+
+    def _write_back(self, user_query, code, verification):
+        """Queues the verified skill for the registry; failures are logged, never raised."""
+        verification = dict(verification)
+        test_case = verification.pop("test_case", None)
+        model = verification.pop("model", None)
+        verification.update(success=True, source="synthesized")
+        try:
+            self.skill_writer.submit(code, query=user_query, description=self._skill_description(code, user_query),
+                                     test_case=test_case, model=model, verification_log=verification)
+        except Exception as e:
+            print(f"Orchestrator Warning: Could not queue skill for the registry: {e}")
+
+    def wait_for_writes(self, timeout=None):
+        """Blocks until queued skill write-backs are stored (e.g. before a CLI process exits)."""
+        if "skill_writer" in self.__dict__:
+            self.skill_writer.wait(timeout)
+
+    @staticmethod
+    def _skill_description(code, user_query):
+        # The first docstring in the skill, else the query it was written for
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return user_query
+        for node in [tree] + [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]:
+            docstring = ast.get_docstring(node)
+            if docstring:
+                return docstring.strip().splitlines()[0]
+        return user_query
+
+    @staticmethod
+    def _prepared_test(test_future):
+        """The concurrently generated test, or None (the integrity loop then generates it itself)."""
+        try:
+            return test_future.result()
+        except Exception as e:
+            print(f"Orchestrator Warning: Test generation failed while drafting: {e}")
+            return None
+
+    def _pack_context(self, user_query, scored_chunks, data_context, history, model_name):
+        """
+        Packs query > RAG chunks (by score) > data context > history into the
+        PROMPT_BUDGETS["draft_context"] token budget. Returns (context, budget report).
+        """
+        sections = [Section("query", user_query, priority=0, required=True)]
+        for rank, (chunk, score) in enumerate(scored_chunks):
+            sections.append(Section("rag", chunk, priority=1, score=score, label=f"rag[{rank}] score={score:.3f}"))
+        if data_context:
+            sections.append(Section("data", str(data_context), priority=2))
+        for turn, message in enumerate(history or []):
+            # Later turns score higher, so the most recent ones survive a tight budget
+            sections.append(Section("history", str(message), priority=3, score=turn, label=f"history[{turn}]"))
+
+        packed = PromptBudget(model_name, PROMPT_BUDGETS["draft_context"]).pack(sections)
+        context = f"{packed.text('query')}\n\nContext:\n{packed.text('rag')}\nData: {packed.text('data') or None}"
+        history_text = packed.text("history", sep="\n")
+        if history_text:
+            context += f"\n\nConversation so far:\n{history_text}"
+        return context, packed.report()
+
+    def _stage(self, message):
+        print(f"Orchestrator: {message}")
+        return {"type": "stage", "message": message}
+
+    def _result(self, code, output, trace_log):
+        return {"type": "result", "code": code, "output": output, "trace": trace_log}
+
+    def _execute_skill(self, code, data, deterministic=True):
+        """
+        Runs a stored skill; returns (code, output, cached). A deterministic skill
+        already run on the same data in the same environment isn't run again.
+        """
+        from paper2agent.sandbox.cache import ExecutionCache, is_deterministic
+
+        key = None
+        if self.execution_cache is not None and deterministic and is_deterministic(code):
+            key = ExecutionCache.make_key(code, data)
+            stdout = self.execution_cache.get(key)
+            if stdout is not None:
+                print("Orchestrator: Skill result served from the execution cache.")
+                return code, stdout, True
 
-    def _execute_skill(self, code, data):
         print("Orchestrator: Executing retrieved skill...")
         result = self.sandbox.run(code)
-        if hasattr(result, 'output'):
-             return code, result.output
-        return code, str(result)
+        if hasattr(result, 'stdout'):
+             if key is not None and result.success:
+                 self.execution_cache.put(key, result.stdout)
+             return code, result.stdout, False
+        return code, str(result), False
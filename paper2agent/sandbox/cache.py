@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import platform
+import re
+import sys
+import threading
+
+from paper2agent.cache_store import SQLiteLRUStore
+from paper2agent.llm.config import EXECUTION_CACHE_CONFIG
+
+# A skill containing this comment is always executed, never served from the cache
+NONDETERMINISTIC_MARKER = re.compile(r"#\s*paper2agent:\s*nondeterministic\b", re.IGNORECASE)
+
+
+def execution_cache_enabled():
+    env = os.environ.get("PAPER2AGENT_EXEC_CACHE")
+    if env is not None:
+        return env.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(EXECUTION_CACHE_CONFIG.get("enabled", False))
+
+
+def default_execution_cache():
+    """The ExecutionCache configured by EXECUTION_CACHE_CONFIG, or None if disabled."""
+    if not execution_cache_enabled():
+        return None
+    return ExecutionCache(
+        path=os.environ.get("PAPER2AGENT_EXEC_CACHE_PATH", EXECUTION_CACHE_CONFIG["path"]),
+        max_entries=EXECUTION_CACHE_CONFIG["max_entries"],
+        max_bytes=EXECUTION_CACHE_CONFIG["max_bytes"],
+        ttl_seconds=EXECUTION_CACHE_CONFIG["ttl_seconds"],
+    )
+
+
+def is_deterministic(code):
+    return NONDETERMINISTIC_MARKER.search(code) is None
+
+
+def data_fingerprint(data_context):
+    """
+    Identity of the data a skill runs against: the SHA-256 of the file's bytes for
+    a path (so a renamed copy still matches, an edited file doesn't), else of the
+    value itself.
+    """
+    if data_context is None:
+        return "none"
+    if isinstance(data_context, str) and os.path.isfile(data_context):
+        from paper2agent.knowledge.papers import file_sha256
+        return "file:" + file_sha256(data_context)
+    return "value:" + hashlib.sha256(str(data_context).encode("utf-8")).hexdigest()
+
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def environment_fingerprint():
+    """
+    Hash of the interpreter and the installed distributions (name==version), so
+    an upgrade of Python or of any package the skill may import invalidates results.
+    Computed once per process.
+    """
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            from importlib.metadata import distributions
+
+            packages = sorted({f"{dist.metadata['Name']}=={dist.version}" for dist in distributions()
+                               if dist.metadata["Name"]})
+            payload = json.dumps({"executable": sys.executable, "python": sys.version,
+                                  "platform": platform.platform(), "packages": packages})
+            _environment = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return _environment
+
+
+class ExecutionCache(SQLiteLRUStore):
+    """
+    Persistent store of skill execution results (SQLite-backed).
+
+    Entries are keyed by a SHA-256 of the skill code, the data fingerprint and the
+    environment fingerprint, and hold the run's stdout. Expired entries are dropped
+    on access, and the least recently used ones are evicted once `max_entries` or
+    `max_bytes` is exceeded.
+    """
+
+    TABLE = "executions"
+    VALUE_COLUMN = ("stdout", "TEXT")
+
+    def __init__(self, path="./exec_cache/results.sqlite3", max_entries=5000, max_bytes=64 * 1024 * 1024,
+                 ttl_seconds=24 * 3600):
+        super().__init__(path, max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def make_key(code, data_context=None, environment=None):
+        payload = json.dumps({
+            "code": hashlib.sha256(code.encode("utf-8")).hexdigest(),
+            "data": data_fingerprint(data_context),
+            "environment": environment or environment_fingerprint(),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """The stored stdout for `key`, or None."""
+        return self._load(key)
+
+    def put(self, key, stdout):
+        self._store(key, stdout, len(stdout.encode("utf-8")))
@@ -0,0 +1,134 @@
+import ast
+import hashlib
+import re
+
+
+class _Normalizer(ast.NodeTransformer):
+    """
+    Drops docstrings and, with rename=True, replaces the names a skill binds itself
+    (functions, parameters, assigned variables) by placeholders in order of first
+    appearance. Names it only reads (builtins, imports, globals) are kept.
+    """
+
+    def __init__(self, rename):
+        self.rename = rename
+        self.names = {}
+
+    def _placeholder(self, name):
+        return self.names.setdefault(name, f"_v{len(self.names)}")
+
+    @staticmethod
+    def _strip_docstring(node):
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+
+    def visit_Module(self, node):
+        self._strip_docstring(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_ClassDef(self, node):
+        self._strip_docstring(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_FunctionDef(self, node):
+        self._strip_docstring(node)
+        if self.rename:
+            node.name = self._placeholder(node.name)
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        if self.rename:
+            node.arg = self._placeholder(node.arg)
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node):
+        if self.rename and (isinstance(node.ctx, ast.Store) or node.id in self.names):
+            node.id = self._placeholder(node.id)
+        return node
+
+
+def _normalized(code, rename):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    return _Normalizer(rename).visit(tree)
+
+
+def canonical_hash(code):
+    """
+    Identity of a skill's code: SHA-256 of its AST without docstrings. Comments,
+    formatting and docstring edits don't change it. Unparseable code falls back
+    to its whitespace-normalized text.
+    """
+    tree = _normalized(code, rename=False)
+    text = ast.dump(tree) if tree is not None else " ".join(code.split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def structural_hash(code):
+    """Like canonical_hash(), but also blind to the names a skill gives its functions, parameters and variables."""
+    tree = _normalized(code, rename=True)
+    text = ast.dump(tree) if tree is not None else " ".join(code.split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def shingles(code, size=5):
+    """Overlapping `size`-token windows of the renamed, docstring-free source."""
+    tree = _normalized(code, rename=True)
+    tokens = re.findall(r"\w+|[^\w\s]", ast.unparse(tree) if tree is not None else code)
+    return {tuple(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))}
+
+
+def similarity(a, b):
+    """Jaccard similarity of two shingle sets."""
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def cluster_skills(skills, threshold=0.9):
+    """
+    Groups near-duplicate skills: same structural hash, or shingle similarity of
+    at least `threshold`. `skills` are dicts with "id" and "code"; returns lists of
+    skills, each list oldest first (by "created_at"), singletons included.
+    """
+    parent = {skill["id"]: skill["id"] for skill in skills}
+
+    def find(skill_id):
+        while parent[skill_id] != skill_id:
+            parent[skill_id] = parent[parent[skill_id]]
+            skill_id = parent[skill_id]
+        return skill_id
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    structures = {skill["id"]: structural_hash(skill["code"]) for skill in skills}
+    by_structure = {}
+    for skill in skills:
+        structure = structures[skill["id"]]
+        if structure in by_structure:
+            union(skill["id"], by_structure[structure])
+        else:
+            by_structure[structure] = skill["id"]
+
+    if threshold is not None and threshold <= 1.0:
+        # Pairwise only between structurally distinct skills
+        representatives = [skill for skill in skills if by_structure[structures[skill["id"]]] == skill["id"]]
+        shingle_sets = {skill["id"]: shingles(skill["code"]) for skill in representatives}
+        for i, a in enumerate(representatives):
+            for b in representatives[i + 1:]:
+                if find(a["id"]) != find(b["id"]) and similarity(shingle_sets[a["id"]], shingle_sets[b["id"]]) >= threshold:
+                    union(a["id"], b["id"])
+
+    clusters = {}
+    for skill in skills:
+        clusters.setdefault(find(skill["id"]), []).append(skill)
+    return [sorted(members, key=lambda skill: skill.get("created_at") or 0) for members in clusters.values()]
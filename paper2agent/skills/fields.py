@@ -0,0 +1,37 @@
+import ast
+
+
+def skill_fields(code):
+    """
+    What a skill's source says about it, for indexing: the name and signature of
+    its main (first public top-level) function, the parameter names, the return
+    annotation, the imported top-level modules and the docstring (module docstring,
+    else the main function's). Code that doesn't parse yields empty fields.
+    """
+    fields = {"name": "", "signature": "", "params": [], "returns": "", "imports": [], "docstring": ""}
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return fields
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imports.append(node.module.split(".")[0])
+    fields["imports"] = sorted(set(imports))
+
+    functions = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    main = next((node for node in functions if not node.name.startswith("_")), functions[0] if functions else None)
+    if main is not None:
+        args = main.args
+        fields["name"] = main.name
+        fields["params"] = [arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs]
+        fields["returns"] = ast.unparse(main.returns) if main.returns is not None else ""
+        signature = f"def {main.name}({ast.unparse(args)})"
+        fields["signature"] = signature + (f" -> {fields['returns']}" if fields["returns"] else "")
+
+    docstring = ast.get_docstring(tree) or (ast.get_docstring(main) if main is not None else None)
+    fields["docstring"] = (docstring or "").strip()
+    return fields
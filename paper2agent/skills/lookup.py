@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+
+# Words that carry no meaning for matching one request against another
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it me of on or please the this to using what with".split()
+)
+
+
+def normalize_query(query):
+    """Lower-cased words only, so spacing, case and punctuation don't change a query's identity."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def query_hash(query):
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def tokens(text):
+    """Content words of `text`; snake_case and camelCase names are split into words."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS}
+
+
+class TierStats:
+    """Lookups, hits and cumulative latency of each lookup tier."""
+
+    def __init__(self, tiers):
+        self._stats = {tier: {"lookups": 0, "hits": 0, "seconds": 0.0} for tier in tiers}
+        self._lock = threading.Lock()
+
+    def record(self, tier, hit, seconds):
+        with self._lock:
+            stats = self._stats[tier]
+            stats["lookups"] += 1
+            stats["hits"] += int(bool(hit))
+            stats["seconds"] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                tier: {"lookups": s["lookups"], "hits": s["hits"],
+                       "hit_rate": (s["hits"] / s["lookups"]) if s["lookups"] else 0.0,
+                       "avg_ms": (1000 * s["seconds"] / s["lookups"]) if s["lookups"] else 0.0}
+                for tier, s in self._stats.items()
+            }
+
+
+class SkillLookupIndex:
+    """
+    In-memory front tiers of the skill lookup: an exact map from normalized-query
+    hashes to skills, then a lexical (inverted word index, Jaccard) match against
+    each skill's query or description. Both answer in well under a millisecond;
+    queries neither resolves fall through to vector search.
+    """
+
+    def __init__(self, lexical_min_score=0.8):
+        self.lexical_min_score = lexical_min_score
+        self._exact = {}
+        self._words = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._words)
+
+    def add(self, skill_id, query=None, description=None, aliases=()):
+        """Indexes a skill under its query, description and `aliases` (other queries it answers)."""
+        # Queries and description are matched separately: a short query shouldn't be
+        # diluted by the words of a long description
+        queries = [q for q in [query, *aliases] if q]
+        fields = [words for words in [tokens(q) for q in queries] + [tokens(description)] if words]
+        with self._lock:
+            for q in queries:
+                self._exact[query_hash(q)] = skill_id
+            if fields:
+                self._words[skill_id] = fields
+                for word in set().union(*fields):
+                    self._postings.setdefault(word, set()).add(skill_id)
+
+    def remove(self, skill_id):
+        with self._lock:
+            self._exact = {key: value for key, value in self._exact.items() if value != skill_id}
+            for word in set().union(*self._words.pop(skill_id, [set()])):
+                self._postings[word].discard(skill_id)
+
+    def exact(self, query):
+        """Id of the skill stored for this (normalized) query, or None."""
+        with self._lock:
+            return self._exact.get(query_hash(query))
+
+    def lexical(self, query):
+        """(skill id, Jaccard score) of the best word-overlap match at or above lexical_min_score, or None."""
+        words = tokens(query)
+        if not words:
+            return None
+        best = None
+        with self._lock:
+            candidates = set().union(*(self._postings.get(word, ()) for word in words))
+            for skill_id in candidates:
+                score = max(len(words & field) / len(words | field) for field in self._words[skill_id])
+                if best is None or score > best[1]:
+                    best = (skill_id, score)
+        if best is None or best[1] < self.lexical_min_score:
+            return None
+        return best
+
+
+def calibrate_threshold(samples):
+    """
+    Picks the vector distance cutoff that classifies labelled lookups best.
+    `samples` are (distance of the nearest skill, whether it was the right skill)
+    pairs; returns the cutoff accepting the most correct and rejecting the most
+    wrong matches (ties go to the stricter cutoff), or None without samples.
+    """
+    if not samples:
+        return None
+    candidates = sorted({distance for distance, _ in samples})
+    best_cutoff, best_correct = None, -1
+    for cutoff in candidates:
+        correct = sum(1 for distance, right in samples if (distance <= cutoff) == bool(right))
+        if correct > best_correct:
+            best_cutoff, best_correct = cutoff, correct
+    # Rejecting everything may beat every cutoff (all nearest matches were wrong)
+    if sum(1 for _, right in samples if not right) > best_correct:
+        return min(candidates) / 2
+    return best_cutoff
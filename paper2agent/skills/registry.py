@@ -1,37 +1,300 @@
-import chromadb
-from chromadb.config import Settings
-import uuid
+import json
+import os
+import threading
+import time
+
+from paper2agent.llm.config import SKILL_DEDUPE_CONFIG, SKILL_LOOKUP_CONFIG
+from paper2agent.skills.dedupe import canonical_hash, cluster_skills, structural_hash
+from paper2agent.skills.fields import skill_fields
+from paper2agent.skills.lookup import SkillLookupIndex, TierStats, calibrate_threshold
+from paper2agent.skills.store import SkillStore
 
 class SkillRegistry:
-    def __init__(self, persist_directory="./skills_db"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(name="skills")
+    # Cheapest first; the first tier with a confident match answers
+    TIERS = ("exact", "lexical", "vector")
+    # Per-field embeddings (query and aliases, docstring, signature); the code lives in the SkillStore side table
+    COLLECTION = "skill_fields"
+    LEGACY_COLLECTION = "skills"  # Earlier layout: one document per skill, its raw code
 
-    def retrieve(self, query, n_results=1):
+    def __init__(self, persist_directory="./skills_db", collection=None):
+        self.persist_directory = persist_directory
+        self.skills = SkillStore(os.path.join(persist_directory, "skills.sqlite3"))
+        self._collection = collection
+        self._collection_lock = threading.RLock()
+
+        self.calibration_path = os.path.join(persist_directory, "lookup_calibration.json")
+        self.vector_max_distance = self._configured_max_distance()
+        self.tier_stats = TierStats(self.TIERS)
+        self._index = None
+        self._nondeterministic = set()
+
+    @property
+    def collection(self):
+        # Chroma is opened for vector search and writes only; exact and lexical hits never import it
+        with self._collection_lock:
+            if self._collection is None:
+                import chromadb  # Heavy; only imported by commands that open the registry
+                self.client = chromadb.PersistentClient(path=self.persist_directory)
+                self._collection = self.client.get_or_create_collection(name=self.COLLECTION)
+                self._migrate_legacy()
+            return self._collection
+
+    def _migrate_legacy(self):
+        # Caller holds the collection lock. Re-indexes skills stored as raw-code documents.
+        try:
+            legacy = self.client.get_collection(self.LEGACY_COLLECTION)
+        except Exception:
+            return
+        stored = legacy.get(include=["documents", "metadatas"])
+        for code, metadata in zip(stored["documents"], stored["metadatas"]):
+            metadata = metadata or {}
+            self._upsert(self._skill_record(
+                code, metadata.get("description"), json.loads(metadata.get("verification_log") or '{"success": true}'),
+                query=metadata.get("query"), test_case=metadata.get("test_case"), model=metadata.get("model"),
+                deterministic=metadata.get("deterministic", True)))
+        self.client.delete_collection(self.LEGACY_COLLECTION)
+        print(f"SkillRegistry: Moved {len(stored['ids'])} skill(s) to the multi-field index.")
+
+    def _configured_max_distance(self):
+        env = os.environ.get("PAPER2AGENT_SKILL_MAX_DISTANCE")
+        if env:
+            return float(env)
+        try:
+            with open(self.calibration_path) as f:
+                calibration = json.load(f)
+            if calibration.get("index") == self.COLLECTION:  # Cutoffs fitted to another index don't carry over
+                return float(calibration["vector_max_distance"])
+        except (OSError, ValueError, KeyError):
+            pass
+        return SKILL_LOOKUP_CONFIG["vector_max_distance"]
+
+    def _lookup_index(self):
+        # Built from the side table on first lookup, then kept current by store()
+        if self._index is None:
+            if not len(self.skills) and os.path.exists(os.path.join(self.persist_directory, "chroma.sqlite3")):
+                self.collection  # A registry from before the side table: migrate it first
+            index = SkillLookupIndex(lexical_min_score=SKILL_LOOKUP_CONFIG["lexical_min_score"])
+            for skill in self.skills.all():
+                self._index_skill(index, skill)
+            self._index = index
+        return self._index
+
+    def _index_skill(self, index, skill):
+        if not skill["deterministic"]:
+            self._nondeterministic.add(skill["id"])
+        index.add(skill["id"], query=skill["query"], description=skill["description"] or skill["docstring"],
+                  aliases=skill["aliases"])
+
+    def lookup(self, query):
         """
-        Semantic search for existing tools/skills.
+        Tiered search for a skill that answers `query`: exact normalized query,
+        then word overlap, then vector search within vector_max_distance.
+        Returns {"id", "code", "tier", "score", "deterministic", "seconds"} or None.
         """
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        
-        # Unpack results if any found
-        if results['documents'] and results['documents'][0]:
-            return results['documents'][0][0] # Return the best match code
+        start = time.perf_counter()
+        index = self._lookup_index()
+
+        tier_start = time.perf_counter()
+        skill_id = index.exact(query)
+        self.tier_stats.record("exact", skill_id, time.perf_counter() - tier_start)
+        if skill_id is not None:
+            return self._match(skill_id, "exact", 1.0, start)
+
+        tier_start = time.perf_counter()
+        match = index.lexical(query)
+        self.tier_stats.record("lexical", match, time.perf_counter() - tier_start)
+        if match is not None:
+            return self._match(match[0], "lexical", match[1], start)
+
+        tier_start = time.perf_counter()
+        nearest = self._nearest(query)
+        hit = nearest is not None and nearest[1] <= self.vector_max_distance
+        self.tier_stats.record("vector", hit, time.perf_counter() - tier_start)
+        if hit:
+            return self._match(nearest[0], "vector", nearest[1], start, code=nearest[2])
+        return None
+
+    def _match(self, skill_id, tier, score, start, code=None):
+        if code is None:
+            code = self.skills.get(skill_id)["code"]
+        return {"id": skill_id, "code": code, "tier": tier, "score": score,
+                "deterministic": skill_id not in self._nondeterministic, "seconds": time.perf_counter() - start}
+
+    def _nearest(self, query):
+        """
+        (id, fused distance, code) of the nearest stored skill, or None for an empty
+        registry. Each field's distance is divided by its weight in
+        SKILL_LOOKUP_CONFIG["field_weights"]; a skill's closest field decides.
+        """
+        collection = self.collection
+        count = collection.count()
+        if count == 0:
+            return None
+        results = collection.query(query_texts=[query], n_results=min(count, SKILL_LOOKUP_CONFIG["vector_candidates"]),
+                                   include=["distances", "metadatas"])
+        if not results["ids"] or not results["ids"][0]:
+            return None
+
+        weights = SKILL_LOOKUP_CONFIG["field_weights"]
+        fused = {}
+        for distance, metadata in zip(results["distances"][0], results["metadatas"][0]):
+            skill_id = metadata["skill_id"]
+            score = distance / weights.get(metadata["field"], 1.0)
+            fused[skill_id] = min(score, fused.get(skill_id, score))
+        for skill_id, distance in sorted(fused.items(), key=lambda item: item[1]):
+            skill = self.skills.get(skill_id)
+            if skill is not None:
+                return skill_id, distance, skill["code"]
         return None
 
-    def store(self, function_code, description, verification_log):
+    def retrieve(self, query, n_results=1):
+        """
+        The code of the skill that answers `query` (see lookup()), or None.
+        """
+        match = self.lookup(query)
+        return match["code"] if match else None
+
+    def count(self):
+        return len(self.skills)
+
+    def lookup_stats(self):
+        """Lookups, hits, hit rate and average latency (ms) of each tier."""
+        return self.tier_stats.snapshot()
+
+    def calibrate(self, labelled_queries, save=True):
+        """
+        Fits vector_max_distance to `labelled_queries`: (query, id of the skill that
+        should answer it, or None if none should) pairs. Saved next to the registry
+        unless save=False. Returns the new cutoff (unchanged without usable samples).
+        """
+        samples = []
+        for query, expected_id in labelled_queries:
+            nearest = self._nearest(query)
+            if nearest is not None:
+                samples.append((nearest[1], expected_id is not None and nearest[0] == expected_id))
+        cutoff = calibrate_threshold(samples)
+        if cutoff is None:
+            return self.vector_max_distance
+        self.vector_max_distance = cutoff
+        if save:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            with open(self.calibration_path, "w") as f:
+                json.dump({"vector_max_distance": cutoff, "index": self.COLLECTION, "samples": len(samples),
+                           "calibrated_at": time.time()}, f)
+        return cutoff
+
+    def store(self, function_code, description, verification_log, query=None, test_case=None, model=None,
+              deterministic=True):
         """
-        Store a skill only if it has passed verification.
+        Store a skill only if it has passed verification. The originating query,
+        its test case and the model that wrote it are kept with the code.
+        Pass deterministic=False for skills whose output changes from run to run,
+        so their results are never served from the execution cache.
+
+        Skills are keyed by the hash of their normalized AST: storing the same code
+        again (or a variant that only renames things) updates the existing skill,
+        and the new query becomes one more query it answers.
         """
         if not verification_log.get("success", False):
             # Do not store failed skills
             return False
 
-        self.collection.add(
-            documents=[function_code],
-            metadatas=[{"description": description, "verified": True}],
-            ids=[str(uuid.uuid4())]
-        )
+        self._upsert(self._skill_record(function_code, description, verification_log, query=query,
+                                        test_case=test_case, model=model, deterministic=deterministic))
         return True
+
+    @staticmethod
+    def _skill_record(code, description, verification_log, query=None, test_case=None, model=None,
+                      deterministic=True):
+        return {"id": canonical_hash(code), "structure": structural_hash(code), "code": code,
+                "description": description, "query": query, "aliases": [], "test_case": test_case, "model": model,
+                "deterministic": bool(deterministic), "verification_log": verification_log,
+                "created_at": time.time(), **skill_fields(code)}
+
+    def _upsert(self, skill):
+        existing = self.skills.get(skill["id"]) or self.skills.find_by_structure(skill["structure"])
+        if existing is not None:
+            skill = self._merge(existing, [skill])
+        self._add(skill, replace=existing is not None)
+
+    @staticmethod
+    def _merge(keeper, others):
+        """`keeper` (code, id, fields) extended with the queries of `others`."""
+        merged = dict(keeper)
+        queries = [keeper["query"], *keeper["aliases"]]
+        for other in others:
+            for query in [other["query"], *other["aliases"]]:
+                if query and query not in queries:
+                    queries.append(query)
+        merged["query"] = next((query for query in queries if query), None)
+        merged["aliases"] = [query for query in queries if query and query != merged["query"]]
+        merged["description"] = keeper["description"] or next((o["description"] for o in others if o["description"]), None)
+        merged["test_case"] = keeper["test_case"] or next((o["test_case"] for o in others if o["test_case"]), None)
+        merged["deterministic"] = keeper["deterministic"] and all(other["deterministic"] for other in others)
+        return merged
+
+    def _add(self, skill, replace=False):
+        texts = [("query", f"{skill['id']}:query", skill["query"]),
+                 *[("query", f"{skill['id']}:query-{n}", alias) for n, alias in enumerate(skill["aliases"], 1)],
+                 ("docstring", f"{skill['id']}:docstring", skill["docstring"] or skill["description"]),
+                 ("signature", f"{skill['id']}:signature", skill["signature"])]
+        texts = [(field, doc_id, text) for field, doc_id, text in texts if text]
+        stale = set()
+        if replace:
+            stale = set(self.collection.get(where={"skill_id": skill["id"]}, include=[])["ids"])
+            stale -= {doc_id for _, doc_id, _ in texts}
+        if texts:
+            # Chroma metadata values must be scalars
+            shared = {"skill_id": skill["id"], "name": skill["name"], "params": ", ".join(skill["params"]),
+                      "returns": skill["returns"], "imports": ", ".join(skill["imports"])}
+            self.collection.upsert(
+                ids=[doc_id for _, doc_id, _ in texts],
+                documents=[text for _, _, text in texts],
+                metadatas=[{**shared, "field": field} for field, _, _ in texts],
+            )
+        if stale:
+            # Only once the new embeddings are in: a failed write leaves the old ones searchable
+            self.collection.delete(ids=sorted(stale))
+        # Written after the embeddings: a skill in the side table is always searchable
+        self.skills.put(skill)
+        if self._index is not None:
+            self._index.remove(skill["id"])
+            self._nondeterministic.discard(skill["id"])
+            self._index_skill(self._index, skill)
+
+    def _remove(self, skill_id):
+        self.collection.delete(where={"skill_id": skill_id})
+        self.skills.delete(skill_id)
+        if self._index is not None:
+            self._index.remove(skill_id)
+        self._nondeterministic.discard(skill_id)
+
+    def dedupe(self, threshold=None, dry_run=False):
+        """
+        Compacts the registry: merges near-duplicate skills (same structure, or token
+        shingles overlapping by at least `threshold`, default SKILL_DEDUPE_CONFIG)
+        into the oldest of each cluster, and re-keys skills stored under ids other
+        than their canonical hash. Returns {"before", "after", "clusters"}, where
+        clusters lists {"kept", "merged"} ids.
+        """
+        threshold = SKILL_DEDUPE_CONFIG["near_duplicate_threshold"] if threshold is None else threshold
+        skills = self.skills.all()
+        report = {"before": len(skills), "after": len(skills), "clusters": []}
+        for members in cluster_skills(skills, threshold):
+            keeper, others = members[0], members[1:]
+            canonical = canonical_hash(keeper["code"])
+            if others:
+                report["clusters"].append({"kept": keeper["id"], "merged": [other["id"] for other in others]})
+                report["after"] -= len(others)
+            elif keeper["id"] == canonical and keeper.get("structure"):
+                continue
+            if dry_run:
+                continue
+            merged = self._merge(keeper, others)
+            merged.update(id=canonical, structure=structural_hash(keeper["code"]))
+            # Merged skill first, so a failed write loses nothing; then the ids it replaces
+            self._add(merged, replace=True)
+            for member in members:
+                if member["id"] != canonical:
+                    self._remove(member["id"])
+        return report
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import threading
+import time
+
+from paper2agent.llm.telemetry import get_telemetry
+
+
+class SkillCacheStats:
+    """
+    Per-day counters of skill registry lookups, hits and write-backs (SQLite-backed),
+    so the registry's hit rate can be followed as verified skills accumulate.
+    Lookups and writes are also counted in the in-process Prometheus metrics.
+    """
+
+    def __init__(self, path="./skills_db/cache_stats.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS skill_cache_daily (
+                day TEXT PRIMARY KEY,
+                lookups INTEGER NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                writes INTEGER NOT NULL DEFAULT 0,
+                write_failures INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _today():
+        return time.strftime("%Y-%m-%d", time.localtime())
+
+    def _bump(self, **columns):
+        assignments = ", ".join(f"{column} = {column} + ?" for column in columns)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO skill_cache_daily (day) VALUES (?)", (self._today(),))
+            self._conn.execute(f"UPDATE skill_cache_daily SET {assignments} WHERE day = ?",
+                               (*columns.values(), self._today()))
+            self._conn.commit()
+
+    def record_lookup(self, hit):
+        self._bump(lookups=1, hits=int(bool(hit)))
+        get_telemetry().metrics.inc("paper2agent_skill_lookups_total", {"result": "hit" if hit else "miss"})
+
+    def record_write(self, stored):
+        self._bump(writes=int(bool(stored)), write_failures=int(not stored))
+        get_telemetry().metrics.inc("paper2agent_skill_writes_total", {"status": "stored" if stored else "failed"})
+
+    def daily(self, days=30):
+        """The last `days` days with activity, oldest first, each with its hit rate."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, lookups, hits, writes, write_failures FROM skill_cache_daily ORDER BY day DESC LIMIT ?",
+                (days,),
+            ).fetchall()
+        return [
+            {"day": day, "lookups": lookups, "hits": hits, "hit_rate": (hits / lookups) if lookups else 0.0,
+             "writes": writes, "write_failures": write_failures}
+            for day, lookups, hits, writes, write_failures in reversed(rows)
+        ]
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_COLUMNS = ("id", "code", "description", "query", "test_case", "model", "deterministic", "verification_log",
+            "name", "signature", "params", "returns", "imports", "docstring", "created_at", "structure", "aliases")
+_JSON_COLUMNS = {"verification_log": dict, "params": list, "imports": list, "aliases": list}
+# Columns added after the table was first released: name -> SQL type
+_ADDED_COLUMNS = {"structure": "TEXT", "aliases": "TEXT"}
+
+
+class SkillStore:
+    """
+    Side table holding each skill's code and descriptive fields (SQLite-backed).
+
+    The vector index only embeds short text fields (query, docstring, signature);
+    the code itself is stored once here and read back by id on a hit.
+    """
+
+    def __init__(self, path="./skills_db/skills.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS skills (
+                id TEXT PRIMARY KEY,
+                code TEXT NOT NULL,
+                description TEXT,
+                query TEXT,
+                test_case TEXT,
+                model TEXT,
+                deterministic INTEGER NOT NULL DEFAULT 1,
+                verification_log TEXT,
+                name TEXT,
+                signature TEXT,
+                params TEXT,
+                returns TEXT,
+                imports TEXT,
+                docstring TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(skills)")}
+        for column, sql_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE skills ADD COLUMN {column} {sql_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_skills_structure ON skills (structure)")
+        self._conn.commit()
+
+    def put(self, skill):
+        """Inserts or replaces `skill`, a dict with (a subset of) the table's columns; "id" and "code" are required."""
+        row = {column: skill.get(column) for column in _COLUMNS}
+        row["deterministic"] = int(skill.get("deterministic", True))
+        row["created_at"] = skill["created_at"] if skill.get("created_at") is not None else time.time()
+        for column, empty in _JSON_COLUMNS.items():
+            row[column] = json.dumps(row[column] if row[column] is not None else empty(), default=str)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO skills ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(row[column] for column in _COLUMNS),
+            )
+            self._conn.commit()
+
+    def get(self, skill_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM skills WHERE id = ?", (skill_id,)).fetchone()
+        return self._skill(row) if row is not None else None
+
+    def find_by_structure(self, structure):
+        """The oldest skill with this structural hash (see skills/dedupe.py), or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM skills WHERE structure = ? "
+                                     "ORDER BY created_at LIMIT 1", (structure,)).fetchone()
+        return self._skill(row) if row is not None else None
+
+    def all(self):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM skills ORDER BY created_at").fetchall()
+        return [self._skill(row) for row in rows]
+
+    def delete(self, skill_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM skills WHERE id = ?", (skill_id,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM skills").fetchone()[0]
+
+    @staticmethod
+    def _skill(row):
+        skill = dict(zip(_COLUMNS, row))
+        skill["deterministic"] = bool(skill["deterministic"])
+        for column, empty in _JSON_COLUMNS.items():
+            skill[column] = json.loads(skill[column]) if skill[column] else empty()
+        return skill
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class SkillWriteBack:
+    """
+    Stores verified skills in the registry on a background thread, off the
+    response path (embedding and the Chroma write happen after the answer is
+    returned). `registry_factory` is called on the worker, so a registry that
+    isn't built yet is built there too.
+    """
+
+    def __init__(self, registry_factory, stats=None):
+        self._registry_factory = registry_factory
+        self.stats = stats
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="skill-writeback")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, code, query, description, test_case=None, model=None, verification_log=None):
+        """Queues a write; returns the Future of registry.store()."""
+        future = self._pool.submit(self._write, code, query, description, test_case, model, verification_log or {})
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _write(self, code, query, description, test_case, model, verification_log):
+        try:
+            stored = self._registry_factory().store(code, description, verification_log, query=query,
+                                                    test_case=test_case, model=model)
+        except Exception as e:
+            print(f"SkillWriteBack Warning: Failed to store skill for '{query}': {e}")
+            stored = False
+        if self.stats is not None:
+            self.stats.record_write(stored)
+        return stored
+
+    def wait(self, timeout=None):
+        """Blocks until every queued write finished (or `timeout` seconds passed)."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
@@ -8,47 +8,10 @@ from paper2agent.orchestrator import Orchestrator
 # Global Orchestrator instance
 orch = None
 
-def init_system(pdf_file, persona_prompt):
+def _domain_model(message, domain):
     """
-    Initialize the R-ASA system with the uploaded PDF and Persona.
-    """
-    global orch
-    if pdf_file is None:
-        return "⚠️ Please upload a PDF first."
-    
-    paper_path = pdf_file.name
-    
-    # Initialize Orchestrator
-    # Note: in a real app, we might restart or re-ingest here.
-    orch = Orchestrator()
-    
-    # Ingest the paper immediately to prepare the RAG DB
-    try:
-        orch.ingest.process(paper_path)
-        # Hacky re-ingest trigger if needed, or just let process_query handle it.
-        # process_query handles ingestion if paper_path is passed, but for Chat 
-        # we want it pre-loaded.
-        # Let's trust Orchestrator logic.
-    except Exception as e:
-        return f"❌ Error Ingesting Paper: {e}"
-
-    return f"✅ System Initialized with {os.path.basename(paper_path)}.\nPersona: {persona_prompt or 'Default'}"
-
-def chat_response(message, history, pdf_file, domain, grounding_override=None):
+    Maps the selected domain to a synthesizer override and domain-framed message.
     """
-    Handle chat messages.
-    """
-    global orch
-    if orch is None or pdf_file is None:
-        if pdf_file:
-             init_system(pdf_file, f"Domain: {domain}")
-        else:
-             return "Please upload a paper first."
-             
-    paper_path = pdf_file.name
-    
-    # Determine Model based on Domain
-    # Determine Model based on Domain
     model_override = None
     if "Biomedical" in domain:
          if "Gemma-2" in domain:
@@ -61,15 +24,48 @@ def chat_response(message, history, pdf_file, domain, grounding_override=None):
              model_override = "gemini-2.0-flash"  # Default fallback
          
          message = f"DOMAIN CONTEXT: You are a Clinical Decision Support System. Use the provided research paper logic to analyze this clinical case: {message}"
+    return message, model_override
 
-    try:
-        # Execute
-        result_code, result_output, trace = orch.process_query(message, paper_path=paper_path, model_override=model_override, grounding_override=grounding_override)
-        return result_output, trace
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return f"❌ Agent Error: {e}", {"error": str(e)}
+def _history_turns(history):
+    """
+    Turns Gradio chat history (4.x message dicts or 3.x (user, assistant) tuples)
+    into the "role: text" turns Orchestrator.process_query_stream expects, oldest first.
+    """
+    turns = []
+    for entry in history or []:
+        if isinstance(entry, dict):
+            pairs = [(entry.get("role", "user"), entry.get("content"))]
+        else:
+            pairs = list(zip(("user", "assistant"), entry))
+        for role, content in pairs:
+            if content:
+                turns.append(f"{role}: {content}")
+    return turns
+
+def chat_response_stream(message, history, pdf_file, domain, grounding_override=None):
+    """
+    Handle chat messages: yields Orchestrator stage/token/result events.
+    `history` holds the turns before `message`, in Gradio's chat format.
+    """
+    global orch
+    if pdf_file is None:
+        yield {"type": "result", "code": "", "output": "Please upload a paper first.", "trace": {}}
+        return
+    if orch is None:
+        init_system(pdf_file, domain)
+
+    message, model_override = _domain_model(message, domain)
+    yield from orch.process_query_stream(message, paper_path=pdf_file.name, model_override=model_override, grounding_override=grounding_override,
+                                         history=_history_turns(history))
+
+def _render_progress(stages, draft):
+    """
+    Markdown shown in the chat bubble while the answer is being produced.
+    """
+    lines = [f"⏳ {stage}" for stage in stages]
+    if draft:
+        lines.append(f"\n```python\n{draft}\n```")
+    return "\n".join(lines)
 
 def verify_hf_token(token):
     # Use huggingface_hub to check identity.
@@ -107,7 +103,7 @@ def init_system(pdf_file, domain):
               start_msg = f"⚠️ HF Connection Warning: {msg}\n"
 
     try:
-        orch.ingest.process(paper_path)
+        orch.ingest_paper(paper_path)
     except Exception as e:
         return f"{start_msg}❌ Error Ingesting Paper: {e}"
 
@@ -181,7 +177,7 @@ def launch_ui():
              ollama_status, ollama_msg = check_ollama()
              
              # Validation Check
-             from paper2agent.llm.client import LLMClient
+             from paper2agent.llm.client import get_client
              from paper2agent.llm.config import MODEL_CONFIG
              
              val_msg = "✅ Models Validated"
@@ -194,7 +190,7 @@ def launch_ui():
                  target_model = MODEL_CONFIG["openbiollm"]
              
              # Validate the SELECTED model
-             if not LLMClient(target_model).validate_connection():
+             if not get_client(target_model).validate_connection():
                  val_msg += f"\n⚠️ Synthesizer ({target_model}) Connectivity Check Failed."
              else:
                  val_msg += f"\n✅ Synthesizer ({target_model}) Online."
@@ -235,6 +231,7 @@ def launch_ui():
                 "Llama-3.1 8B (OpenRouter)": "openrouter/meta-llama/llama-3.1-8b-instruct"
             }
             grounding_model = grounding_map.get(grounding)
+            earlier_turns = list(chat_history)
             
             # Add user message and thinking placeholder
             if IS_GRADIO_4_PLUS:
@@ -247,32 +244,34 @@ def launch_ui():
             
             yield "", chat_history, {} # Yield immediately
 
-            # Get response
-            try:
-                bot_message_text, trace = chat_response(message, chat_history, pdf_file, domain, grounding_override=grounding_model)
-                
-                # Update history with actual response
+            def show(text):
                 if IS_GRADIO_4_PLUS:
                     # Messages format - update the last assistant message
-                    chat_history[-1] = {"role": "assistant", "content": bot_message_text}
+                    chat_history[-1] = {"role": "assistant", "content": text}
                 else:
                     # Tuples format
-                    chat_history[-1] = (message, bot_message_text)
-                
-                yield "", chat_history, trace
+                    chat_history[-1] = (message, text)
+
+            # Stream stages and draft tokens into the placeholder, then swap in the answer
+            try:
+                stages, draft, trace = [], "", {}
+                for event in chat_response_stream(message, earlier_turns, pdf_file, domain, grounding_override=grounding_model):
+                    if event["type"] == "stage":
+                        stages.append(event["message"])
+                    elif event["type"] == "token":
+                        draft += event["text"]
+
+                    if event["type"] == "result":
+                        show(event["output"])
+                        trace = event["trace"]
+                    else:
+                        show(_render_progress(stages, draft))
+                    yield "", chat_history, trace
                 
             except Exception as e:
                 import traceback
                 traceback.print_exc()
-                error_txt = f"❌ Error: {str(e)}"
-                
-                if IS_GRADIO_4_PLUS:
-                    # Messages format - update the last assistant message
-                    chat_history[-1] = {"role": "assistant", "content": error_txt}
-                else:
-                    # Tuples format
-                    chat_history[-1] = (message, error_txt)
-                
+                show(f"❌ Error: {str(e)}")
                 yield "", chat_history, {"error": str(e)}
 
         msg.submit(respond, [msg, chatbot, pdf_input, domain_input, grounding_input], [msg, chatbot, trace_out])
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock
+
+from paper2agent.agents.synthesizer import SkillSynthesizer
+from paper2agent.llm.batch import BatchResult
+from paper2agent.llm.budget import PromptBudget, Section, count_tokens, split_source, trim_to_tokens
+
+
+class TestPromptBudget(unittest.TestCase):
+    def test_counts_by_model_family(self):
+        text = "x" * 360
+        self.assertLess(count_tokens(text, "gemini-2.0-flash"), count_tokens(text, "ollama/deepseek-r1:8b"))
+        self.assertEqual(count_tokens("", "gemini-2.0-flash"), 0)
+
+    def test_packs_by_priority_and_score(self):
+        budget = PromptBudget("gemini-2.0-flash", max_tokens=120)
+        sections = [
+            Section("query", "q" * 40, priority=0, required=True),
+            Section("rag", "low " * 50, priority=1, score=0.2, label="low"),
+            Section("rag", "high " * 50, priority=1, score=0.9, label="high"),
+            Section("data", "d" * 400, priority=2, label="data"),
+        ]
+        packed = budget.pack(sections)
+        self.assertLessEqual(packed.used_tokens, 120)
+        self.assertIn("high", packed.text("rag"))
+        self.assertNotIn("low", packed.text("rag"))
+        dropped = {entry["section"]: entry["action"] for entry in packed.dropped}
+        self.assertEqual(dropped, {"low": "dropped", "data": "dropped"})
+
+    def test_required_section_is_trimmed_not_dropped(self):
+        packed = PromptBudget("gemini", max_tokens=20).pack([Section("query", "word\n" * 100, priority=0, required=True)])
+        self.assertTrue(packed.text("query"))
+        self.assertEqual(packed.dropped[0]["action"], "trimmed")
+
+    def test_trimmed_text_fits_its_budget_with_the_marker(self):
+        for text in ("word\n" * 100, "x" * 1000, "short"):
+            for max_tokens in (0, 1, 5, 20, 64, 200):
+                for model in ("gemini", "ollama/deepseek-r1:8b", None):
+                    trimmed = trim_to_tokens(text, max_tokens, model)
+                    self.assertLessEqual(count_tokens(trimmed, model), max_tokens, (text[:10], max_tokens, model))
+        self.assertIn("truncated", trim_to_tokens("word\n" * 100, 64, "gemini"))
+
+        packed = PromptBudget("gemini", max_tokens=50).pack([Section("query", "word\n" * 100, priority=0, required=True)])
+        self.assertLessEqual(packed.used_tokens, 50)
+
+
+class TestSplitSource(unittest.TestCase):
+    def test_splits_between_definitions_without_losing_code(self):
+        functions = [f"@decorator\ndef f{i}():\n    return {'1' * 200}\n\n" for i in range(10)]
+        code = "import os\n\n" + "".join(functions)
+        chunks = split_source(code, max_tokens=150, model_spec="gemini")
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), code)
+        for chunk in chunks[1:]:
+            self.assertTrue(chunk.startswith("@decorator"))
+
+    def test_extract_tools_covers_large_files(self):
+        synthesizer = SkillSynthesizer.__new__(SkillSynthesizer)
+        synthesizer.llm = MagicMock(model_name="gemini-2.0-flash")
+        synthesizer.llm.generate_many.side_effect = lambda prompts, **kw: [
+            BatchResult(i, p, response=f"### FUNCTION ###\ndef tool_{i}(x):\n    return x + {i}\n") for i, p in enumerate(prompts)
+        ]
+        code = "".join(f"def f{i}():\n    return '{'y' * 2000}'\n\n" for i in range(20))
+        tools = synthesizer.extract_tools(code, source_name="big.py")
+        prompts = synthesizer.llm.generate_many.call_args[0][0]
+        self.assertGreater(len(prompts), 1)
+        self.assertEqual(len(tools), len(prompts))
+        self.assertTrue(any("def f19" in p for p in prompts))  # nothing past the old 8000-char cut is lost
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paper2agent.agents.candidates import CandidateSynthesis, candidate_count
+
+
+def fake_client(model, provider="gemini"):
+    return SimpleNamespace(provider=provider, model_name=model, model_spec=f"{provider}/{model}")
+
+
+class FakeSynthesizer:
+    """Drafts `def f(): return <model's value>` after the model's delay."""
+
+    def __init__(self, delays, values):
+        self.delays = delays
+        self.values = values
+        self.calls = []
+
+    def _draft_prompt(self, query, context):
+        return f"{query}\n{context}"
+
+    async def adraft(self, query, context="", llm=None, use_cache=True):
+        self.calls.append((llm.model_name, use_cache))
+        await asyncio.sleep(self.delays[llm.model_name])
+        return f"def f(): return {self.values[llm.model_name]}"
+
+
+class FakeSandbox:
+    def run(self, code):
+        namespace = {}
+        try:
+            exec(code, namespace)
+            return SimpleNamespace(success=True, stdout="", error_log="")
+        except Exception as e:
+            return SimpleNamespace(success=False, stdout="", error_log=repr(e))
+
+
+class TestCandidateRace(unittest.TestCase):
+    def race(self, delays, values, clients):
+        synthesizer = FakeSynthesizer(delays, values)
+        integrity = MagicMock(**{"static_check.return_value": True})
+        race = CandidateSynthesis(synthesizer, integrity, FakeSandbox())
+        winner, results = race.race("q", "ctx", clients, lambda: "assert f() == 1")
+        return winner, results, synthesizer
+
+    def test_first_passing_candidate_wins_and_the_rest_are_cancelled(self):
+        clients = [fake_client("slow"), fake_client("wrong"), fake_client("fast")]
+        winner, results, synthesizer = self.race({"slow": 5, "wrong": 0, "fast": 0.05},
+                                                 {"slow": 1, "wrong": 2, "fast": 1}, clients)
+        self.assertEqual(winner.index, 2)
+        self.assertEqual([c.status for c in results], ["cancelled", "failed", "passed"])
+        self.assertLess(results[0].elapsed, 5)
+        # Only the first candidate may be answered from the response cache
+        self.assertEqual([use_cache for _, use_cache in synthesizer.calls], [True, False, False])
+
+    def test_consecutive_races_reuse_loop_bound_clients(self):
+        # Like google.generativeai's grpc.aio client: bound to the first loop it runs on
+        bound = []
+
+        class LoopBoundSynthesizer(FakeSynthesizer):
+            async def adraft(self, query, context="", llm=None, use_cache=True):
+                loop = asyncio.get_running_loop()
+                bound.append(bound[0] if bound else loop)
+                if bound[0] is not loop or loop.is_closed():
+                    raise RuntimeError("Event loop is closed")
+                return await super().adraft(query, context, llm=llm, use_cache=use_cache)
+
+        synthesizer = LoopBoundSynthesizer({"a": 0}, {"a": 1})
+        race = CandidateSynthesis(synthesizer, MagicMock(**{"static_check.return_value": True}), FakeSandbox())
+        for _ in range(3):
+            winner, results = race.race("q", "ctx", [fake_client("a")], lambda: "assert f() == 1")
+            self.assertEqual((winner.index, results[0].error), (0, None))
+
+    def test_no_winner_when_every_candidate_fails(self):
+        clients = [fake_client("a"), fake_client("b")]
+        winner, results, _ = self.race({"a": 0, "b": 0}, {"a": 2, "b": 3}, clients)
+        self.assertIsNone(winner)
+        self.assertEqual([c.status for c in results], ["failed", "failed"])
+        self.assertTrue(all(c.code for c in results))
+
+    def test_cost_cap_limits_candidates(self):
+        synthesizer = FakeSynthesizer({}, {})
+        base = fake_client("gemini-2.0-flash")
+        # ~0.0006 USD per gemini-2.0-flash draft of 1500 output tokens
+        race = CandidateSynthesis(synthesizer, MagicMock(), FakeSandbox(), max_cost_usd=0.0015)
+        clients, estimated = race.plan("q", "ctx", 5, base)
+        self.assertEqual(len(clients), 2)
+        self.assertLessEqual(estimated, 0.0015)
+
+        # Free local models are never capped; the first candidate always runs
+        self.assertEqual(len(race.plan("q", "ctx", 5, fake_client("llama3", provider="ollama"))[0]), 5)
+        self.assertEqual(len(CandidateSynthesis(synthesizer, MagicMock(), FakeSandbox(), max_cost_usd=0)
+                             .plan("q", "ctx", 3, base)[0]), 1)
+
+    def test_candidate_count(self):
+        self.assertEqual(candidate_count(3), 3)
+        with patch.dict(os.environ, {"PAPER2AGENT_CANDIDATES": "4"}):
+            self.assertEqual(candidate_count(), 4)
+            self.assertEqual(candidate_count(0), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paper2agent.knowledge.cache import ConversionCache
+from paper2agent.knowledge.ingest import DoclingIngest
+
+
+def fake_document():
+    table = SimpleNamespace(prov=[SimpleNamespace(page_no=3)], data=SimpleNamespace(num_rows=4, num_cols=2),
+                            caption_text=lambda doc: "Table 1: results")
+    picture = SimpleNamespace(prov=[], caption_text=lambda doc: "Figure 1")
+    return SimpleNamespace(export_to_markdown=lambda: "# Paper\n\nBody", tables=[table], pictures=[picture])
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmpdir, "conversions.sqlite3")
+        self.paper = os.path.join(self.tmpdir, "paper.pdf")
+        with open(self.paper, "wb") as f:
+            f.write(b"%PDF-1.4 fake")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_round_trip_is_compressed(self):
+        cache = ConversionCache(self.cache_path)
+        conversion = {"markdown": "lorem ipsum " * 1000, "tables": [], "figures": [], "converter": "x"}
+        key = ConversionCache.make_key("abc", "x", {"export": "markdown"})
+        cache.put(key, "abc", "x", conversion)
+        self.assertEqual(ConversionCache(self.cache_path).get(key), conversion)
+        self.assertLess(cache.stats()["bytes"], len(conversion["markdown"]) // 10)
+        self.assertNotEqual(key, ConversionCache.make_key("abc", "y", {"export": "markdown"}))
+
+    def test_evicts_least_recently_used(self):
+        cache = ConversionCache(self.cache_path, max_entries=2)
+        for name in ("a", "b"):
+            cache.put(name, name, "x", {"markdown": name})
+            time.sleep(0.01)
+        cache.get("a")
+        cache.put("c", "c", "x", {"markdown": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_second_conversion_is_served_from_cache(self):
+        ingest = DoclingIngest(cache=ConversionCache(self.cache_path))
+        ingest.docling_available = True
+        ingest.converter = MagicMock()
+        ingest.converter.convert.return_value = SimpleNamespace(document=fake_document())
+
+        first = ingest.convert(self.paper)
+        self.assertEqual(first["tables"], [{"index": 0, "page": 3, "caption": "Table 1: results", "rows": 4, "cols": 2}])
+        self.assertEqual(first["figures"][0]["caption"], "Figure 1")
+        self.assertEqual(ingest.process(self.paper), "# Paper\n\nBody")
+        self.assertEqual(ingest.converter.convert.call_count, 1)
+
+    def test_fallback_and_errors_are_not_cached(self):
+        cache = ConversionCache(self.cache_path)
+        ingest = DoclingIngest(cache=cache)
+        ingest.docling_available = True
+        ingest.converter = MagicMock()
+        ingest.converter.convert.side_effect = RuntimeError("layout model missing")
+        with patch.object(ingest, "_pypdf_fallback", return_value="text"):
+            self.assertEqual(ingest.process(self.paper), "text")
+        ingest.docling_available = False
+        with patch.object(ingest, "_pypdf_fallback", return_value="Error reading PDF with PyPDF: bad"):
+            ingest.process(self.paper)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
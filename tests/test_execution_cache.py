@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paper2agent.orchestrator import Orchestrator
+from paper2agent.sandbox.cache import ExecutionCache, data_fingerprint, is_deterministic
+
+
+class TestExecutionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.cache = ExecutionCache(os.path.join(self.tmpdir, "results.sqlite3"), max_entries=2)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_key_follows_code_data_content_and_environment(self):
+        data = self.write("a.csv", "x\n1\n")
+        copy = self.write("b.csv", "x\n1\n")
+        key = ExecutionCache.make_key("print(1)", data, environment="env")
+        self.assertEqual(key, ExecutionCache.make_key("print(1)", copy, environment="env"))
+        self.assertNotEqual(key, ExecutionCache.make_key("print(2)", data, environment="env"))
+        self.assertNotEqual(key, ExecutionCache.make_key("print(1)", data, environment="other"))
+        self.assertNotEqual(data_fingerprint(data), data_fingerprint(self.write("c.csv", "x\n2\n")))
+        self.assertEqual(data_fingerprint(None), "none")
+
+    def test_ttl_and_lru_eviction(self):
+        self.cache.put("a", "1")
+        self.cache.put("b", "2")
+        self.assertEqual(self.cache.get("a"), "1")  # a is now more recently used than b
+        self.cache.put("c", "3")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual((self.cache.get("a"), self.cache.get("c")), ("1", "3"))
+
+        self.cache.ttl_seconds = 60
+        with patch("paper2agent.cache_store.time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["entries"], 1)
+
+    def test_nondeterministic_marker(self):
+        self.assertTrue(is_deterministic("print(1)"))
+        self.assertFalse(is_deterministic("# paper2agent: nondeterministic\nimport random\nprint(random.random())"))
+
+
+class TestSkillHitExecution(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.sandbox = MagicMock(**{"run.return_value": SimpleNamespace(success=True, stdout="42\n", error_log="")})
+        self.match = {"id": "s1", "code": "print(42)", "tier": "exact", "score": 1.0, "deterministic": True,
+                      "seconds": 0.0}
+        cache = ExecutionCache(os.path.join(self.tmpdir, "results.sqlite3"))
+        fake = {
+            "skill_registry": ((), lambda orch: MagicMock(**{"lookup.return_value": self.match})),
+            "skill_stats": ((), lambda orch: MagicMock()),
+            "sandbox": ((), lambda orch: self.sandbox),
+            "execution_cache": ((), lambda orch: cache),
+        }
+        patcher = patch.dict(Orchestrator.COMPONENTS, fake, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.orch = Orchestrator(warm_up=False)
+
+    def test_repeated_hit_is_served_without_running_the_sandbox(self):
+        _, first, trace = self.orch.process_query("answer")
+        _, second, trace = self.orch.process_query("answer")
+        self.assertEqual((first, second), ("42\n", "42\n"))
+        self.assertEqual(self.sandbox.run.call_count, 1)
+        self.assertIn("Execution cache", trace["execution"])
+
+    def test_nondeterministic_skills_always_run(self):
+        self.match["deterministic"] = False
+        self.orch.process_query("answer")
+        self.orch.process_query("answer")
+        self.assertEqual(self.sandbox.run.call_count, 2)
+
+    def test_failed_runs_are_not_cached(self):
+        self.sandbox.run.return_value = SimpleNamespace(success=False, stdout="", error_log="boom")
+        self.orch.process_query("answer")
+        self.orch.process_query("answer")
+        self.assertEqual(self.sandbox.run.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
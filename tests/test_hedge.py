@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from paper2agent.llm.client import LLMClient, LLMProviderError, set_provider_concurrency
+from paper2agent.llm.config import PROVIDER_CONCURRENCY
+from paper2agent.llm.hedge import HedgeStats, race
+from paper2agent.llm.router import ProviderRouter
+
+
+def answer_after(delay, text, cancelled=None):
+    async def call(*args):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(text)
+            raise
+        return text
+    return call
+
+
+async def fail(*args):
+    raise LLMProviderError("down")
+
+
+class TestRace(unittest.TestCase):
+    def test_fast_primary_never_hedges(self):
+        result = asyncio.run(race(answer_after(0, "primary"), answer_after(0, "hedge"), delay=1))
+        self.assertEqual(result, ("primary", "primary", False))
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        cancelled = []
+        result = asyncio.run(race(answer_after(5, "primary", cancelled), answer_after(0, "hedge"), delay=0.05))
+        self.assertEqual(result, ("hedge", "hedge", True))
+        self.assertEqual(cancelled, ["primary"])
+
+    def test_failed_primary_hedges_immediately(self):
+        result = asyncio.run(race(fail, answer_after(0, "hedge"), delay=5))
+        self.assertEqual(result, ("hedge", "hedge", True))
+
+    def test_both_fail(self):
+        with self.assertRaises(LLMProviderError):
+            asyncio.run(race(fail, fail, delay=0))
+
+
+class TestClientHedging(unittest.TestCase):
+    def test_generate_uses_hedge_and_records_stats(self):
+        client = LLMClient("ollama/hedge-model", router=ProviderRouter(), hedge=True)
+        stats = HedgeStats()
+        with patch("paper2agent.llm.client.get_hedge_stats", return_value=stats), \
+             patch("paper2agent.llm.client.hedge_delay", return_value=0.05), \
+             patch.object(LLMClient, "_agenerate_ollama", side_effect=answer_after(5, "slow")), \
+             patch.object(LLMClient, "_agenerate_gemini", side_effect=answer_after(0, "fast")), \
+             patch("paper2agent.llm.telemetry.get_telemetry") as get_telemetry:
+            sink = get_telemetry.return_value
+            self.assertEqual(client.generate("q", use_cache=False), "fast")
+        self.assertEqual(sink.emit.call_args.args[0].hedge["winner"], "hedge")
+        self.assertEqual(stats.stats()["hedge_won"], 1)
+
+    def test_concurrent_calls_keep_their_own_hedge_outcome(self):
+        client = LLMClient("ollama/hedge-model", router=ProviderRouter(), hedge=True)
+
+        async def primary(prompt, system_prompt, retries):
+            # "slow" prompts miss the hedge deadline, the others answer at once
+            await asyncio.sleep(5 if prompt.startswith("slow") else 0)
+            return prompt
+
+        # Hedged calls share one event loop, so the provider cap applies across them
+        set_provider_concurrency("ollama", 4)
+        self.addCleanup(set_provider_concurrency, "ollama", PROVIDER_CONCURRENCY["ollama"])
+        with patch("paper2agent.llm.client.hedge_delay", return_value=0.05), \
+             patch.object(LLMClient, "_agenerate_ollama", side_effect=primary), \
+             patch.object(LLMClient, "_agenerate_gemini", side_effect=answer_after(0, "hedge")), \
+             patch("paper2agent.llm.telemetry.get_telemetry") as get_telemetry:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(lambda q: client.generate(q, use_cache=False), ["slow-1", "fast-1", "slow-2", "fast-2"]))
+        self.assertEqual(results, ["hedge", "fast-1", "hedge", "fast-2"])
+        winners = {call.args[0].response: call.args[0].hedge["winner"] for call in get_telemetry.return_value.emit.call_args_list}
+        self.assertEqual(winners, {"hedge": "hedge", "fast-1": "primary", "fast-2": "primary"})
+
+    def test_consecutive_sync_hedges_reuse_loop_bound_clients(self):
+        client = LLMClient("ollama/hedge-model", router=ProviderRouter(), hedge=True)
+        loops = []
+
+        async def loop_bound(prompt, system_prompt, retries):
+            # Like google.generativeai's grpc.aio client: bound to the first loop it runs on
+            loop = asyncio.get_running_loop()
+            loops.append(loop)
+            if loops[0] is not loop or loop.is_closed():
+                raise RuntimeError("Event loop is closed")
+            return prompt
+
+        with patch.object(LLMClient, "_agenerate_ollama", side_effect=loop_bound):
+            self.assertEqual([client.generate(q, use_cache=False) for q in ("a", "b", "c")], ["a", "b", "c"])
+        self.assertEqual(len(set(map(id, loops))), 1)
+
+    def test_hedging_off_by_default(self):
+        client = LLMClient("ollama/hedge-model", router=ProviderRouter())
+        self.assertIsNone(client._hedge_partner())
+
+
+if __name__ == '__main__':
+    unittest.main()
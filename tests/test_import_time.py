@@ -0,0 +1,80 @@
+"""
+Import-time regression benchmark for the CLI entry point, based on
+`python -X importtime`. Each subcommand has a budget (total import time) and a
+list of heavy packages it must not import at all.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROVIDER_SDKS = ["google.generativeai", "huggingface_hub", "requests", "httpx"]
+HEAVY = PROVIDER_SDKS + ["chromadb", "docling", "gradio"]
+
+# argv -> (import-time budget in seconds, packages that must not be imported)
+BUDGETS = {
+    ("--help",): (0.5, HEAVY),
+    ("run", "--help"): (0.5, HEAVY),
+    ("ingest", "--help"): (0.5, HEAVY),
+    # Chroma itself needs httpx (and may pull in requests), so only the LLM SDKs are checked
+    ("list-skills",): (4.0, ["google.generativeai", "huggingface_hub", "docling", "gradio"]),
+}
+
+# A query the registry answers (exact tier) loads no model, HTTP stack or vector store
+SKILL_HIT = (("run", "what is the answer"), (1.0, HEAVY))
+
+
+def import_profile(argv, cwd):
+    """Runs the CLI under -X importtime; returns (total seconds, set of imported modules)."""
+    code = f"import sys; sys.argv = ['paper2agent', *{list(argv)!r}]; from paper2agent.cli import main; main()"
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PAPER2AGENT_LLM_WARMUP="0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=300)
+    total_us, modules = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        modules.add(name.strip())
+        if not name.startswith("  "):  # top-level import: its cumulative time includes its children
+            total_us += int(cumulative)
+    return total_us / 1e6, modules
+
+
+class TestCliImportTime(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()  # list-skills creates ./skills_db
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_subcommand_import_budgets(self):
+        for argv, (budget, forbidden) in BUDGETS.items():
+            with self.subTest(argv=" ".join(argv)):
+                seconds, modules = import_profile(argv, self.tmpdir)
+                self.assertTrue(modules, "no -X importtime output captured")
+                leaked = sorted(name for name in forbidden if name in modules)
+                self.assertEqual(leaked, [], f"`paper2agent {' '.join(argv)}` imports {leaked}")
+                self.assertLess(seconds, budget, f"`paper2agent {' '.join(argv)}` imports took {seconds:.2f}s")
+
+    def test_run_skill_hit_import_budget(self):
+        from paper2agent.skills.store import SkillStore
+
+        store = SkillStore(os.path.join(self.tmpdir, "skills_db", "skills.sqlite3"))
+        store.put({"id": "answer", "code": "print(42)", "query": "what is the answer"})
+        argv, (budget, forbidden) = SKILL_HIT
+        seconds, modules = import_profile(argv, self.tmpdir)
+        self.assertIn("paper2agent.sandbox.cache", modules)  # Got as far as executing the skill
+        leaked = sorted(name for name in forbidden if name in modules)
+        self.assertEqual(leaked, [], f"a skill hit imports {leaked}")
+        self.assertLess(seconds, budget, f"a skill hit's imports took {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
 import unittest
-from paper2agent.agents.integrity import IntegrityAgent
+from unittest.mock import MagicMock
+from paper2agent.agents.grounding import ScientificGroundingAgent
+from paper2agent.agents.integrity import IntegrityAgent, MockResult, Reflector, TestGenerator
+from paper2agent.llm.jsonmode import JSONExtractionError
+from paper2agent.llm.router import LLMProviderError
 
 class MockSynthesizer:
-    def fix(self, code, critique):
+    def fix(self, code, critique, llm=None):
         return "# Fixed Code"
 
 class TestIntegrity(unittest.TestCase):
@@ -17,5 +21,63 @@ class TestIntegrity(unittest.TestCase):
         safe_code = "def add(a, b): return a + b"
         self.assertTrue(self.agent.static_check(safe_code), "Should accept safe code")
 
+class TestMalformedVerdicts(unittest.TestCase):
+    def llm(self, data):
+        llm = MagicMock()
+        llm.generate_json.return_value = data
+        return llm
+
+    def test_grounding_needs_a_boolean_verdict(self):
+        agent = ScientificGroundingAgent()
+        for data in ({"valid": "false"}, {"feedback": "fine"}, ["valid"], "true", None):
+            agent.llm = self.llm(data)
+            valid, feedback = agent.verify("code", "42", "answer")
+            self.assertFalse(valid, data)
+            self.assertIn("Grounding check failed", feedback)
+        agent.llm = self.llm({"valid": True, "feedback": "plausible"})
+        self.assertEqual(agent.verify("code", "42", "answer"), (True, "plausible"))
+
+    def test_critics_survive_answers_without_json_and_provider_failures(self):
+        no_json = MagicMock()
+        no_json.generate_json.side_effect = JSONExtractionError("No JSON value found in model response: 'sure!'")
+        down = MagicMock()
+        down.generate_json.side_effect = LLMProviderError("all providers failed")
+        for llm in (no_json, down):
+            self.assertEqual(TestGenerator(llm).create("ctx"), "")
+            self.assertEqual(Reflector(llm).analyze("c", "err"), "Failed with:\nerr")
+
+    def test_critics_tolerate_non_objects(self):
+        self.assertEqual(TestGenerator(self.llm(["assert True"])).create("add"), "")
+        self.assertEqual(Reflector(self.llm("oops")).analyze("code", "KeyError: 'x'"), "Failed with:\nKeyError: 'x'")
+
+
+class FailOnceSandbox:
+    def __init__(self):
+        self.scripts = []
+
+    def run(self, script):
+        self.scripts.append(script)
+        return MockResult(success=len(self.scripts) > 1, error_log="AssertionError")
+
+
+class TestRobustnessLoop(unittest.TestCase):
+    def setUp(self):
+        self.sandbox = FailOnceSandbox()
+        self.agent = IntegrityAgent(MockSynthesizer(), sandbox=self.sandbox)
+        self.agent.test_generator = MagicMock()
+        self.agent.test_generator.create.return_value = "assert add(1, 2) == 3"
+        self.agent.reflector = MagicMock()
+        self.agent.reflector.analyze.return_value = "off by one"
+
+    def test_test_is_generated_once_across_attempts(self):
+        self.assertEqual(self.agent.run_robustness_loop("def add(a, b): return a - b", "add"), "# Fixed Code")
+        self.assertEqual(self.agent.test_generator.create.call_count, 1)
+        self.assertTrue(all(script.endswith("assert add(1, 2) == 3") for script in self.sandbox.scripts))
+
+    def test_prepared_test_is_reused(self):
+        self.agent.run_robustness_loop("def add(a, b): return a - b", "add", test_case="assert add(2, 2) == 4")
+        self.agent.test_generator.create.assert_not_called()
+        self.assertTrue(all(script.endswith("assert add(2, 2) == 4") for script in self.sandbox.scripts))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm.client import LLMClient
+from paper2agent.llm.jsonmode import JSONExtractionError, JsonStreamExtractor, extract_json, json_mode
+from paper2agent.llm.replay import Cassette, ReplayProvider
+from paper2agent.llm.router import ProviderRouter
+
+SCHEMA = {"type": "object", "properties": {"valid": {"type": "boolean"}}, "required": ["valid"]}
+
+
+class TestJsonExtraction(unittest.TestCase):
+    def test_skips_think_blocks_fences_and_prose(self):
+        text = '<think>maybe {"valid": false}?</think>Sure:\n```json\n{"valid": true, "feedback": "a } in text",}\n```'
+        self.assertEqual(extract_json(text), {"valid": True, "feedback": "a } in text"})
+
+    def test_stream_returns_as_soon_as_object_closes(self):
+        extractor = JsonStreamExtractor()
+        chunks = ["<thi", "nk>{x}</th", "ink> {\"a\": [1, ", "{\"b\": \"\\\"}\"}]}", " trailing text"]
+        results = [extractor.feed(chunk) for chunk in chunks[:4]]
+        self.assertEqual(results, [None, None, None, {"a": [1, {"b": "\"}"}]}])
+        self.assertTrue(extractor.done)
+
+    def test_invalid_candidate_is_skipped(self):
+        self.assertEqual(extract_json('use {braces} like {"k": 1}'), {"k": 1})
+        with self.assertRaises(JSONExtractionError):
+            extract_json("no json here")
+
+
+class TestNativeJsonModes(unittest.TestCase):
+    def test_payloads_carry_schema_only_in_json_mode(self):
+        ollama = LLMClient("ollama/m", router=ProviderRouter())
+        self.assertNotIn("format", ollama._ollama_payload("q", None))
+        with json_mode(SCHEMA):
+            self.assertEqual(ollama._ollama_payload("q", None)["format"], SCHEMA)
+            self.assertEqual(LLMClient._hf_json_params(), {"grammar": {"type": "json", "value": SCHEMA}})
+            config = LLMClient._gemini_generation_config()
+            self.assertEqual(config["response_mime_type"], "application/json")
+        with json_mode(None):
+            self.assertEqual(ollama._ollama_payload("q", None)["format"], "json")
+
+        openrouter = LLMClient("openrouter/m", router=ProviderRouter())
+        with patch.dict(os.environ, {"OPENROUTER_API_KEY": "k"}), json_mode(SCHEMA):
+            _, payload = openrouter._openrouter_request("q", None)
+        self.assertEqual(payload["response_format"]["json_schema"]["schema"], SCHEMA)
+
+    def test_schema_is_part_of_cache_key(self):
+        client = LLMClient("ollama/m", router=ProviderRouter())
+        plain = client._cache_key("q", "s")
+        with json_mode(SCHEMA):
+            self.assertNotEqual(client._cache_key("q", "s"), plain)
+
+    def test_generate_json_native_parses_response(self):
+        client = LLMClient("ollama/m", router=ProviderRouter())
+        response = MagicMock()
+        response.json.return_value = {"message": {"content": '{"valid": true}'}}
+        with patch.object(client.http, "post", return_value=response) as post:
+            self.assertEqual(client.generate_json("q", schema=SCHEMA, use_cache=False), {"valid": True})
+        self.assertEqual(post.call_args.kwargs["json"]["format"], SCHEMA)
+
+
+class TestStreamedJsonFallback(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cassette.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_replay_provider_stops_reading_after_object(self):
+        answer = '<think>long reasoning</think>{"valid": false}' + " ignored" * 100
+        cassette = Cassette(self.path)
+        cassette.record(Cassette.make_key("ollama/m", None, "q"), "ollama/m", answer, 0.0)
+        env = {"PAPER2AGENT_LLM_REPLAY": "replay", "PAPER2AGENT_LLM_CASSETTE": self.path}
+        with patch.dict(os.environ, env):
+            client = LLMClient("replay/ollama/m", router=ProviderRouter())
+        client.replay = ReplayProvider("ollama/m", Cassette(self.path), chunk_chars=8)
+
+        chunks = []
+        original = client._stream_provider
+
+        def counting_stream(prompt, system_prompt):
+            for chunk in original(prompt, system_prompt):
+                chunks.append(chunk)
+                yield chunk
+
+        with patch.object(client, "_stream_provider", side_effect=counting_stream):
+            self.assertEqual(client.generate_json("q", use_cache=False), {"valid": False})
+        self.assertLess(sum(map(len, chunks)), len(answer) // 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
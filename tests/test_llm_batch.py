@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from paper2agent.llm.client import LLMClient, LLMProviderError
+from paper2agent.llm.router import ProviderRouter
+
+
+class TestGenerateMany(unittest.TestCase):
+    def setUp(self):
+        self.client = LLMClient("ollama/batch-model", router=ProviderRouter())
+
+    def test_order_concurrency_and_errors(self):
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def fake_generate(prompt, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05 if prompt == "p0" else 0.01)
+            with lock:
+                active[0] -= 1
+            if prompt == "p2":
+                raise LLMProviderError("boom")
+            return prompt.upper()
+
+        with patch.object(self.client, "generate", side_effect=fake_generate):
+            results = self.client.generate_many([f"p{i}" for i in range(6)], max_concurrency=3)
+
+        self.assertEqual([r.index for r in results], list(range(6)))
+        self.assertEqual([r.response for r in results], ["P0", "P1", None, "P3", "P4", "P5"])
+        self.assertIsInstance(results[2].error, LLMProviderError)
+        self.assertFalse(results[2].ok)
+        self.assertLessEqual(peak[0], 3)
+        self.assertGreater(peak[0], 1)
+
+    def test_async_variant(self):
+        async def fake_agenerate(prompt, **kwargs):
+            if prompt == "bad":
+                raise LLMProviderError("boom")
+            return prompt
+
+        with patch.object(self.client, "agenerate", side_effect=fake_agenerate):
+            results = asyncio.run(self.client.agenerate_many(["a", "bad", "c"], max_concurrency=2))
+        self.assertEqual([(r.response, r.ok) for r in results], [("a", True), (None, False), ("c", True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from paper2agent.llm.cache import ResponseCache
+from paper2agent.llm.client import LLMClient
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_all_request_fields(self):
+        base = ResponseCache.make_key("ollama", "m", "sys", "hi", {"temperature": 0.2})
+        self.assertEqual(base, ResponseCache.make_key("ollama", "m", "sys", "hi", {"temperature": 0.2}))
+        self.assertNotEqual(base, ResponseCache.make_key("gemini", "m", "sys", "hi", {"temperature": 0.2}))
+        self.assertNotEqual(base, ResponseCache.make_key("ollama", "m", "other", "hi", {"temperature": 0.2}))
+        self.assertNotEqual(base, ResponseCache.make_key("ollama", "m", "sys", "hi", {"temperature": 0.7}))
+
+    def test_hit_miss_counters(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "answer")
+        self.assertEqual(cache.get("k"), "answer")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(self.path, ttl_seconds=1)
+        cache.put("k", "answer")
+        with patch("paper2agent.cache_store.time.time", return_value=time.time() + 5):
+            self.assertIsNone(cache.get("k"))
+
+    def test_lru_eviction_by_entries(self):
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("a", "1")
+        time.sleep(0.01)
+        cache.put("b", "2")
+        time.sleep(0.01)
+        cache.get("a")  # "b" is now least recently used
+        time.sleep(0.01)
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_client_serves_repeats_from_cache(self):
+        client = LLMClient("ollama/test-model", cache=ResponseCache(self.path))
+        with patch.object(LLMClient, "_generate_ollama", return_value="fresh") as provider:
+            self.assertEqual(client.generate("q", system_prompt="s"), "fresh")
+            self.assertEqual(client.generate("q", system_prompt="s"), "fresh")
+            self.assertEqual(provider.call_count, 1)
+
+            client.generate("q", system_prompt="s", use_cache=False)
+            self.assertEqual(provider.call_count, 2)
+
+    def test_client_does_not_cache_errors(self):
+        client = LLMClient("ollama/test-model", cache=ResponseCache(self.path))
+        with patch.object(LLMClient, "_generate_ollama", return_value="Error: Ollama generation failed."):
+            client.generate("q")
+        self.assertEqual(client.cache_stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
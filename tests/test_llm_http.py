@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from paper2agent.llm.client import LLMClient, get_client, set_provider_concurrency
+from paper2agent.llm.config import PROVIDER_CONCURRENCY
+from paper2agent.llm.http import AsyncSessionPool, SessionPool
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # "echo <delay> <text>" prompts: replies in the order they were sent, and the most handled at once
+    finished = []
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = (request.get("messages") or [{}])[-1].get("content", "")
+        if prompt.startswith("echo "):
+            _, delay, text = prompt.split(" ", 2)
+            cls = _KeepAliveHandler
+            with cls.lock:
+                cls.in_flight += 1
+                cls.peak = max(cls.peak, cls.in_flight)
+            time.sleep(float(delay))
+            body = json.dumps({"message": {"content": text}}).encode()
+            with cls.lock:
+                cls.in_flight -= 1
+                cls.finished.append(text)
+        elif request.get("stream"):
+            lines = [{"message": {"content": part}, "done": False} for part in ("o", "k")]
+            lines.append({"message": {"content": ""}, "done": True})
+            body = "".join(json.dumps(line) + "\n" for line in lines).encode()
+        else:
+            body = b'{"message": {"content": "ok"}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/chat"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        pool = SessionPool()
+        for _ in range(5):
+            resp = pool.post(self.url, json={"stream": False}, timeout=5)
+            self.assertEqual(resp.json()["message"]["content"], "ok")
+
+        stats = pool.stats()
+        self.assertEqual(stats["sessions"], 1)
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 4)
+        pool.close()
+
+    def test_one_session_per_base_url(self):
+        pool = SessionPool()
+        self.assertIs(pool.session_for("http://a.test/x"), pool.session_for("http://a.test/y"))
+        self.assertIsNot(pool.session_for("http://a.test/x"), pool.session_for("https://b.test/x"))
+
+
+    def test_agenerate_runs_concurrently_and_preserves_order(self):
+        with patch.dict(os.environ, {"OLLAMA_URL": self.url}):
+            client = LLMClient("ollama/test-model", async_http_pool=AsyncSessionPool())
+
+        # Earlier prompts answer later, so the replies arrive in reverse
+        delays = [0.05 * (6 - i) for i in range(6)]
+        _KeepAliveHandler.finished, _KeepAliveHandler.peak = [], 0
+
+        async def run():
+            return await asyncio.gather(*(client.agenerate(f"echo {delay} q{i}", use_cache=False)
+                                          for i, delay in enumerate(delays)))
+
+        set_provider_concurrency("ollama", 6)
+        try:
+            results = asyncio.run(run())
+        finally:
+            set_provider_concurrency("ollama", PROVIDER_CONCURRENCY["ollama"])
+        self.assertGreater(_KeepAliveHandler.peak, 1)
+        self.assertEqual(_KeepAliveHandler.finished, [f"q{i}" for i in reversed(range(6))])
+        self.assertEqual(results, [f"q{i}" for i in range(6)])
+
+    def test_generate_stream_yields_ollama_chunks(self):
+        with patch.dict(os.environ, {"OLLAMA_URL": self.url}):
+            client = LLMClient("ollama/test-model", http_pool=SessionPool())
+        self.assertEqual(list(client.generate_stream("q", use_cache=False)), ["o", "k"])
+
+    def test_provider_semaphore_caps_concurrency(self):
+        set_provider_concurrency("ollama", 2)
+        client = LLMClient("ollama/test-model")
+        in_flight = []
+        peak = []
+
+        async def fake_provider(prompt, system_prompt, retries):
+            in_flight.append(prompt)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(prompt)
+            return prompt
+
+        async def run():
+            return await asyncio.gather(*(client.agenerate(f"q{i}", use_cache=False) for i in range(6)))
+
+        try:
+            with patch.object(client, "_agenerate_ollama", side_effect=fake_provider):
+                self.assertEqual(asyncio.run(run()), [f"q{i}" for i in range(6)])
+            self.assertLessEqual(max(peak), 2)
+        finally:
+            set_provider_concurrency("ollama", PROVIDER_CONCURRENCY["ollama"])
+
+
+class TestClientRegistry(unittest.TestCase):
+    def test_one_client_per_model_across_threads(self):
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(get_client("ollama/registry-model"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(client) for client in seen}), 1)
+        self.assertIsNot(get_client("ollama/other-model"), seen[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paper2agent.orchestrator import Orchestrator
+
+
+class Component:
+    def __init__(self, *deps, **kwargs):
+        self.deps = deps + tuple(kwargs.values())
+
+
+class TestLazyComponents(unittest.TestCase):
+    def setUp(self):
+        fake = {
+            "synthesizer": ((), lambda self: Component()),
+            "sandbox": ((), lambda self: Component()),
+            "integrity_agent": (("synthesizer", "sandbox"),
+                                lambda self: Component(self.synthesizer, sandbox=self.sandbox)),
+        }
+        patcher = patch.dict(Orchestrator.COMPONENTS, fake, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch.dict(os.environ, {"PAPER2AGENT_LLM_WARMUP": "0"}):
+            self.orch = Orchestrator()
+
+    def test_nothing_is_built_until_used(self):
+        self.assertEqual(self.orch.loaded_components(), [])
+        integrity = self.orch.integrity_agent
+        self.assertEqual(integrity.deps, (self.orch.synthesizer, self.orch.sandbox))
+        self.assertIs(self.orch.integrity_agent, integrity)
+        self.assertEqual(set(self.orch.init_seconds), {"synthesizer", "sandbox", "integrity_agent"})
+
+    def test_components_can_be_replaced(self):
+        replacement = Component()
+        self.orch.sandbox = replacement
+        self.assertIs(self.orch.integrity_agent.deps[1], replacement)
+        with self.assertRaises(AttributeError):
+            self.orch.not_a_component
+
+
+class TestSynthesisPipeline(unittest.TestCase):
+    def test_test_generation_overlaps_drafting(self):
+        test_started = threading.Event()
+        llm = SimpleNamespace(provider="gemini", model_name="gemini-2.0-flash")
+
+        def draft_stream(query, context, llm):
+            # Only finishes if the test is being generated concurrently
+            self.assertTrue(test_started.wait(timeout=5))
+            yield 'def f():\n    """Returns one."""\n    return 1'
+
+        def create_test(context, llm=None):
+            test_started.set()
+            return "assert f() == 1"
+
+        integrity = MagicMock(llm=llm)
+        integrity.test_generator.create.side_effect = create_test
+        integrity.run_robustness_loop.side_effect = lambda code, log=None, **kwargs: code
+        stats, writer = MagicMock(), MagicMock()
+        fake = {
+            "skill_registry": ((), lambda self: MagicMock(**{"lookup.return_value": None})),
+            "retriever": ((), lambda self: MagicMock(**{"query_with_scores.return_value": []})),
+            "synthesizer": ((), lambda self: SimpleNamespace(llm=llm, draft_stream=draft_stream, clean_code=str.strip)),
+            "integrity_agent": ((), lambda self: integrity),
+            "sandbox": ((), lambda self: MagicMock(**{"run.return_value": SimpleNamespace(success=True, stdout="1")})),
+            "skill_stats": ((), lambda self: stats),
+            "skill_writer": ((), lambda self: writer),
+        }
+        with patch.dict(Orchestrator.COMPONENTS, fake, clear=True):
+            code, output, _ = Orchestrator(warm_up=False).process_query("f")
+        self.assertEqual(output, "1")
+        self.assertEqual(integrity.run_robustness_loop.call_args.kwargs["test_case"], "assert f() == 1")
+
+        # The miss is counted and the verified skill is queued for the registry
+        stats.record_lookup.assert_called_once_with(False)
+        kwargs = writer.submit.call_args.kwargs
+        self.assertEqual(writer.submit.call_args.args, (code,))
+        self.assertEqual((kwargs["query"], kwargs["description"], kwargs["model"]), ("f", "Returns one.", "gemini/gemini-2.0-flash"))
+        self.assertTrue(kwargs["verification_log"]["success"])
+
+
+class TestBackgroundWarmup(unittest.TestCase):
+    def run_query(self, match, warm_up=True):
+        fake = {
+            "skill_registry": ((), lambda self: MagicMock(**{"lookup.return_value": match})),
+            "skill_stats": ((), lambda self: MagicMock()),
+            "execution_cache": ((), lambda self: None),
+            "sandbox": ((), lambda self: MagicMock(**{"run.return_value": SimpleNamespace(success=True, stdout="1")})),
+            "retriever": ((), lambda self: MagicMock(**{"query_with_scores.return_value": []})),
+            "synthesizer": ((), lambda self: MagicMock()),
+            "integrity_agent": ((), lambda self: MagicMock()),
+        }
+        with patch.dict(Orchestrator.COMPONENTS, fake, clear=True), \
+                patch("paper2agent.orchestrator.warm_up_configured_models") as warm:
+            orch = Orchestrator(warm_up=warm_up)
+            started = warm.call_count
+            orch.process_query("f")
+            # Nothing is warmed on the request path itself
+            self.assertEqual(warm.call_count, started)
+        return orch, warm
+
+    def test_construction_warms_the_synthesis_models_only(self):
+        _, warm_up = self.run_query(None)
+        warm_up.assert_called_once_with(("synthesizer", "integrity"))
+
+    def test_skill_hit_builds_no_model_client(self):
+        match = {"id": "s", "code": "print(1)", "tier": "exact", "score": 1.0, "seconds": 0.0, "deterministic": True}
+        orch, _ = self.run_query(match)
+        self.assertNotIn("synthesizer", vars(orch))
+        self.assertNotIn("integrity_agent", vars(orch))
+
+    def test_warm_up_false_loads_nothing(self):
+        self.run_query(None, warm_up=False)[1].assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
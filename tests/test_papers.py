@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from paper2agent.knowledge.papers import PaperRegistry, file_sha256
+
+
+class FakeIngest:
+    def __init__(self, converter="docling-2.0", fallback=False):
+        self.converter = converter
+        self.fallback = fallback
+        self.calls = 0
+
+    def converter_id(self):
+        return self.converter
+
+    def convert(self, file_path):
+        self.calls += 1
+        with open(file_path, "r") as f:
+            return {"markdown": f.read(), "tables": [], "figures": [],
+                    "converter": "pypdf" if self.fallback else self.converter}
+
+
+class FakeRetriever:
+    def __init__(self, chunk_size=1000, overlap=100):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.papers = {}
+
+    def add_document(self, text, source_name, paper_id=None):
+        self.papers[paper_id] = text
+        return 2
+
+    def remove_paper(self, paper_id):
+        self.papers.pop(paper_id, None)
+
+
+class TestPaperRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.registry = PaperRegistry(os.path.join(self.tmpdir, "papers.sqlite3"))
+        self.paper = os.path.join(self.tmpdir, "paper.pdf")
+        self.write("version one")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, text):
+        with open(self.paper, "w") as f:
+            f.write(text)
+
+    def test_repeat_ingest_is_a_lookup(self):
+        ingest, retriever = FakeIngest(), FakeRetriever()
+        entry, ingested = self.registry.ensure_ingested(self.paper, ingest, retriever)
+        self.assertTrue(ingested)
+        self.assertEqual(entry["sha256"], file_sha256(self.paper))
+
+        # Same bytes under another name: still a hit, no conversion
+        copy = os.path.join(self.tmpdir, "copy.pdf")
+        shutil.copy(self.paper, copy)
+        _, ingested = self.registry.ensure_ingested(copy, ingest, retriever)
+        self.assertFalse(ingested)
+        self.assertEqual((ingest.calls, len(retriever.papers), len(self.registry)), (1, 1, 1))
+
+        reopened = PaperRegistry(self.registry.path)
+        self.assertFalse(reopened.ensure_ingested(self.paper, ingest, retriever)[1])
+
+    def test_new_converter_or_chunking_reingests(self):
+        retriever = FakeRetriever()
+        self.registry.ensure_ingested(self.paper, FakeIngest(), retriever)
+        self.assertTrue(self.registry.ensure_ingested(self.paper, FakeIngest("docling-2.1"), retriever)[1])
+        retriever.chunk_size = 500
+        entry, ingested = self.registry.ensure_ingested(self.paper, FakeIngest("docling-2.1"), retriever)
+        self.assertTrue(ingested)
+        self.assertEqual((entry["converter"], entry["chunk_size"]), ("docling-2.1", 500))
+        self.assertEqual(len(retriever.papers), 1)
+
+    def test_fallback_conversion_is_retried(self):
+        retriever = FakeRetriever()
+        entry, _ = self.registry.ensure_ingested(self.paper, FakeIngest(fallback=True), retriever)
+        self.assertEqual(entry["converter"], "pypdf")
+
+        ingest = FakeIngest()
+        entry, ingested = self.registry.ensure_ingested(self.paper, ingest, retriever)
+        self.assertTrue(ingested)
+        self.assertEqual(entry["converter"], "docling-2.0")
+        self.assertFalse(self.registry.ensure_ingested(self.paper, ingest, retriever)[1])
+
+    def test_changed_file_replaces_previous_version(self):
+        ingest, retriever = FakeIngest(), FakeRetriever()
+        old_sha = self.registry.ensure_ingested(self.paper, ingest, retriever)[0]["sha256"]
+        self.write("version two, edited")
+        entry, ingested = self.registry.ensure_ingested(self.paper, ingest, retriever)
+        self.assertTrue(ingested)
+        self.assertNotEqual(entry["sha256"], old_sha)
+        self.assertEqual(list(retriever.papers), [entry["sha256"]])
+        self.assertIsNone(self.registry.lookup(old_sha))
+
+    def test_failed_conversion_is_not_registered(self):
+        self.write("Error reading PDF with PyPDF: broken")
+        with self.assertRaises(ValueError):
+            self.registry.ensure_ingested(self.paper, FakeIngest(), FakeRetriever())
+        self.assertEqual(len(self.registry), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
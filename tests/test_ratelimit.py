@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm.ratelimit import RateLimiter, TokenBucket, is_rate_limit_error, retry_after_from_error
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(per_minute=60)  # 1 per second, burst of 60
+        now = bucket.updated
+        for _ in range(60):
+            self.assertEqual(bucket.reserve(1, now), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1, now), 1.0)
+        self.assertAlmostEqual(bucket.reserve(1, now), 2.0)  # queued behind the previous caller
+
+    def test_refill(self):
+        bucket = TokenBucket(per_minute=60, burst=1)
+        now = bucket.updated
+        bucket.reserve(1, now)
+        self.assertEqual(bucket.reserve(1, now + 1.0), 0.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_penalize_holds_off_all_callers(self):
+        limiter = RateLimiter(jitter=0)
+        limiter.penalize(retry_after=5)
+        with patch("paper2agent.llm.ratelimit.time.sleep") as sleep:
+            waited = limiter.acquire()
+        self.assertGreater(waited, 4.9)
+        sleep.assert_called_once()
+        stats = limiter.stats()
+        self.assertEqual((stats["throttled"], stats["waited"]), (1, 1))
+
+    def test_token_budget(self):
+        limiter = RateLimiter(tpm=600)
+        self.assertEqual(limiter._reserve(600), 0.0)
+        self.assertAlmostEqual(limiter._reserve(60), 6.0, places=1)
+
+    def test_async_acquire(self):
+        limiter = RateLimiter(rpm=600)
+        waits = asyncio.run(asyncio.wait_for(limiter.aacquire(), timeout=1))
+        self.assertEqual(waits, 0.0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_header_seconds(self):
+        error = Exception("429 Too Many Requests")
+        error.response = MagicMock(headers={"Retry-After": "7"}, status_code=429)
+        self.assertEqual(retry_after_from_error(error), 7.0)
+        self.assertTrue(is_rate_limit_error(error))
+
+    def test_gemini_retry_delay(self):
+        error = Exception("429 Resource has been exhausted (e.g. check quota). retry_delay { seconds: 12 }")
+        self.assertEqual(retry_after_from_error(error), 12.0)
+
+    def test_no_hint(self):
+        self.assertIsNone(retry_after_from_error(Exception("boom")))
+        self.assertFalse(is_rate_limit_error(Exception("boom")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm.client import LLMClient, LLMProviderError
+from paper2agent.llm.replay import Cassette, ReplayProvider
+from paper2agent.llm.router import ProviderRouter
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cassette.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def record(self, *answers):
+        recorder = ReplayProvider("ollama/m", Cassette(self.path), mode="record")
+        recorder._inner = MagicMock()
+        recorder._inner._generate_uncached.side_effect = list(answers)
+        for _ in answers:
+            recorder.generate("q", "s", retries=1)
+
+    def test_record_then_replay_in_order(self):
+        self.record("first", "second")
+        player = ReplayProvider("ollama/m", Cassette(self.path))
+        self.assertEqual([player.generate("q", "s", 1) for _ in range(3)], ["first", "second", "first"])
+        with self.assertRaises(LLMProviderError):
+            player.generate("unrecorded", "s", 1)
+
+    def test_injected_latency_and_failures(self):
+        self.record("answer")
+        player = ReplayProvider("ollama/m", Cassette(self.path), latency={"distribution": "fixed", "seconds": 0.05})
+        start = time.monotonic()
+        self.assertEqual(player.generate("q", "s", 1), "answer")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        flaky = ReplayProvider("ollama/m", Cassette(self.path), failure_rate=1.0, seed=0)
+        with self.assertRaises(LLMProviderError):
+            flaky.generate("q", "s", 1)
+
+    def test_replay_client_generates_and_streams_offline(self):
+        self.record("a replayed answer that is longer than one chunk")
+        env = {"PAPER2AGENT_LLM_REPLAY": "replay", "PAPER2AGENT_LLM_CASSETTE": self.path}
+        with patch.dict(os.environ, env):
+            client = LLMClient("replay/ollama/m", router=ProviderRouter())
+        self.assertEqual(client.fallback_chain(), [client])
+        self.assertEqual(client.generate("q", system_prompt="s", use_cache=False),
+                         "a replayed answer that is longer than one chunk")
+        chunks = list(client.generate_stream("q", system_prompt="s", use_cache=False))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "a replayed answer that is longer than one chunk")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from paper2agent.llm.client import LLMClient, LLMProviderError
+from paper2agent.llm.router import EndpointHealth, ProviderRouter
+
+
+def make_router(**overrides):
+    config = dict(window=20, min_calls=5, failure_threshold=3, error_rate_threshold=0.5,
+                  cooldown_seconds=30.0, max_cooldown_seconds=300.0)
+    config.update(overrides)
+    return ProviderRouter(**config)
+
+
+class TestEndpointHealth(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        health = EndpointHealth("x", failure_threshold=3)
+        for _ in range(3):
+            self.assertTrue(health.allow())
+            health.record_failure()
+        self.assertEqual(health.state, EndpointHealth.OPEN)
+        self.assertFalse(health.allow())
+
+    def test_probe_then_success_closes(self):
+        health = EndpointHealth("x", failure_threshold=1, cooldown_seconds=0)
+        health.record_failure()
+        self.assertTrue(health.probe_due())
+        health.record_probe(True)
+        self.assertEqual(health.state, EndpointHealth.HALF_OPEN)
+        health.record_success(0.1)
+        self.assertEqual(health.state, EndpointHealth.CLOSED)
+
+    def test_half_open_failure_doubles_cooldown(self):
+        health = EndpointHealth("x", failure_threshold=1, cooldown_seconds=10)
+        health.record_failure()
+        health.record_probe(True)
+        health.record_failure()
+        self.assertEqual((health.state, health.cooldown), (EndpointHealth.OPEN, 20))
+
+    def test_latency_percentile(self):
+        health = EndpointHealth("x")
+        for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+            health.record_success(latency)
+        self.assertEqual(health.latency_percentile(50), 0.3)
+        self.assertEqual(health.latency_percentile(95), 1.0)
+
+
+class TestProviderRouter(unittest.TestCase):
+    def test_falls_back_without_mutating_primary(self):
+        client = LLMClient("ollama/test-model", router=make_router())
+        with patch.object(LLMClient, "_generate_ollama", side_effect=LLMProviderError("down")), \
+             patch.object(LLMClient, "_generate_gemini", return_value="from gemini"):
+            self.assertEqual(client.generate("q", use_cache=False), "from gemini")
+        self.assertEqual((client.provider, client.model_name), ("ollama", "test-model"))
+
+    def test_open_circuit_is_skipped(self):
+        router = make_router()
+        client = LLMClient("ollama/test-model", router=router)
+        refused = requests.ConnectionError("Connection refused")
+        with patch.object(client.http, "post", side_effect=refused) as post, \
+             patch.object(LLMClient, "_generate_gemini", return_value="ok"):
+            for _ in range(3):
+                client.generate("q", use_cache=False)
+            # Unreachable endpoints are not retried within a call.
+            self.assertEqual(post.call_count, 3)
+            self.assertEqual(router.health(client.endpoint).state, EndpointHealth.OPEN)
+
+            start = time.monotonic()
+            self.assertEqual(client.generate("q", use_cache=False), "ok")
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(post.call_count, 3)
+        self.assertEqual(router.stats()[client.endpoint]["skipped"], 1)
+
+    def test_exhausted_chain_raises(self):
+        client = LLMClient("ollama/test-model", router=make_router())
+        with patch.object(LLMClient, "_generate_ollama", side_effect=LLMProviderError("down")), \
+             patch.object(LLMClient, "_generate_gemini", side_effect=LLMProviderError("quota")):
+            with self.assertRaises(LLMProviderError):
+                client.generate("q", use_cache=False)
+
+    def test_async_fallback(self):
+        client = LLMClient("ollama/test-model", router=make_router())
+
+        async def down(*args):
+            raise LLMProviderError("down")
+
+        async def gemini(*args):
+            return "async gemini"
+
+        with patch.object(LLMClient, "_agenerate_ollama", side_effect=down), \
+             patch.object(LLMClient, "_agenerate_gemini", side_effect=gemini):
+            self.assertEqual(asyncio.run(client.agenerate("q", use_cache=False)), "async gemini")
+
+
+if __name__ == '__main__':
+    unittest.main()
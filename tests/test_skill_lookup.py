@@ -0,0 +1,276 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.skills.dedupe import canonical_hash, structural_hash
+from paper2agent.skills.fields import skill_fields
+from paper2agent.skills.lookup import SkillLookupIndex, calibrate_threshold, normalize_query
+from paper2agent.skills.registry import SkillRegistry
+
+
+class FakeCollection:
+    """Chroma collection stand-in; `distances` maps a query to its distance from each document id."""
+
+    def __init__(self, distances=None):
+        self.distances = distances or {}
+        self.rows = {}
+        self.queries = 0
+
+    def add(self, documents, metadatas, ids):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.rows[doc_id] = (document, metadata)
+
+    upsert = add
+
+    def delete(self, ids=None, where=None):
+        for doc_id in list(ids or self.rows):
+            if where is None or all(self.rows[doc_id][1].get(k) == v for k, v in where.items()):
+                del self.rows[doc_id]
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, where=None, include=None):
+        ids = [doc_id for doc_id, (_, metadata) in self.rows.items()
+               if where is None or all(metadata.get(k) == v for k, v in where.items())]
+        return {"ids": ids, "documents": [self.rows[i][0] for i in ids], "metadatas": [self.rows[i][1] for i in ids]}
+
+    def query(self, query_texts, n_results=1, include=None):
+        self.queries += 1
+        distances = self.distances.get(query_texts[0], {})
+        nearest = sorted(self.rows, key=lambda doc_id: distances.get(doc_id, 2.0))[:n_results]
+        return {"ids": [nearest], "distances": [[distances.get(i, 2.0) for i in nearest]],
+                "metadatas": [[self.rows[i][1] for i in nearest]]}
+
+
+class TestSkillLookupIndex(unittest.TestCase):
+    def test_exact_match_ignores_case_spacing_and_punctuation(self):
+        index = SkillLookupIndex()
+        index.add("s1", query="Compute the Impact Score for N=10")
+        self.assertEqual(normalize_query("compute  the impact score, for n=10!"), "compute the impact score for n 10")
+        self.assertEqual(index.exact("compute  the impact score, for n=10!"), "s1")
+        self.assertIsNone(index.exact("Compute the Impact Score for N=11"))
+
+    def test_lexical_match_needs_enough_overlap(self):
+        index = SkillLookupIndex(lexical_min_score=0.8)
+        index.add("s1", query="normalize gene expression counts", description="Log-normalizes a count matrix per cell.")
+        index.add("s2", description="compute_impact_score")
+        self.assertEqual(index.lexical("Please normalize the gene expression counts")[0], "s1")
+        self.assertEqual(index.lexical("impact score compute")[0], "s2")
+        self.assertIsNone(index.lexical("normalize protein abundance"))
+
+        index.remove("s2")
+        self.assertIsNone(index.lexical("impact score compute"))
+
+
+class TestCalibration(unittest.TestCase):
+    def test_cutoff_separates_right_from_wrong_matches(self):
+        samples = [(0.1, True), (0.2, True), (0.3, True), (0.5, False), (0.6, False), (0.25, False)]
+        # 0.2 and 0.3 both misclassify one sample; the stricter cutoff wins
+        self.assertEqual(calibrate_threshold(samples), 0.2)
+        self.assertEqual(calibrate_threshold(samples[:-1]), 0.3)
+        self.assertEqual(calibrate_threshold([(0.4, False), (0.5, False)]), 0.2)
+        self.assertIsNone(calibrate_threshold([]))
+
+
+class TestTieredRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.collection = FakeCollection()
+        self.registry = SkillRegistry(self.tmpdir, collection=self.collection)
+        self.registry.vector_max_distance = 0.35
+        self.registry.store("def impact(): ...", "Computes the impact score.", {"success": True},
+                            query="Calculate the impact score for N=10")
+        self.skill_id = self.registry.skills.all()[0]["id"]
+
+    def test_each_tier_answers_in_order(self):
+        self.collection.distances = {"How influential is a paper?": {f"{self.skill_id}:docstring": 0.2},
+                                     "Plot a histogram": {f"{self.skill_id}:query": 0.9}}
+
+        self.assertEqual(self.registry.lookup("calculate the impact score for n=10")["tier"], "exact")
+        self.assertEqual(self.registry.lookup("impact score calculate n 10")["tier"], "lexical")
+        self.assertEqual(self.collection.queries, 0)  # Neither touched the vector index
+
+        match = self.registry.lookup("How influential is a paper?")
+        self.assertEqual((match["tier"], match["code"]), ("vector", "def impact(): ..."))
+        # Nearest skill, but too far away: a miss, not a wrong hit
+        self.assertIsNone(self.registry.lookup("Plot a histogram"))
+        self.assertIsNone(self.registry.retrieve("Plot a histogram"))
+
+        stats = self.registry.lookup_stats()
+        self.assertEqual((stats["exact"]["lookups"], stats["exact"]["hits"]), (5, 1))
+        self.assertEqual((stats["lexical"]["hits"], stats["vector"]["lookups"], stats["vector"]["hits"]), (1, 3, 1))
+
+    def test_index_is_rebuilt_from_the_collection(self):
+        reopened = SkillRegistry(self.tmpdir, collection=self.collection)
+        self.assertEqual(reopened.lookup("Calculate the impact score for N=10")["id"], self.skill_id)
+
+    def test_calibration_is_saved_and_reloaded(self):
+        self.collection.distances = {"impact of a paper": {f"{self.skill_id}:query": 0.3},
+                                     "impact of a storm": {f"{self.skill_id}:query": 0.45}}
+        cutoff = self.registry.calibrate([("impact of a paper", self.skill_id), ("impact of a storm", None)])
+        self.assertEqual(cutoff, 0.3)
+        with open(os.path.join(self.tmpdir, "lookup_calibration.json")) as f:
+            self.assertEqual(json.load(f)["vector_max_distance"], 0.3)
+        self.assertEqual(SkillRegistry(self.tmpdir, collection=self.collection).vector_max_distance, 0.3)
+        with patch.dict(os.environ, {"PAPER2AGENT_SKILL_MAX_DISTANCE": "0.5"}):
+            self.assertEqual(SkillRegistry(self.tmpdir, collection=self.collection).vector_max_distance, 0.5)
+
+
+IMPACT = '''
+import math
+from numpy import linalg
+
+def impact_score(citations: int, years: float = 1.0) -> float:
+    """Citation impact normalized by paper age."""
+    return math.log1p(citations) / years
+
+def _helper():
+    pass
+'''
+
+
+class TestSkillFields(unittest.TestCase):
+    def test_signature_params_returns_imports_and_docstring(self):
+        fields = skill_fields(IMPACT)
+        self.assertEqual(fields["name"], "impact_score")
+        self.assertEqual(fields["signature"], "def impact_score(citations: int, years: float=1.0) -> float")
+        self.assertEqual((fields["params"], fields["returns"]), (["citations", "years"], "float"))
+        self.assertEqual(fields["imports"], ["math", "numpy"])
+        self.assertEqual(fields["docstring"], "Citation impact normalized by paper age.")
+
+    def test_scripts_and_broken_code(self):
+        self.assertEqual(skill_fields('"""Prints the answer."""\nprint(42)')["docstring"], "Prints the answer.")
+        self.assertEqual(skill_fields("def broken(:")["signature"], "")
+
+
+class TestMultiFieldIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.collection = FakeCollection()
+        self.registry = SkillRegistry(self.tmpdir, collection=self.collection)
+
+    def test_fields_are_embedded_and_code_is_kept_in_the_side_table(self):
+        self.registry.store(IMPACT, "impact_score", {"success": True}, query="How impactful is my paper?")
+        [skill] = self.registry.skills.all()
+
+        documents = {doc_id.split(":")[1]: (text, metadata) for doc_id, (text, metadata) in self.collection.rows.items()}
+        self.assertEqual(set(documents), {"query", "docstring", "signature"})
+        self.assertEqual(documents["query"][0], "How impactful is my paper?")
+        self.assertTrue(all("import math" not in text for text, _ in documents.values()))
+        self.assertEqual(documents["signature"][1]["params"], "citations, years")
+        self.assertEqual(documents["signature"][1]["imports"], "math, numpy")
+        self.assertEqual((skill["code"], skill["returns"]), (IMPACT, "float"))
+
+    def test_fusion_weights_fields(self):
+        self.registry.store("def a():\n    '''Alpha.'''\n    return 1", "a", {"success": True})
+        self.registry.store("def b():\n    '''Beta.'''\n    return 2", "b", {"success": True})
+        a_id, b_id = [skill["id"] for skill in self.registry.skills.all()]
+        # Raw signature distance is closer, but signatures count for less than docstrings
+        self.collection.distances = {"q": {f"{a_id}:signature": 0.3, f"{b_id}:docstring": 0.33}}
+        skill_id, distance, code = self.registry._nearest("q")
+        self.assertEqual(skill_id, b_id)
+        self.assertAlmostEqual(distance, 0.33 / 0.9)
+
+    def test_legacy_code_collection_is_migrated(self):
+        legacy = FakeCollection()
+        legacy.add(documents=[IMPACT], metadatas=[{"description": "impact_score", "verified": True}], ids=["old-1"])
+        self.registry.client = MagicMock(**{"get_collection.return_value": legacy})
+        self.registry._migrate_legacy()
+
+        skill_id = canonical_hash(IMPACT)
+        self.assertEqual(self.registry.skills.get(skill_id)["signature"],
+                         "def impact_score(citations: int, years: float=1.0) -> float")
+        self.assertIn(f"{skill_id}:docstring", self.collection.rows)
+        self.registry.client.delete_collection.assert_called_once_with("skills")
+        self.assertEqual(self.registry.lookup("impact score")["code"], IMPACT)
+
+NORMALIZE = '''
+def normalize(values):
+    """Scales values to unit sum."""
+    total = sum(values)
+    if total == 0:
+        return [0.0 for _ in values]
+    scaled = [value / total for value in values]
+    rounded = [round(value, 6) for value in scaled]
+    return rounded
+'''
+
+
+class TestSkillDedupe(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.collection = FakeCollection()
+        self.registry = SkillRegistry(self.tmpdir, collection=self.collection)
+
+    def test_hashes_ignore_comments_docstrings_formatting_and_names(self):
+        reformatted = NORMALIZE.replace('"""Scales values to unit sum."""', "# unit sum").replace("sum(values)", "sum( values )")
+        renamed = NORMALIZE.replace("values", "xs").replace("total", "s")
+        self.assertEqual(canonical_hash(NORMALIZE), canonical_hash(reformatted))
+        self.assertNotEqual(canonical_hash(NORMALIZE), canonical_hash(renamed))
+        self.assertEqual(structural_hash(NORMALIZE), structural_hash(renamed))
+        self.assertNotEqual(structural_hash(NORMALIZE), structural_hash(NORMALIZE.replace("6)", "3)")))
+
+    def test_store_upserts_and_keeps_every_query(self):
+        verified = {"success": True}
+        self.registry.store(NORMALIZE, "normalize", verified, query="normalize my values")
+        self.registry.store(NORMALIZE.replace("    total = sum", "    # total\n    total = sum"), "normalize", verified,
+                            query="scale the vector to sum to one")
+        self.registry.store(NORMALIZE.replace("values", "xs"), "normalize", verified, query="make weights sum to 1")
+
+        [skill] = self.registry.skills.all()
+        self.assertEqual(skill["id"], canonical_hash(NORMALIZE))
+        self.assertEqual(skill["aliases"], ["scale the vector to sum to one", "make weights sum to 1"])
+        for query in ("normalize my values", "Scale the vector to sum to one!", "make weights sum to 1"):
+            self.assertEqual(self.registry.lookup(query)["tier"], "exact")
+        self.assertEqual(sum(1 for doc_id in self.collection.rows if ":query" in doc_id), 3)
+
+    def test_dedupe_compacts_an_existing_registry(self):
+        near = NORMALIZE.replace("6)", "5)")  # One constant differs
+        other = "def double(x):\n    return 2 * x\n"
+        for n, (code, query) in enumerate([(NORMALIZE, "normalize a"), (NORMALIZE, "normalize b"),
+                                           (near, "normalize c"), (other, "double it")]):
+            # As stored before skills were keyed by their AST: random ids, no structure
+            record = SkillRegistry._skill_record(code, "d", {"success": True}, query=query)
+            record.update(id=f"uuid-{n}", structure=None, created_at=n)
+            self.registry._add(record)
+
+        # A one-token change in a short body moves a fifth of its shingles
+        report = self.registry.dedupe(threshold=0.8, dry_run=True)
+        self.assertEqual((report["before"], report["after"]), (4, 2))
+        self.assertEqual(report["clusters"], [{"kept": "uuid-0", "merged": ["uuid-1", "uuid-2"]}])
+        self.assertEqual(self.registry.count(), 4)
+
+        self.registry.dedupe(threshold=0.8)
+        kept = self.registry.skills.get(canonical_hash(NORMALIZE))
+        self.assertEqual((kept["query"], kept["aliases"]), ("normalize a", ["normalize b", "normalize c"]))
+        self.assertIsNotNone(self.registry.skills.get(canonical_hash(other)))
+        self.assertEqual(self.registry.count(), 2)
+        self.assertFalse([doc_id for doc_id in self.collection.rows if doc_id.startswith("uuid-")])
+        self.assertEqual(self.registry.lookup("normalize c")["id"], kept["id"])
+        self.assertEqual(self.registry.dedupe()["clusters"], [])
+
+    def test_failed_dedupe_loses_no_skill(self):
+        for n, query in enumerate(["normalize a", "normalize b"]):
+            record = SkillRegistry._skill_record(NORMALIZE, "d", {"success": True}, query=query)
+            record.update(id=f"uuid-{n}", structure=None, created_at=n)
+            self.registry._add(record)
+        rows = dict(self.collection.rows)
+
+        with patch.object(self.collection, "upsert", side_effect=RuntimeError("embedding failed")):
+            with self.assertRaises(RuntimeError):
+                self.registry.dedupe()
+
+        self.assertEqual({skill["id"] for skill in self.registry.skills.all()}, {"uuid-0", "uuid-1"})
+        self.assertEqual(self.collection.rows, rows)
+        self.assertEqual(self.registry.lookup("normalize b")["id"], "uuid-1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.skills.stats import SkillCacheStats
+from paper2agent.skills.writeback import SkillWriteBack
+
+
+class TestSkillCacheStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.stats = SkillCacheStats(os.path.join(self.tmpdir, "stats.sqlite3"))
+
+    def test_daily_hit_rate(self):
+        with patch.object(SkillCacheStats, "_today", return_value="2026-01-01"):
+            self.stats.record_lookup(False)
+            self.stats.record_write(True)
+        with patch.object(SkillCacheStats, "_today", return_value="2026-01-02"):
+            for hit in (True, True, False, True):
+                self.stats.record_lookup(hit)
+            self.stats.record_write(False)
+
+        first, second = self.stats.daily()
+        self.assertEqual((first["day"], first["hit_rate"], first["writes"]), ("2026-01-01", 0.0, 1))
+        self.assertEqual((second["lookups"], second["hits"], second["hit_rate"]), (4, 3, 0.75))
+        self.assertEqual(second["write_failures"], 1)
+
+        # Persisted: a new instance sees the same history
+        self.assertEqual(len(SkillCacheStats(self.stats.path).daily()), 2)
+
+
+class TestSkillWriteBack(unittest.TestCase):
+    def test_writes_happen_off_the_calling_thread(self):
+        release = threading.Event()
+        registry = MagicMock()
+        registry.store.side_effect = lambda *args, **kwargs: release.wait(5)
+        stats = MagicMock()
+        writer = SkillWriteBack(lambda: registry, stats=stats)
+
+        future = writer.submit("def f(): pass", query="q", description="d", test_case="f()", model="gemini/x",
+                               verification_log={"success": True})
+        self.assertEqual(writer.pending(), 1)  # submit() returned while the store is still blocked
+        release.set()
+        writer.wait(timeout=5)
+
+        self.assertTrue(future.result())
+        self.assertEqual(writer.pending(), 0)
+        registry.store.assert_called_once_with("def f(): pass", "d", {"success": True}, query="q", test_case="f()",
+                                               model="gemini/x")
+        stats.record_write.assert_called_once_with(True)
+
+    def test_store_errors_are_counted_not_raised(self):
+        registry = MagicMock(**{"store.side_effect": RuntimeError("chroma down")})
+        stats = MagicMock()
+        writer = SkillWriteBack(lambda: registry, stats=stats)
+        self.assertFalse(writer.submit("code", query="q", description="d").result(timeout=5))
+        stats.record_write.assert_called_once_with(False)
+
+
+if __name__ == '__main__':
+    unittest.main()
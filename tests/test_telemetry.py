@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm.budget import count_tokens
+from paper2agent.llm.client import LLMClient, LLMProviderError
+from paper2agent.llm.router import ProviderRouter
+from paper2agent.llm.telemetry import CallRecord, MetricsRegistry, Telemetry, estimate_cost
+
+
+def ollama_response(content, prompt_tokens, completion_tokens):
+    response = MagicMock()
+    response.json.return_value = {"message": {"content": content},
+                                  "prompt_eval_count": prompt_tokens, "eval_count": completion_tokens}
+    return response
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "calls.jsonl")
+        self.sink = Telemetry(self.path)
+        patcher = patch("paper2agent.llm.telemetry.get_telemetry", return_value=self.sink)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.sink.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_generate_records_usage_and_retries(self):
+        client = LLMClient("ollama/telemetry-model", router=ProviderRouter())
+        replies = [Exception("500 Server Error"), ollama_response("ok", 12, 3)]
+        with patch.object(client.http, "post", side_effect=replies), \
+             patch("paper2agent.llm.client.time.sleep"):
+            client.generate("q", use_cache=False, role="grounding")
+
+        [record] = self.records()
+        self.assertEqual((record["role"], record["provider"], record["model"]), ("grounding", "ollama", "telemetry-model"))
+        self.assertEqual((record["prompt_tokens"], record["completion_tokens"], record["token_source"]), (12, 3, "provider"))
+        self.assertEqual((record["attempts"], record["retries"]), (2, 1))
+        self.assertEqual(record["served_by"], "ollama/telemetry-model")
+        # Time to first byte is only recorded for streamed calls
+        self.assertIsNone(record["ttfb_ms"])
+        self.assertTrue(record["success"])
+
+        metrics = self.sink.metrics.render()
+        self.assertIn('paper2agent_llm_requests_total{model="telemetry-model",provider="ollama",role="grounding",status="ok"} 1', metrics)
+        self.assertIn('paper2agent_llm_retries_total{model="telemetry-model",provider="ollama",role="grounding"} 1', metrics)
+        self.assertIn("# TYPE paper2agent_llm_request_duration_seconds histogram", metrics)
+
+    def test_fallback_and_failure_are_recorded(self):
+        client = LLMClient("ollama/telemetry-model", router=ProviderRouter())
+        with patch.object(LLMClient, "_generate_ollama", side_effect=LLMProviderError("down")), \
+             patch.object(LLMClient, "_generate_gemini", side_effect=LLMProviderError("quota")):
+            with self.assertRaises(LLMProviderError):
+                client.generate("q", use_cache=False, role="synthesizer")
+
+        [record] = self.records()
+        self.assertFalse(record["success"])
+        self.assertEqual(record["fallbacks"], ["gemini/gemini-2.0-flash"])
+        self.assertEqual(record["token_source"], "estimate")
+
+    def test_stream_is_one_record(self):
+        client = LLMClient("ollama/telemetry-model", router=ProviderRouter())
+        with patch.object(LLMClient, "_stream_provider", return_value=iter(["a", "b"])):
+            self.assertEqual("".join(client.generate_stream("q", use_cache=False, role="synthesizer")), "ab")
+        [record] = self.records()
+        self.assertTrue(record["streamed"])
+        self.assertIsNotNone(record["ttfb_ms"])
+        # Without provider usage, tokens are counted like the rate limiter and cost cap count them
+        self.assertEqual((record["prompt_tokens"], record["completion_tokens"], record["token_source"]),
+                         (count_tokens("q", "telemetry-model"), count_tokens("ab", "ollama/telemetry-model"), "estimate"))
+
+
+class TestMetrics(unittest.TestCase):
+    def test_cost_and_histogram(self):
+        self.assertAlmostEqual(estimate_cost("gemini/gemini-2.0-flash", 1_000_000, 1_000_000), 0.5)
+        self.assertEqual(estimate_cost("ollama/anything", 10, 10), 0.0)
+
+        registry = MetricsRegistry()
+        record = CallRecord("gemini", "gemini-2.0-flash", "synthesizer")
+        record.finish(1000, "x" * 400)
+        registry.observe_call(record)
+        text = registry.render()
+        self.assertIn('paper2agent_llm_tokens_total{kind="prompt",model="gemini-2.0-flash",provider="gemini",role="synthesizer"} 1000', text)
+        self.assertIn('paper2agent_llm_request_duration_seconds_bucket{model="gemini-2.0-flash",provider="gemini",role="synthesizer",le="+Inf"} 1', text)
+
+    def test_jsonl_rotates(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "calls.jsonl")
+            sink = Telemetry(path, max_bytes=200, backup_count=2)
+            for _ in range(5):
+                record = CallRecord("ollama", "m")
+                record.finish(0, "")
+                sink.emit(record)
+            sink.close()
+            self.assertTrue(os.path.exists(path + ".1"))
+            self.assertFalse(os.path.exists(path + ".3"))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
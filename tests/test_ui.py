@@ -0,0 +1,45 @@
+import importlib.util
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm.budget import PromptBudget
+from paper2agent.orchestrator import Orchestrator
+
+
+@unittest.skipUnless(importlib.util.find_spec("gradio"), "gradio is not installed")
+class TestChatHistory(unittest.TestCase):
+    def setUp(self):
+        from paper2agent import ui
+        self.ui = ui
+
+    def test_history_turns_from_messages_and_tuples(self):
+        messages = [{"role": "user", "content": "Load the data"}, {"role": "assistant", "content": "Loaded."}]
+        turns = ["user: Load the data", "assistant: Loaded."]
+        self.assertEqual(self.ui._history_turns(messages), turns)
+        self.assertEqual(self.ui._history_turns([("Load the data", "Loaded."), ("Plot it", None)]),
+                         turns + ["user: Plot it"])
+        self.assertEqual(self.ui._history_turns(None), [])
+
+    def test_history_reaches_the_prompt_budget(self):
+        fake = {
+            "skill_registry": ((), lambda self: MagicMock(**{"lookup.return_value": None})),
+            "skill_stats": ((), lambda self: MagicMock()),
+            "execution_cache": ((), lambda self: None),
+            "sandbox": ((), lambda self: MagicMock(**{"run.return_value": SimpleNamespace(success=True, stdout="1")})),
+            "retriever": ((), lambda self: MagicMock(**{"query_with_scores.return_value": []})),
+            "synthesizer": ((), lambda self: MagicMock()),
+            "integrity_agent": ((), lambda self: MagicMock()),
+        }
+        history = [{"role": "user", "content": "Use the 2019 cohort"}, {"role": "assistant", "content": "Done."}]
+        with patch.dict(Orchestrator.COMPONENTS, fake, clear=True), \
+                patch.object(self.ui, "orch", Orchestrator(warm_up=False)), \
+                patch.object(PromptBudget, "pack", autospec=True, side_effect=PromptBudget.pack) as pack:
+            list(self.ui.chat_response_stream("Plot survival", history, SimpleNamespace(name="paper.pdf"), "General"))
+        sections = pack.call_args.args[1]
+        self.assertEqual([s.text for s in sections if s.group == "history"],
+                         ["user: Use the 2019 cohort", "assistant: Done."])
+
+
+if __name__ == '__main__':
+    unittest.main()
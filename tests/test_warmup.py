@@ -0,0 +1,72 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from paper2agent.llm import telemetry
+from paper2agent.llm.client import LLMClient
+from paper2agent.llm.config import OLLAMA_KEEP_ALIVE
+from paper2agent.llm.router import ProviderRouter
+from paper2agent.llm.warmup import ModelWarmup, warm_up_configured_models
+
+
+def ollama_response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    return response
+
+
+class TestOllamaWarmup(unittest.TestCase):
+    def test_warm_up_reports_load_time(self):
+        client = LLMClient("ollama/m", router=ProviderRouter())
+        response = ollama_response({"done": True, "load_duration": 4_500_000_000})
+        with patch.object(client.http, "post", return_value=response) as post:
+            self.assertAlmostEqual(client.warm_up(), 4.5)
+        url, = post.call_args.args
+        self.assertTrue(url.endswith("/api/generate"))
+        self.assertEqual(post.call_args.kwargs["json"], {"model": "m", "keep_alive": OLLAMA_KEEP_ALIVE["warmup"]})
+        self.assertIsNone(LLMClient("gemini-2.0-flash", router=ProviderRouter()).warm_up())
+
+    def test_keep_alive_follows_role_and_load_is_split_from_generation(self):
+        client = LLMClient("ollama/m", router=ProviderRouter())
+        response = ollama_response({"message": {"content": "ok"}, "prompt_eval_count": 5, "eval_count": 2,
+                                    "load_duration": 2_000_000_000, "prompt_eval_duration": 250_000_000,
+                                    "eval_duration": 750_000_000})
+        record = telemetry.CallRecord("ollama", "m", role="grounding")
+        with patch.object(client.http, "post", return_value=response) as post, telemetry.activate(record):
+            client._call_provider("q", None, retries=1)
+        self.assertEqual(post.call_args.kwargs["json"]["keep_alive"], OLLAMA_KEEP_ALIVE["grounding"])
+        self.assertEqual((record.load_seconds, record.generation_seconds), (2.0, 1.0))
+        self.assertEqual(client._ollama_payload("q", None)["keep_alive"], OLLAMA_KEEP_ALIVE["default"])
+
+    def test_background_warmup_runs_once_per_model(self):
+        warmup = ModelWarmup()
+        with patch.object(LLMClient, "warm_up", return_value=1.25) as warm_up:
+            started = warmup.start(["ollama/a", "ollama/a", "gemini-2.0-flash"])
+            warmup.wait(timeout=5)
+            self.assertEqual(warmup.start(["ollama/a"]), [])
+        self.assertEqual(started, ["ollama/a"])
+        self.assertEqual(warm_up.call_count, 1)
+        self.assertEqual(warmup.stats()["ollama/a"]["status"], "ready")
+
+    def test_failed_warmup_is_recorded(self):
+        warmup = ModelWarmup()
+        with patch.object(LLMClient, "warm_up", side_effect=ConnectionError("refused")):
+            warmup.start(["ollama/b"])
+            warmup.wait(timeout=5)
+        self.assertEqual(warmup.stats()["ollama/b"]["status"], "failed")
+
+    def test_warmup_can_be_limited_to_roles(self):
+        config = {"synthesizer": "ollama/s", "integrity": "ollama/i", "grounding": "ollama/g"}
+        with patch.dict("paper2agent.llm.warmup.MODEL_CONFIG", config), \
+                patch.dict(os.environ, {"PAPER2AGENT_LLM_WARMUP": "1"}), \
+                patch("paper2agent.llm.warmup.get_warmup") as get_warmup:
+            warm_up_configured_models(("synthesizer", "integrity"))
+        get_warmup.return_value.start.assert_called_once_with(["ollama/s", "ollama/i"])
+
+    def test_env_disables_warmup(self):
+        with patch.dict(os.environ, {"PAPER2AGENT_LLM_WARMUP": "0"}):
+            self.assertEqual(warm_up_configured_models(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()